@@ -1,6 +1,10 @@
-from two_ocr.src.AI_report import ai
-from fastapi import FastAPI, HTTPException,APIRouter
-from two_ocr.common.res.response import success_response, validation_error_response, service_error_response, ApiResponse
+from src.AI_report import ai
+from typing import Optional
+from fastapi import FastAPI, HTTPException,APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
+from common.res.response import success_response, validation_error_response, service_error_response, ApiResponse
+from common.monitor import progress
+from common.admission.admission import report_admission, client_key, AdmissionRejected, PRIORITY_CLASSES
 
 # 创建路由实例，添加API前缀和标签
 router = APIRouter()
@@ -8,7 +12,8 @@ router = APIRouter()
 
 
 @router.post("/api/assignments/{assignmentId}/report")
-async def AI_api(assignmentId: str):
+async def AI_api(assignmentId: str, request: Request, priority: str = "interactive",
+                 runId: Optional[str] = None):
     """ 进行HTTP参数绑定，前端 uri 请求数据 （作业ID）
                   根据 作业ID 查询数据库中的作业图片
               """
@@ -16,6 +21,8 @@ async def AI_api(assignmentId: str):
         OCR图片识别接口，基于作业ID查询并处理图片。
 
         :param assignmentId: 作业ID，由前端提供
+        :param priority: 调度优先级，interactive（默认）或 bulk（批量重批）
+        :param runId: 可选的运行ID（客户端生成），进度事件带上它，可用 /events?run=<runId> 只订阅这次调用
         :return: 包含OCR识别结果的响应
         """
     # print("ocr_api运行成功:",assignmentId)
@@ -26,6 +33,9 @@ async def AI_api(assignmentId: str):
         # 参数校验：确保assignmentId有效
         if not assignmentId or not isinstance(assignmentId, str):
             return validation_error_response(message="作业ID无效")
+        if priority not in PRIORITY_CLASSES:
+            return validation_error_response(message=f"不支持的优先级: {priority}")
+        run = progress.new_run(runId)
 
         """ 根据作业ID查找数据库中作业 """
 
@@ -107,7 +117,20 @@ async def AI_api(assignmentId: str):
                 return 0;
             }
                 """
-        results = ai.ai(perfect_code)
+        # 准入控制：限制同时执行的请求数（interactive 优先），排队超时、队列已满或该用户请求过多时立即拒绝；
+        # 评分阶段与评分结果推送到该作业的进度事件流
+        with progress.channel(int(assignmentId) if assignmentId.isdigit() else None, run):
+            try:
+                async with report_admission.admit(client_key(request), priority):
+                    progress.publish("status", route="report", state="running")
+                    results = await run_in_threadpool(ai.ai, perfect_code)
+            except AdmissionRejected as e:
+                progress.publish("error", route="report", code=e.code, message=e.message)
+                return e.response()
+            if results is None:
+                progress.publish("error", route="report", message="AI调用失败")
+            else:
+                progress.publish("done", route="report", score=results["score"], breakdown=results["breakdown"])
         if results is None:
             return service_error_response(message="AI调用失败")
 
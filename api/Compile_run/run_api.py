@@ -1,6 +1,10 @@
 from src.Compile_run import run_api
-from fastapi import FastAPI, HTTPException,APIRouter
+from typing import Optional
+from fastapi import FastAPI, HTTPException,APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
 from common.res.response import success_response, validation_error_response, service_error_response, ApiResponse
+from common.monitor import progress
+from common.admission.admission import compile_admission, client_key, AdmissionRejected, PRIORITY_CLASSES
 
 # 创建路由实例，添加API前缀和标签
 router = APIRouter()
@@ -9,7 +13,8 @@ router = APIRouter()
 
 
 @router.post("/api/assignments/{assignmentId}/Compile_run")
-async def ocr_api(assignmentId: str):
+async def ocr_api(assignmentId: str, request: Request, priority: str = "interactive",
+                  runId: Optional[str] = None):
     """ 进行HTTP参数绑定，前端 uri 请求数据 （作业ID）
                   根据 作业ID 查询数据库中的作业图片
               """
@@ -17,6 +22,8 @@ async def ocr_api(assignmentId: str):
         OCR图片识别接口，基于作业ID查询并处理图片。
 
         :param assignmentId: 作业ID，由前端提供
+        :param priority: 调度优先级，interactive（默认）或 bulk（批量重批）
+        :param runId: 可选的运行ID（客户端生成），进度事件带上它，可用 /events?run=<runId> 只订阅这次调用
         :return: 包含OCR识别结果的响应
         """
 
@@ -24,6 +31,9 @@ async def ocr_api(assignmentId: str):
         # 参数校验：确保assignmentId有效
         if not assignmentId or not isinstance(assignmentId, str):
             return validation_error_response(message="作业ID无效")
+        if priority not in PRIORITY_CLASSES:
+            return validation_error_response(message=f"不支持的优先级: {priority}")
+        run = progress.new_run(runId)
 
 
         # 查询数据库获取作业图片
@@ -39,7 +49,21 @@ async def ocr_api(assignmentId: str):
               return 0;
           }
           """
-        results = run_api.compile_run(success_code)
+        # 准入控制：限制同时执行的请求数（interactive 优先），排队超时、队列已满或该用户请求过多时立即拒绝；
+        # 编译阶段与编译诊断推送到该作业的进度事件流
+        with progress.channel(int(assignmentId) if assignmentId.isdigit() else None, run):
+            try:
+                async with compile_admission.admit(client_key(request), priority):
+                    progress.publish("status", route="compile", state="running")
+                    results = await run_in_threadpool(run_api.compile_run, success_code)
+            except AdmissionRejected as e:
+                progress.publish("error", route="compile", code=e.code, message=e.message)
+                return e.response()
+            if results is None:
+                progress.publish("error", route="compile", message="编译运行失败")
+            else:
+                progress.publish("done", route="compile", compileSuccess=results["data"]["compileSuccess"],
+                                 output=results["data"]["output"], error=results["data"]["error"])
         if results is None:
             return service_error_response(message="OCR处理失败")
 
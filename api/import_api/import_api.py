@@ -0,0 +1,48 @@
+import os
+from pathlib import Path
+
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from common.res.response import success_response, validation_error_response, service_error_response
+
+from api.upload_img.upload_api import UPLOAD_DIR
+from core.core_db.database import SessionLocal
+from src.Importer import data_importer
+
+# 创建路由实例，添加API前缀和标签
+router = APIRouter()
+
+# 允许导入的根目录，接口只能导入其下的子目录
+IMPORT_ROOT_DIR = Path(os.getenv("IMPORT_ROOT_DIR", "Data"))
+
+
+# 在工作线程中使用独立的数据库会话执行导入
+def _run_import(root: Path) -> dict:
+    db = SessionLocal(expire_on_commit=False)  # 与命令行导入相同，提交后不使属性过期
+    try:
+        return data_importer.import_data_tree(db, root, UPLOAD_DIR)
+    finally:
+        db.close()
+
+
+@router.post("/api/import/data")
+async def import_data_api(directory: str = ""):
+    """
+        批量导入 <学号>/<testN>/*.jpg 目录结构的作业：创建缺失的学生账号、存储图片、创建作业及其阶段任务。
+        可重复调用，已导入的文件会被跳过（中断后重新调用即可继续）。
+
+        :param directory: IMPORT_ROOT_DIR 下的子目录，默认为根目录本身
+        :return: 导入统计（学生数、新建账号数、导入/跳过/去重的文件数、耗时）
+        """
+    try:
+        base = IMPORT_ROOT_DIR.resolve()
+        root = (base / directory).resolve()
+        if root != base and base not in root.parents:
+            return validation_error_response(message="导入目录必须位于 IMPORT_ROOT_DIR 之下")
+        if not root.is_dir():
+            return validation_error_response(message=f"导入目录不存在: {directory}")
+
+        stats = await run_in_threadpool(_run_import, root)
+        return success_response(data=stats)
+    except Exception as e:
+        return service_error_response(message="导入失败: " + str(e))
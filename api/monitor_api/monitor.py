@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Response
+from common.res.response import success_response, service_error_response
+
+from common.admission import admission
+from common.monitor import stage_timer
+from common.monitor.metrics import registry, CONTENT_TYPE
+from core.core_db import database
+
+# 创建路由实例，添加API前缀和标签
+router = APIRouter()
+
+
+@router.get("/api/monitor/db-pool")
+async def db_pool_api():
+    """
+        数据库连接池监控接口。
+
+        :return: 连接池大小、已借出/空闲连接数、溢出连接数，以及获取连接的等待时间统计
+        """
+    try:
+        return success_response(data=database.get_pool_metrics())
+    except Exception as e:
+        return service_error_response(message="服务器内部错误")
+
+
+@router.get("/api/monitor/stages")
+async def stage_histograms_api():
+    """
+        流水线各阶段耗时监控接口。
+
+        :return: 每个阶段（load/preprocess/predict/extract/postprocess/compile/llm_scoring）的调用次数、
+                 错误数、平均墙钟/CPU 耗时与延迟直方图，以及尚未写库、因积压被丢弃和无法写库而放弃的计时记录数
+        """
+    try:
+        return success_response(data={
+            "stages": stage_timer.histograms.snapshot(),
+            "pending": stage_timer.pending_count(),
+            "dropped": stage_timer.dropped_records(),
+            "rejected": stage_timer.rejected_records(),
+        })
+    except Exception as e:
+        return service_error_response(message="服务器内部错误")
+
+
+@router.get("/api/monitor/admission")
+async def admission_api():
+    """
+        昂贵接口（ocr/compile/report）准入控制监控接口。
+
+        :return: 每个路由执行中/排队中的请求数、排队用户数、并发与队列上限、获准数与按原因统计的拒绝数
+        """
+    try:
+        return success_response(data={name: c.snapshot() for name, c in admission.controllers.items()})
+    except Exception as e:
+        return service_error_response(message="服务器内部错误")
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics_api():
+    """
+        Prometheus 指标抓取接口（文本格式）。
+
+        :return: 各路由请求数/延迟直方图、并发请求数、线程池与进程池排队长度、OCR 引擎加载与复用次数、
+                 流水线各阶段（含编译、LLM 评分）的延迟与错误数、数据库连接池占用
+        """
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
@@ -1,18 +1,78 @@
+import asyncio
+import logging
+from typing import List, Optional
+
 from src.PaddleOCR import ocr_v2
-from fastapi import FastAPI, HTTPException, APIRouter
+from src.Ensemble import ensemble_ocr
+from src.EasyOCR import EasyOCR
+from src.OCRWorker import ocr_worker
+from src.RegionOCR import region_ocr
+from fastapi import FastAPI, HTTPException, APIRouter, Depends, Request, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
 from common.res.response import success_response, validation_error_response, service_error_response, ApiResponse
+from common.admission.admission import ocr_admission, client_key, AdmissionRejected, PRIORITY_CLASSES
+from api.upload_img.upload_api import save_upload, remove_uploads
+from common.monitor import profiler, progress
+from common.monitor.stage_timer import assignment_context, stage
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.core_db.async_database import get_async_db
+from core.core_db.async_crud import async_assignment_crud, async_task_crud, async_image_process_crud
+from core.core_db.schemas import TaskUpdate, AssignmentUpdate, ImageProcessCreate
+
+logger = logging.getLogger(__name__)
 
 # 创建路由实例，添加API前缀和标签
 router = APIRouter()
 
 
-# 查询数据库获取作业图片
-def get_assignment_image(assignmentId):
-    pass
+# 查询数据库获取作业图片路径，作业不存在时返回 None
+async def get_assignment_image(db: AsyncSession, assignment_id: int):
+    assignment = await async_assignment_crud.get_assignment(db, assignment_id)
+    return assignment.original_image_path if assignment is not None else None
+
+
+# 慢请求的剖析结果落盘，并把元信息记到该作业 OCR 任务的 result_data["profile"]
+async def save_slow_profile(db: AsyncSession, assignment_id: int, profile):
+    profiler.stop_profile(profile)
+    if not profiler.is_slow(profile):
+        return
+    # 剖析结果保存失败不影响识别结果的返回
+    try:
+        meta = await run_in_threadpool(profiler.save_profile, profile, assignment_id)
+        task = await async_task_crud.get_task_by_type(db, assignment_id, "ocr")
+        if task is not None:
+            await async_task_crud.update_task(db, task.id, TaskUpdate(result_data={**(task.result_data or {}),
+                                                                                    "profile": meta}))
+    except Exception as e:
+        logger.error(f"保存作业 {assignment_id} 的剖析结果失败: {e}")
+
+
+# 保存带行ID的版面（供局部重新识别使用）与识别出的代码；保存失败不影响识别结果的返回
+async def save_layout(db: AsyncSession, assignment_id: int, layout, code: str, image_path: Optional[str] = None):
+    try:
+        scores = [ln["score"] for ln in layout["lines"]]
+        await async_image_process_crud.create_image_process(db, ImageProcessCreate(
+            assignment_id=assignment_id, process_step=region_ocr.LAYOUT_STEP, process_result=layout,
+            confidence_score=round(sum(scores) / len(scores), 3) if scores else None), commit=False)
+        assignment_update = AssignmentUpdate(extracted_code=code)
+        if image_path is not None:
+            assignment_update.original_image_path = image_path  # 整页重拍后以新图片为准
+        await async_assignment_crud.update_assignment(db, assignment_id, assignment_update)
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"保存作业 {assignment_id} 的版面失败: {e}")
+
+
+# 支持的识别引擎：paddle（默认）、easyocr，或 ensemble（PaddleOCR 与 EasyOCR 并发识别后逐行择优）
+OCR_ENGINES = ("paddle", "easyocr", "ensemble")
 
 
 @router.post("/api/assignments/{assignmentId}/ocr")
-async def ocr_api(assignmentId: str):
+async def ocr_api(assignmentId: str, request: Request, engine: str = "paddle", priority: Optional[str] = None,
+                  runId: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
     """ 进行HTTP参数绑定，前端 uri 请求数据 （作业ID）
                   根据 作业ID 查询数据库中的作业图片
               """
@@ -20,6 +80,9 @@ async def ocr_api(assignmentId: str):
         OCR图片识别接口，基于作业ID查询并处理图片。
 
         :param assignmentId: 作业ID，由前端提供
+        :param engine: 识别引擎，paddle、easyocr 或 ensemble
+        :param priority: 调度优先级 interactive 或 bulk，默认取该作业 OCR 任务的 priority
+        :param runId: 可选的运行ID（客户端生成），进度事件带上它，可用 /events?run=<runId> 只订阅这次调用
         :return: 包含OCR识别结果的响应
         """
     # print("ocr_api运行成功:",assignmentId)
@@ -27,47 +90,245 @@ async def ocr_api(assignmentId: str):
 
     try:
         # 参数校验：确保assignmentId有效
-        if not assignmentId or not isinstance(assignmentId, str):
+        if not assignmentId or not assignmentId.isdigit():
             return validation_error_response(message="作业ID无效")
+        assignment_id = int(assignmentId)
 
+        if engine not in OCR_ENGINES:
+            return validation_error_response(message=f"不支持的识别引擎: {engine}")
+        if priority is not None and priority not in PRIORITY_CLASSES:
+            return validation_error_response(message=f"不支持的优先级: {priority}")
+        run = progress.new_run(runId)
 
         # 查询数据库获取作业图片
-        image_data = get_assignment_image(assignmentId)
-        image = '../../Data/zhangqikui/test1/IMG_20250928_222538.jpg'
-        if image_data is None:
+        image = await get_assignment_image(db, assignment_id)
+        if image is None:
             return validation_error_response(message="未找到对应的作业图片")
 
-        """ ocr识别 """
-        # 使用PaddleOCR识别 的结果
-        results = ocr_v2.paddle_ocr(image)
-        # for res in result:
-        #     res.save_to_img("output")
+        # 未指定优先级时沿用任务创建时记录的优先级（批量上传/导入的作业为 bulk）
+        if priority is None:
+            task = await async_task_crud.get_task_by_type(db, assignment_id, "ocr")
+            priority = task.priority if task is not None and task.priority else "interactive"
+
+        # 准入控制：超出并发上限时排队等待（interactive 优先），队列已满、等待超时或该用户请求过多时立即拒绝
+        user = client_key(request)
+        progress.bus.publish(assignment_id, "status", run=run, route="ocr", state="queued", priority=priority)
+        try:
+            await ocr_admission.acquire(user, priority)
+        except AdmissionRejected as e:
+            progress.bus.publish(assignment_id, "error", run=run, route="ocr", code=e.code, message=e.message)
+            return e.response()
+        progress.bus.publish(assignment_id, "status", run=run, route="ocr", state="running", engine=engine)
+
+        # 开启 OCR_PROFILE_ENABLED 时对本次请求采样剖析（关闭时为 None）
+        profile = profiler.start_profile()
+        try:
+            # 以下各阶段的耗时都关联到该作业，由后台任务批量写入 Task / ImageProcess，并推送到该作业的进度事件流
+            with assignment_context(assignment_id), progress.channel(assignment_id, run):
+                """ ocr识别 """
+                if engine == "ensemble":
+                    # 两个引擎在各自的工作进程中并发识别，按行对齐后择优（不阻塞事件循环）
+                    lines = await run_in_threadpool(ensemble_ocr.ensemble_recognition, image)
+                elif engine == "paddle" and ocr_worker.get_client() is not None:
+                    # 配置了独立 OCR 工作进程：与其他请求合批识别，本进程不加载模型
+                    with stage("predict", remote=1):
+                        pages = await asyncio.wait_for(
+                            asyncio.wrap_future(ocr_worker.get_client().submit(image)), ocr_worker.OCR_WORKER_TIMEOUT)
+                    lines = ocr_v2.line_layout.extract_code_lines(pages)
+                elif engine == "easyocr":
+                    # 使用缓存的 EasyOCR Reader 识别（无 GPU 时自动使用 CPU）
+                    pages = await run_in_threadpool(EasyOCR.easy_ocr, image)
+                    lines = ocr_v2.line_layout.extract_code_lines(pages)
+                else:
+                    # 使用PaddleOCR识别 的结果
+                    results = await run_in_threadpool(ocr_v2.paddle_ocr, image)
+                    # for res in result:
+                    #     res.save_to_img("output")
 
-        if results is None:
-            return service_error_response(message="OCR处理失败")
+                    if results is None:
+                        progress.publish("error", route="ocr", message="OCR处理失败")
+                        return service_error_response(message="OCR处理失败")
 
-        """ ocr识别结果的图片入库（根据uri传递的请求参数 作业ID 查询数据库，如果该作业存在，则更新作业，否则创建新作业） """
+                    # 按检测框版面重建代码行（含每行 rec_scores 置信度）
+                    lines = ocr_v2.ocr_recognition_return_lines(results)
+
+                # 为每行分配稳定的行ID，逐行推送识别结果，前端可以在后处理完成前先展示
+                layout = region_ocr.new_layout(lines, image)
+                for index, line in enumerate(layout["lines"]):
+                    progress.publish("line", id=line["id"], index=index, text=line["text"], score=line["score"])
+
+                """ ocr识别结果的图片入库（根据uri传递的请求参数 作业ID 查询数据库，如果该作业存在，则更新作业，否则创建新作业） """
+
+                # 把代码行拼成一个包含换行符的源代码字符串（不写文件）。
+                code_str = ocr_v2.line_layout.lines_to_code_string(lines)
+
+                # 合并为 string（和之前给的合并函数等价）
+                print("=== 原始 OCR 字符串 ===")
+                print(code_str)
+                """ ocr识别结果的源代码字符串入库 （根据uri传递的请求参数 作业ID 查询数据库，如果该作业存在，则更新作业，否则创建新作业）"""
+
+                # 后处理 OCR 识别出来的代码字符串，返回修正后的代码字符串（高置信行跳过模糊匹配与激进改写）。
+                corrected = ocr_v2.postprocess_code(code_str, verbose=True, line_scores=[ln["score"] for ln in lines])
+                print("\n=== 后处理后 ===")
+                print(corrected)
+                """ ocr识别结果的源代码字符串后处理后入库 （根据uri传递的请求参数 作业ID 查询数据库，如果该作业存在，则更新作业，否则创建新作业）"""
+
+
+                """ 响应, OCR 识别到的源代码文本 """
+                await save_layout(db, assignment_id, layout, corrected)
+                progress.publish("done", route="ocr", recognizedCode=corrected)
+                # 返回成功响应
+                return success_response(data={"recognizedCode": corrected,
+                                              "lines": [{"id": ln["id"], "text": ln["text"]} for ln in layout["lines"]]})
+        except Exception:
+            progress.bus.publish(assignment_id, "error", run=run, route="ocr", message="服务器内部错误")
+            raise
+        finally:
+            ocr_admission.release(user)
+            if profile is not None:
+                await save_slow_profile(db, assignment_id, profile)
+
+    except ValueError as e:
+        return validation_error_response(message=str(e))
+    except Exception as e:
+        return service_error_response(message="服务器内部错误")
+
+
+@router.post("/api/assignments/{assignmentId}/ocr/region")
+async def ocr_region_api(assignmentId: str, request: Request,
+                         x0: Optional[float] = Form(None), y0: Optional[float] = Form(None),
+                         x1: Optional[float] = Form(None), y1: Optional[float] = Form(None),
+                         image: Optional[UploadFile] = File(None), priority: str = "interactive",
+                         runId: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    """
+        局部重新识别接口：只识别改动的区域，把新识别的行按稳定的行ID拼回已保存的识别结果。
+        需要该作业已经完成过一次完整的 OCR 识别；区域内使用 PaddleOCR 识别（配置了独立 OCR 工作进程时交给工作进程）。
 
-        # 把 OCR 的 rec_texts（字符串列表）拼成一个包含换行符的源代码字符串。在内存中执行 OCR 并直接返回拼接好的源代码字符串（不写文件）。
-        code_str = ocr_v2.ocr_recognition_return_string(results)
+        :param assignmentId: 作业ID
+        :param x0, y0, x1, y1: 重新识别的区域（原图像素坐标）；与之相交的行会整行重新识别
+        :param image: 补拍的图片。与区域同时给出时为该区域的局部补拍；只给出图片时为与原图对齐、尺寸一致的整页重拍，
+                      只重新识别有变化的区域，之后的识别以新图片为准
+        :param priority: 调度优先级，interactive（默认）或 bulk
+        :param runId: 可选的运行ID（客户端生成），进度事件带上它，可用 /events?run=<runId> 只订阅这次调用
+        :return: 后处理后的完整代码、全部行（含行ID）、变化的行ID（updated/added/removed）与实际识别的区域
+        """
+    try:
+        if not assignmentId or not assignmentId.isdigit():
+            return validation_error_response(message="作业ID无效")
+        assignment_id = int(assignmentId)
+        if priority not in PRIORITY_CLASSES:
+            return validation_error_response(message=f"不支持的优先级: {priority}")
+        run = progress.new_run(runId)
+        coords = (x0, y0, x1, y1)
+        if any(v is not None for v in coords) and any(v is None for v in coords):
+            return validation_error_response(message="区域需要同时提供 x0、y0、x1、y1")
+        region = list(coords) if x0 is not None else None
+        if region is None and image is None:
+            return validation_error_response(message="请指定识别区域或上传补拍图片")
 
-        # 合并为 string（和之前给的合并函数等价）
-        print("=== 原始 OCR 字符串 ===")
-        print(code_str)
-        """ ocr识别结果的源代码字符串入库 （根据uri传递的请求参数 作业ID 查询数据库，如果该作业存在，则更新作业，否则创建新作业）"""
+        record = await async_image_process_crud.get_latest_image_process(db, assignment_id, region_ocr.LAYOUT_STEP)
+        if record is None:
+            return validation_error_response(message="该作业还没有完整的识别结果，请先调用 OCR 接口")
+        layout = record.process_result
+        image_path = layout.get("image_path") or await get_assignment_image(db, assignment_id)
+        if image_path is None:
+            return validation_error_response(message="未找到对应的作业图片")
+        new_image_path = str(await save_upload(image)) if image is not None else None
+        # 补拍图片在准入前已写入：被拒绝或识别、保存失败时删除它（及局部补拍生成的合成图），不留下孤立文件
+        saved = False
+        try:
+            user = client_key(request)
+            try:
+                await ocr_admission.acquire(user, priority)
+            except AdmissionRejected as e:
+                return e.response()
+            try:
+                with assignment_context(assignment_id), progress.channel(assignment_id, run):
+                    progress.publish("status", route="ocr_region", state="running")
+                    layout, changes, regions = await run_in_threadpool(
+                        region_ocr.reocr, layout, image_path, region, new_image_path)
 
-        # 后处理 OCR 识别出来的代码字符串，返回修正后的代码字符串。
-        corrected = ocr_v2.postprocess_code(code_str, verbose=True)
-        print("\n=== 后处理后 ===")
-        print(corrected)
-        """ ocr识别结果的源代码字符串后处理后入库 （根据uri传递的请求参数 作业ID 查询数据库，如果该作业存在，则更新作业，否则创建新作业）"""
+                    changed = set(changes["updated"]) | set(changes["added"])
+                    for index, line in enumerate(layout["lines"]):
+                        if line["id"] in changed:
+                            progress.publish("line", id=line["id"], index=index, text=line["text"], score=line["score"])
 
+                    lines = layout["lines"]
+                    code_str = ocr_v2.line_layout.lines_to_code_string(lines)
+                    # 区域外的行未变，逐行后处理结果大多直接命中缓存
+                    corrected, _ = ocr_v2.postprocess_code_incremental(code_str, line_scores=[ln["score"] for ln in lines])
+                    # 补拍（整页重拍或局部补拍合成图）之后的识别以新图片为准
+                    await save_layout(db, assignment_id, layout, corrected,
+                                      layout["image_path"] if new_image_path else None)
+                    progress.publish("done", route="ocr_region", recognizedCode=corrected, changes=changes)
+            finally:
+                ocr_admission.release(user)
 
-        """ 响应, OCR 识别到的源代码文本 """
-        # 返回成功响应
-        return success_response(data={"recognizedCode": corrected})
+            saved = True
+            return success_response(data={"recognizedCode": corrected,
+                                          "lines": [{"id": ln["id"], "text": ln["text"]} for ln in layout["lines"]],
+                                          "changes": changes,
+                                          "regions": regions})
+        finally:
+            if new_image_path is not None and not saved:
+                remove_uploads([new_image_path, region_ocr.composite_path(new_image_path)])
 
     except ValueError as e:
         return validation_error_response(message=str(e))
     except Exception as e:
         return service_error_response(message="服务器内部错误")
+
+
+# 增量后处理的请求体
+class PostprocessRequest(BaseModel):
+    code: str
+    lineScores: Optional[List[float]] = None
+
+
+@router.post("/api/assignments/{assignmentId}/postprocess")
+async def postprocess_api(assignmentId: str, body: PostprocessRequest):
+    """
+        对老师修改后的代码重新做后处理（不重新识别）。
+
+        逐行规则的结果按行缓存，只有改动过的行需要重新计算，跨行合并只在受影响的窗口上执行，
+        小范围修改时几乎立即返回；结果与完整后处理一致。
+
+        :param assignmentId: 作业ID
+        :param body: code 为待后处理的代码；lineScores 为可选的逐行置信度（与 code 的行一一对应）
+        :return: 修正后的代码与缓存命中情况
+        """
+    try:
+        if not assignmentId or not assignmentId.isdigit():
+            return validation_error_response(message="作业ID无效")
+
+        corrected, stats = await run_in_threadpool(ocr_v2.postprocess_code_incremental, body.code, body.lineScores)
+        return success_response(data={"correctedCode": corrected, **stats})
+
+    except Exception as e:
+        return service_error_response(message="服务器内部错误")
+
+
+@router.get("/api/assignments/{assignmentId}/ocr/profile")
+async def ocr_profile_api(assignmentId: str, db: AsyncSession = Depends(get_async_db)):
+    """
+        下载该作业最近一次慢 OCR 请求的采样剖析结果（需开启 OCR_PROFILE_ENABLED）。
+
+        :param assignmentId: 作业ID
+        :return: 折叠栈文本（每行 "根帧;...;叶帧 采样次数"），可直接交给 flamegraph.pl 或 speedscope 生成火焰图
+        """
+    try:
+        if not assignmentId or not assignmentId.isdigit():
+            return validation_error_response(message="作业ID无效")
+        assignment_id = int(assignmentId)
+
+        task = await async_task_crud.get_task_by_type(db, assignment_id, "ocr")
+        meta = (task.result_data or {}).get("profile") if task is not None else None
+        path = profiler.profile_path(meta) if meta else None
+        if path is None:
+            return validation_error_response(message="该作业没有剖析记录")
+
+        return FileResponse(path, media_type="text/plain; charset=utf-8",
+                            filename=f"assignment-{assignment_id}-ocr.folded")
+
+    except Exception as e:
+        return service_error_response(message="服务器内部错误")
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List
+
+from core.core_db import schemas
+from core.core_db.crud import user_crud, assignment_crud
+from core.core_db.database import get_db
+
+# ORM 版本的用户 / 作业接口（原 main_orm.py 中的独立应用），由 router.enter 与生产启动器合并到同一个应用
+router = APIRouter()
+
+
+# 用户接口
+@router.post("/users/", response_model=schemas.UserResponse)
+def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    db_user = user_crud.get_user_by_username(db, username=user.username)
+    if db_user:
+        raise HTTPException(status_code=400, detail="用户名已存在")
+    return user_crud.create_user(db=db, user=user)
+
+
+@router.get("/users/{user_id}", response_model=schemas.UserResponse)
+def read_user(user_id: int, db: Session = Depends(get_db)):
+    db_user = user_crud.get_user(db, user_id=user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="用户不存在")
+    return db_user
+
+
+@router.get("/users/", response_model=List[schemas.UserResponse])
+def read_users(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+    return user_crud.get_users(db, skip=skip, limit=limit)
+
+
+# 作业接口
+@router.post("/assignments/", response_model=schemas.AssignmentResponse)
+def create_assignment(assignment: schemas.AssignmentCreate, db: Session = Depends(get_db)):
+    return assignment_crud.create_assignment(db=db, assignment=assignment)
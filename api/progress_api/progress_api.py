@@ -0,0 +1,87 @@
+import asyncio
+import os
+
+from typing import Optional
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from common.res.response import validation_error_response, service_error_response
+
+from common.monitor import progress
+
+# 创建路由实例，添加API前缀和标签
+router = APIRouter()
+
+PROGRESS_KEEPALIVE_SECONDS = float(os.getenv('PROGRESS_KEEPALIVE_SECONDS', '15'))  # 无事件时发送心跳注释的间隔
+PROGRESS_STREAM_MAX_SECONDS = float(os.getenv('PROGRESS_STREAM_MAX_SECONDS', '600'))  # 单个连接的最长时间，到时由客户端重连
+
+# 表示一次接口调用结束的事件
+TERMINAL_EVENTS = ("done", "error")
+
+
+# 指定 run 时只转发这次运行的事件
+def _in_run(message, run: Optional[str]) -> bool:
+    return run is None or message["data"].get("run") == run
+
+
+async def _event_stream(request: Request, assignment_id: int, last_event_id, once: bool, run: Optional[str] = None):
+    subscription, backlog = progress.bus.subscribe(assignment_id, last_event_id)
+    try:
+        yield "retry: 3000\n\n"
+        for message in backlog:
+            if not _in_run(message, run):
+                continue
+            if once and message["event"] in TERMINAL_EVENTS:
+                if run is None and last_event_id is None:
+                    # 未指定运行的首次连接：历史中的 done / error 属于之前的调用，不是即将发起的这次
+                    continue
+                yield progress.format_sse(message)
+                return
+            yield progress.format_sse(message)
+        deadline = asyncio.get_running_loop().time() + PROGRESS_STREAM_MAX_SECONDS
+        while asyncio.get_running_loop().time() < deadline:
+            try:
+                message = await subscription.get(timeout=PROGRESS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            if not _in_run(message, run):
+                continue
+            yield progress.format_sse(message)
+            if once and message["event"] in TERMINAL_EVENTS:
+                return
+    finally:
+        progress.bus.unsubscribe(subscription)
+
+
+@router.get("/api/assignments/{assignmentId}/events")
+async def progress_events_api(assignmentId: str, request: Request, once: bool = False, run: Optional[str] = None):
+    """
+        作业处理进度事件流（Server-Sent Events）。
+
+        事件类型：status（排队/开始执行）、stage（阶段开始/结束及耗时）、line（识别出的代码行）、
+        done（接口调用完成，含识别代码 / 编译诊断 / 评分结果）、error（处理失败）。
+        断线重连时浏览器会带上 Last-Event-ID，只补发之后的事件。
+
+        :param assignmentId: 作业ID
+        :param once: 为 true 时收到第一个 done / error 事件后关闭连接；未指定 run 的首次连接不会因为
+                     历史中上一次调用的 done / error 而关闭
+        :param run: 只订阅该运行ID的事件（与调用 /ocr、/Compile_run、/report 时传的 runId 相同）
+        :return: text/event-stream 事件流
+        """
+    try:
+        if not assignmentId or not assignmentId.isdigit():
+            return validation_error_response(message="作业ID无效")
+        last_event_id = request.headers.get("Last-Event-ID")
+        last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+        if run is not None and not progress.RUN_ID_PATTERN.fullmatch(run):
+            return validation_error_response(message="run 只能包含字母、数字、下划线与连字符，且不超过 64 个字符")
+
+        return StreamingResponse(_event_stream(request, int(assignmentId), last_event_id, once, run),
+                                 media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    except Exception as e:
+        return service_error_response(message="服务器内部错误")
@@ -0,0 +1,129 @@
+# load_test_db.py
+"""
+同步 / 异步数据库路径的吞吐量对比（手动运行的压测脚本，不参与 pytest 收集）。
+
+对比三种路由写法在并发请求下的吞吐量:
+    sync-in-async: async def 路由中直接调用同步 CRUD（会阻塞事件循环）
+    sync-def:      def 路由调用同步 CRUD（由 FastAPI 放到线程池执行）
+    async:         async def 路由调用异步 CRUD
+
+用法:
+    python api/test/load_test_db.py --requests 2000 --concurrency 50
+    python api/test/load_test_db.py --sync-url postgresql://... --async-url postgresql+asyncpg://...
+默认使用临时目录下的 SQLite（aiosqlite）数据库。
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import httpx
+from fastapi import FastAPI, Depends
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from core.core_db.database import Base
+from core.core_db.crud import user_crud
+from core.core_db.async_crud import async_user_crud
+from core.core_db.models import User
+
+
+def build_app(sync_url, async_url, pool_size):
+    # 连接池按并发数设置，避免 async 路由中同步取连接时阻塞事件循环而与连接归还互相等待
+    sync_engine = create_engine(sync_url, pool_size=pool_size, max_overflow=pool_size)
+    Base.metadata.create_all(bind=sync_engine)
+    sync_session = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+    async_engine = create_async_engine(async_url, pool_size=pool_size, max_overflow=pool_size)
+    async_session = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    # 准备一条用户数据
+    with sync_session() as db:
+        user = db.query(User).filter(User.username == "load_test_user").first()
+        if user is None:
+            user = User(username="load_test_user", email="load_test@example.com", password_hash="x")
+            db.add(user)
+            db.commit()
+        user_id = user.id
+
+    def get_sync_db():
+        db = sync_session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with async_session() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/sync-in-async/users/{uid}")
+    async def sync_in_async(uid: int, db: Session = Depends(get_sync_db)):
+        return {"username": user_crud.get_user(db, uid).username}
+
+    @app.get("/sync-def/users/{uid}")
+    def sync_def(uid: int, db: Session = Depends(get_sync_db)):
+        return {"username": user_crud.get_user(db, uid).username}
+
+    @app.get("/async/users/{uid}")
+    async def async_route(uid: int, db: AsyncSession = Depends(get_async_db)):
+        return {"username": (await async_user_crud.get_user(db, uid)).username}
+
+    return app, user_id
+
+
+async def run_load(app, path, total, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as client:
+        remaining = iter(range(total))
+        latencies = []
+
+        async def worker():
+            for _ in remaining:
+                start = time.perf_counter()
+                resp = await client.get(path)
+                resp.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="同步 / 异步数据库路径吞吐量对比")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sync-url", default=None)
+    parser.add_argument("--async-url", default=None)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="load_test_db_")
+    db_file = os.path.join(tmp_dir, "load_test.db")
+    sync_url = args.sync_url or f"sqlite:///{db_file}"
+    async_url = args.async_url or f"sqlite+aiosqlite:///{db_file}"
+
+    app, user_id = build_app(sync_url, async_url, args.concurrency)
+    print(f"请求数={args.requests} 并发={args.concurrency}")
+    print(f"{'路径':<16}{'吞吐量(req/s)':>16}{'p50(ms)':>12}{'p95(ms)':>12}")
+    for name in ("sync-in-async", "sync-def", "async"):
+        result = asyncio.run(run_load(app, f"/{name}/users/{user_id}", args.requests, args.concurrency))
+        print(f"{name:<16}{result['rps']:>16.1f}{result['p50_ms']:>12.2f}{result['p95_ms']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
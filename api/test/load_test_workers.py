@@ -0,0 +1,118 @@
+# load_test_workers.py
+"""
+多进程启动器（serve.py）的吞吐量随工作进程数的扩展情况（手动运行的压测脚本，不参与 pytest 收集）。
+
+对每个工作进程数分别启动一次 serve.py，用固定并发压测同一个接口，输出吞吐量、延迟分位数与相对单进程的加速比。
+
+用法（在项目根目录执行）:
+    python api/test/load_test_workers.py --workers 1 2 4 --requests 3000 --concurrency 64
+    python api/test/load_test_workers.py --role ocr --method GET --path /api/monitor/stages
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import httpx
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def start_server(role, workers, port):
+    port_flag = "--ocr-port" if role == "ocr" else "--port"
+    workers_flag = "--ocr-workers" if role == "ocr" else "--workers"
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "--role", role, "--host", "127.0.0.1", port_flag, str(port),
+         workers_flag, str(workers)],
+        cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_ready(base_url, timeout=60.0):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/metrics")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("服务启动超时")
+
+
+async def run_load(base_url, method, path, total, concurrency):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker(client):
+        nonlocal errors
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                resp = await client.request(method, path)
+                if resp.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    ms = np.asarray(latencies) * 1000.0
+    return {
+        "throughput": total / elapsed,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="serve.py 多进程吞吐量压测")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--role", default="api", choices=("api", "ocr", "all"))
+    parser.add_argument("--method", default="POST")
+    parser.add_argument("--path", default="/api/assignments/1/Compile_run")
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=18000)
+    args = parser.parse_args()
+
+    print(f"cpu_count={os.cpu_count()} role={args.role} {args.method} {args.path}")
+    print(f"{'workers':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}{'speedup':>9}")
+    baseline = None
+    for n in args.workers:
+        server = start_server(args.role, n, args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            asyncio.run(wait_ready(base_url))
+            # 预热：让每个工作进程都建立好连接与缓存
+            asyncio.run(run_load(base_url, args.method, args.path, min(200, args.requests), args.concurrency))
+            result = asyncio.run(run_load(base_url, args.method, args.path, args.requests, args.concurrency))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        baseline = baseline or result["throughput"]
+        print(f"{n:>8}{result['throughput']:>10.1f}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+              f"{result['errors']:>8}{result['throughput'] / baseline:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import asyncio
+import pytest
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.Compile_run import run_api
+from common.admission.admission import AdmissionController, AdmissionRejected
+from common.res.response import ResponseCode, error_response
+
+
+def test_rejection_codes_map_to_429_and_503():
+    assert error_response(ResponseCode.TOO_MANY_REQUESTS.value)[1] == 429
+    assert error_response(ResponseCode.SERVICE_BUSY.value)[1] == 503
+
+
+def test_rejected_route_returns_status_and_retry_after(monkeypatch):
+    app = FastAPI()
+    app.include_router(run_api.router)
+    client = TestClient(app)
+
+    monkeypatch.setattr(run_api, "compile_admission", AdmissionController("compile", 0, 0, 2.5))
+    busy = client.post("/api/assignments/1/Compile_run")
+    assert busy.status_code == 503
+    assert busy.headers["Retry-After"] == "3"
+    assert busy.json()["code"] == ResponseCode.SERVICE_BUSY.value
+
+    controller = AdmissionController("compile", 1, 0, 1, per_user_limit=1)
+    asyncio.run(controller.acquire("user:teacher"))
+    monkeypatch.setattr(run_api, "compile_admission", controller)
+    limited = client.post("/api/assignments/1/Compile_run", headers={"X-User-Id": "teacher"})
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"] == "1"
+    assert limited.json()["code"] == ResponseCode.TOO_MANY_REQUESTS.value
+
+
+def test_full_queue_and_wait_timeout_are_rejected():
+    async def run():
+        controller = AdmissionController("t", max_concurrent=1, max_queue=1, queue_timeout=0.05, per_user_limit=0)
+        await controller.acquire("a")
+        waiting = asyncio.create_task(controller.acquire("b"))
+        await asyncio.sleep(0)
+        assert controller.queued() == 1
+
+        with pytest.raises(AdmissionRejected) as full:
+            await controller.acquire("c")
+        assert full.value.code == ResponseCode.SERVICE_BUSY.value
+
+        with pytest.raises(AdmissionRejected) as timeout:
+            await waiting
+        assert timeout.value.reason == "timeout"
+        assert controller.queued() == 0
+
+        controller.release("a")
+        assert controller.snapshot()["active"] == 0
+        assert controller.snapshot()["rejected"] == {"queue_full": 1, "timeout": 1}
+
+    asyncio.run(run())
+
+
+def test_per_user_limit():
+    async def run():
+        controller = AdmissionController("t", max_concurrent=4, max_queue=8, queue_timeout=1, per_user_limit=2)
+        await controller.acquire("teacher")
+        await controller.acquire("teacher")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("teacher")
+        assert rejected.value.code == ResponseCode.TOO_MANY_REQUESTS.value
+        await controller.acquire("student")
+
+    asyncio.run(run())
+
+
+def test_freed_slots_rotate_between_users():
+    async def run():
+        controller = AdmissionController("t", max_concurrent=1, max_queue=8, queue_timeout=5, per_user_limit=0)
+        order = []
+
+        async def job(user, name):
+            async with controller.admit(user):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await controller.acquire("teacher")
+        tasks = [asyncio.create_task(job("teacher", f"t{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(job("student", "s0")))
+        await asyncio.sleep(0)
+        controller.release("teacher")
+        await asyncio.gather(*tasks)
+        # 学生的请求排在老师的批量请求之后提交，但只需等待老师的一个请求
+        assert order == ["t0", "s0", "t1", "t2"]
+
+    asyncio.run(run())
+
+
+def test_interactive_requests_go_first_and_bulk_ages():
+    async def run():
+        controller = AdmissionController("t", max_concurrent=1, max_queue=8, queue_timeout=5, per_user_limit=0,
+                                         aging_seconds=0.05)
+        order = []
+
+        async def job(user, name, priority):
+            async with controller.admit(user, priority):
+                order.append(name)
+
+        await controller.acquire("holder")
+        tasks = [asyncio.create_task(job("teacher", f"b{i}", "bulk")) for i in range(2)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(job("student", "i0", "interactive")))
+        await asyncio.sleep(0)
+        controller.release("holder")
+        await asyncio.gather(*tasks)
+        # 后到的 interactive 请求先获得名额
+        assert order == ["i0", "b0", "b1"]
+
+        # bulk 请求排队超过 aging_seconds 后，不再被新到的 interactive 请求插队
+        order.clear()
+        await controller.acquire("holder")
+        tasks = [asyncio.create_task(job("teacher", "b2", "bulk"))]
+        await asyncio.sleep(0.1)
+        tasks.append(asyncio.create_task(job("student", "i1", "interactive")))
+        await asyncio.sleep(0)
+        controller.release("holder")
+        await asyncio.gather(*tasks)
+        assert order == ["b2", "i1"]
+
+        waits = controller.snapshot()["wait_by_priority"]
+        assert waits["bulk"]["count"] == 3 and waits["bulk"]["max_ms"] >= 100
+
+    asyncio.run(run())
@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from core.core_db.async_database import create_pooled_async_engine
+from core.core_db.database import Base
+from core.core_db.async_crud import async_user_crud, async_assignment_crud, async_task_crud
+from core.core_db.schemas import UserCreate, UserUpdate, AssignmentCreate, TaskUpdate
+import bcrypt
+
+
+@pytest.fixture(scope="function")
+def async_session_factory(tmp_path):
+    """为每个测试函数创建独立的 aiosqlite 数据库"""
+    engine = create_pooled_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+def test_async_user_crud(async_session_factory):
+    """测试异步用户创建、查询、更新与删除"""
+
+    async def run():
+        async with async_session_factory() as db:
+            user = await async_user_crud.create_user(db, UserCreate(
+                username="async_user", email="async@example.com", password="secret", role="student"))
+            assert user.id is not None
+            assert bcrypt.checkpw(b"secret", user.password_hash.encode('utf-8'))
+
+            found = await async_user_crud.get_user_by_username(db, "async_user")
+            assert found.id == user.id
+
+            updated = await async_user_crud.update_user(db, user.id, UserUpdate(role="teacher"))
+            assert updated.role == "teacher"
+
+            assert await async_user_crud.delete_user(db, user.id) is True
+            assert await async_user_crud.get_user(db, user.id) is None
+
+    asyncio.run(run())
+
+
+def test_async_assignment_and_tasks(async_session_factory):
+    """测试异步作业创建与初始任务"""
+
+    async def run():
+        async with async_session_factory() as db:
+            user = await async_user_crud.create_user(db, UserCreate(
+                username="owner", email="owner@example.com", password="pw"))
+            assignment = await async_assignment_crud.create_assignment(db, AssignmentCreate(
+                original_image_path="/uploads/a.jpg", user_id=user.id))
+
+            await async_task_crud.create_initial_tasks(db, assignment.id)
+            tasks = await async_task_crud.get_tasks_by_assignment(db, assignment.id)
+            assert sorted(t.task_type for t in tasks) == sorted(
+                ["image_processing", "ocr", "code_correction", "compilation", "scoring"])
+
+            updated = await async_task_crud.update_task(db, tasks[0].id, TaskUpdate(status="completed"))
+            assert updated.status == "completed"
+
+            assignments = await async_assignment_crud.get_assignments_by_user(db, user.id)
+            assert [a.id for a in assignments] == [assignment.id]
+
+    asyncio.run(run())
+
+
+def test_async_bulk_assignments_with_tasks(async_session_factory):
+    """测试批量创建作业及其全部阶段任务（单个事务，返回顺序与输入一致）"""
+
+    async def run():
+        async with async_session_factory() as db:
+            paths = [f"/uploads/{i}.jpg" for i in range(3)]
+            assignments = await async_assignment_crud.create_assignments_bulk(
+                db, [AssignmentCreate(original_image_path=p) for p in paths])
+            assert [a.original_image_path for a in assignments] == paths
+
+            for a in assignments:
+                tasks = await async_task_crud.get_tasks_by_assignment(db, a.id)
+                assert sorted(t.task_type for t in tasks) == sorted(
+                    ["image_processing", "ocr", "code_correction", "compilation", "scoring"])
+                assert {t.priority for t in tasks} == {"interactive"}
+
+            # 批量重批的任务记录优先级与提交者
+            bulk = await async_assignment_crud.create_assignments_bulk(
+                db, [AssignmentCreate(original_image_path="/uploads/bulk.jpg")], priority="bulk")
+            tasks = await async_task_crud.get_tasks_by_assignment(db, bulk[0].id)
+            assert {t.priority for t in tasks} == {"bulk"}
+
+            assert await async_assignment_crud.create_assignments_bulk(db, []) == []
+
+    asyncio.run(run())
+
+
+def test_async_paginate_assignments_with_details(async_session_factory):
+    """测试异步作业详情分页（预加载关系，离开会话后仍可访问）"""
+
+    async def run():
+        async with async_session_factory() as db:
+            await async_assignment_crud.create_assignments_bulk(
+                db, [AssignmentCreate(original_image_path=f"/uploads/{i}.jpg") for i in range(3)])
+            page = await async_assignment_crud.paginate_assignments_with_details(db, page=1, page_size=2)
+            detail = await async_assignment_crud.get_assignment_with_details(db, page.items[0].id)
+            clamped = await async_assignment_crud.paginate_assignments_with_details(db, page=0, page_size=0)
+        assert (page.total, page.total_pages, len(page.items)) == (3, 2, 2)
+        assert len(page.items[0].tasks) == 5 and page.items[0].score is None
+        assert len(detail.tasks) == 5 and detail.image_processes == []
+        assert (clamped.page, clamped.page_size, len(clamped.items)) == (1, 1, 1)
+
+    asyncio.run(run())
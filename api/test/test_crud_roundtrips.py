@@ -0,0 +1,185 @@
+import pytest
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.pool import StaticPool
+
+from core.core_db.database import Base, SessionLocal
+from core.core_db.models import User, Score, ImageProcess
+from core.core_db.crud import (
+    user_crud, assignment_crud, task_crud, INITIAL_TASK_TYPES, TASK_KEYSET, MAX_PAGE_SIZE,
+    encode_cursor, _keyset_stmt, _tasks_query
+)
+from core.core_db.init_db import create_missing_indexes
+from core.core_db.schemas import AssignmentCreate, AssignmentUpdate, TaskUpdate
+
+
+@pytest.fixture(scope="function")
+def counted_db():
+    """内存 SQLite 会话（配置与生产的 SessionLocal 相同，只替换引擎），并统计执行的 SQL 语句数（即数据库往返次数）"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    counter = {"statements": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(*args):
+        counter["statements"] += 1
+
+    db = SessionLocal(bind=engine)
+    assert db.expire_on_commit
+    try:
+        yield db, counter
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_assignment_lifecycle_round_trips(counted_db):
+    """测试一份作业完整流水线中每次状态更新只需一次往返"""
+    db, counter = counted_db
+
+    assignment = assignment_crud.create_assignments_bulk(db, [AssignmentCreate(original_image_path="/a.jpg")])[0]
+    tasks = task_crud.get_tasks_by_assignment(db, assignment.id)
+
+    counter["statements"] = 0
+    for task in tasks:
+        processing = task_crud.update_task(db, task.id, TaskUpdate(status="processing"))
+        assert processing.status == "processing"
+        done = task_crud.update_task(db, task.id, TaskUpdate(status="completed", processing_time=5))
+        assert (done.id, done.status, done.processing_time) == (task.id, "completed", 5)
+    updated = assignment_crud.update_assignment(db, assignment.id, AssignmentUpdate(status="completed"))
+    assert updated.status == "completed"
+    assert counter["statements"] == 2 * len(INITIAL_TASK_TYPES) + 1
+
+
+def test_batched_task_status_update(counted_db):
+    """测试批量更新任务状态只需一次往返，且会话中已加载的对象同步为新值"""
+    db, counter = counted_db
+    assignment = assignment_crud.create_assignments_bulk(db, [AssignmentCreate(original_image_path="/a.jpg")])[0]
+    tasks = task_crud.get_tasks_by_assignment(db, assignment.id)
+
+    counter["statements"] = 0
+    updated = task_crud.update_tasks_status(db, [t.id for t in tasks], "failed", error_message="timeout")
+    assert counter["statements"] == 1
+    assert sorted(t.id for t in updated) == sorted(t.id for t in tasks)
+    assert all(t.status == "failed" and t.error_message == "timeout" for t in tasks)
+    assert task_crud.update_tasks_status(db, [], "failed") == []
+
+
+def test_update_missing_row_returns_none(counted_db):
+    """测试更新不存在的记录时返回 None"""
+    db, _ = counted_db
+    assert task_crud.update_task(db, 999, TaskUpdate(status="completed")) is None
+    assert assignment_crud.update_assignment(db, 999, AssignmentUpdate()) is None
+
+
+def _class_of(db, n):
+    """创建 n 份带任务、评分与图像处理记录的作业，返回作业ID"""
+    assignments = assignment_crud.create_assignments_bulk(
+        db, [AssignmentCreate(original_image_path=f"/{i}.jpg") for i in range(n)])
+    assignment_ids = [a.id for a in assignments]
+    for assignment_id in assignment_ids:
+        db.add(Score(assignment_id=assignment_id, final_score=90))
+        db.add(ImageProcess(assignment_id=assignment_id, process_step="deskew"))
+    db.commit()
+    db.expunge_all()
+    return assignment_ids
+
+
+@pytest.mark.parametrize("class_size", [3, 12])
+def test_class_overview_constant_queries(counted_db, class_size):
+    """测试作业详情分页的查询条数与班级人数无关，且序列化时不再触发懒加载"""
+    db, counter = counted_db
+    _class_of(db, class_size)
+
+    counter["statements"] = 0
+    page = assignment_crud.paginate_assignments_with_details(db, page=1, page_size=50)
+    # count + 主查询（JOIN score）+ tasks IN 查询 + image_processes IN 查询
+    assert counter["statements"] == 4
+    assert page.total == class_size and page.total_pages == 1
+    assert all(len(a.tasks) == len(INITIAL_TASK_TYPES) and a.score.final_score == 90
+               and [p.process_step for p in a.image_processes] == ["deskew"] for a in page.items)
+
+
+def test_assignment_with_details_single(counted_db):
+    """测试单个作业详情查询与分页边界"""
+    db, counter = counted_db
+    assignment_ids = _class_of(db, 5)
+
+    counter["statements"] = 0
+    detail = assignment_crud.get_assignment_with_details(db, assignment_ids[2])
+    assert counter["statements"] == 3
+    assert len(detail.tasks) == len(INITIAL_TASK_TYPES) and detail.score is not None
+    assert assignment_crud.get_assignment_with_details(db, 999) is None
+
+    page = assignment_crud.paginate_assignments_with_details(db, page=2, page_size=2)
+    assert [a.id for a in page.items] == [assignment_ids[2], assignment_ids[3]]
+    assert (page.total, page.total_pages) == (5, 3)
+    assert assignment_crud.paginate_assignments_with_details(db, user_ids=[42]).total == 0
+
+    # 非法分页参数被规范到合法范围，不会产生负数 OFFSET 或取出全表
+    first = assignment_crud.paginate_assignments_with_details(db, page=0, page_size=-3)
+    assert (first.page, first.page_size, [a.id for a in first.items]) == (1, 1, [assignment_ids[0]])
+    capped = assignment_crud.paginate_assignments_with_details(db, page=-1, page_size=10 ** 6)
+    assert (capped.page, capped.page_size, len(capped.items)) == (1, MAX_PAGE_SIZE, 5)
+
+
+def test_keyset_pagination_walks_all_rows(counted_db):
+    """测试游标分页逐页遍历时不重复、不遗漏"""
+    db, _ = counted_db
+    users = [User(username=f"u{i}", email=f"u{i}@example.com", password_hash="x") for i in range(5)]
+    db.add_all(users)
+    db.commit()
+    assignments = assignment_crud.create_assignments_bulk(
+        db, [AssignmentCreate(original_image_path=f"/{i}.jpg", user_id=users[0].id) for i in range(7)])
+
+    seen, cursor = [], None
+    for _ in range(len(assignments)):
+        page, cursor = assignment_crud.get_assignments_by_user_page(db, users[0].id, cursor, limit=3)
+        seen.extend(a.id for a in page)
+        if cursor is None:
+            break
+    assert seen == sorted((a.id for a in assignments), reverse=True)
+
+    page, cursor = user_crud.get_users_page(db, limit=2)
+    page2, _ = user_crud.get_users_page(db, cursor, limit=2)
+    assert [u.id for u in page + page2] == [u.id for u in users[:4]]
+
+    task_crud.update_tasks_status(db, [t.id for t in task_crud.get_tasks_by_assignment(db, assignments[0].id)],
+                                  "completed")
+    ocr, cursor = task_crud.get_tasks_by_status_page(db, "pending", task_type="ocr", limit=4)
+    rest, last = task_crud.get_tasks_by_status_page(db, "pending", task_type="ocr", cursor=cursor, limit=4)
+    assert len(ocr) == 4 and len(rest) == 2 and last is None
+    assert all(t.task_type == "ocr" and t.status == "pending" for t in ocr + rest)
+
+    with pytest.raises(ValueError):
+        task_crud.get_tasks_by_status_page(db, "pending", cursor="not-a-cursor")
+
+
+def test_task_queue_query_uses_composite_index(counted_db):
+    """测试任务队列查询命中 (task_type, status, id) 复合索引"""
+    db, _ = counted_db
+    stmt = _keyset_stmt(_tasks_query("pending", "ocr"), TASK_KEYSET, encode_cursor([10]), 50)
+    compiled = stmt.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+    plan = " ".join(str(row) for row in db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+    assert "ix_tasks_type_status_id" in plan
+
+
+def test_create_missing_indexes_on_existing_tables():
+    """测试为旧库中已存在的表补建索引"""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            table.create(conn, checkfirst=True)
+            for index in table.indexes:
+                index.drop(conn)
+
+    create_missing_indexes(engine)
+
+    index_names = {ix["name"] for ix in inspect(engine).get_indexes("tasks")}
+    assert {"ix_tasks_assignment_type", "ix_tasks_type_status_id", "ix_tasks_status_id"} <= index_names
+    create_missing_indexes(engine)  # 重复执行不报错
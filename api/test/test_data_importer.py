@@ -0,0 +1,80 @@
+import pytest
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from core.core_db import password_hasher
+from core.core_db.database import Base
+from core.core_db.models import User, Assignment, Task
+from src.Importer import data_importer
+
+
+@pytest.fixture(scope="function")
+def db(monkeypatch):
+    """内存 SQLite 会话；测试中使用最低 bcrypt 成本因子"""
+    monkeypatch.setattr(password_hasher, "BCRYPT_ROUNDS", 4)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, expire_on_commit=False)()
+    yield session
+    session.close()
+    password_hasher.shutdown()
+
+
+def _write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+
+
+def _count(db, model):
+    return db.scalar(select(func.count()).select_from(model))
+
+
+def test_import_tree_dedup_and_resume(db, tmp_path):
+    """测试导入目录：创建学生与作业、相同内容只存一份、重复执行时跳过已导入文件"""
+    data, storage = tmp_path / "Data", tmp_path / "storage"
+    _write(data / "2024001" / "test1" / "a.jpg", b"page-a")
+    _write(data / "2024001" / "test2" / "a.jpg", b"page-a")  # 与 test1 内容相同
+    _write(data / "2024002" / "test1" / "b.JPG", b"page-b")
+    _write(data / "2024002" / "test1" / "notes.txt", b"ignored")
+
+    stats = data_importer.import_data_tree(db, data, storage, io_workers=2, batch_size=2)
+
+    assert (stats["files"], stats["imported"], stats["skipped"]) == (3, 3, 0)
+    assert (stats["created_users"], stats["deduplicated"]) == (2, 1)
+    # 学号可被猜到，导入的账号不能用学号登录
+    student = db.scalars(select(User).where(User.username == "2024001")).one()
+    assert not password_hasher.verify_password("2024001", student.password_hash)
+    assert _count(db, Assignment) == 3
+    assert _count(db, Task) == 3 * 5
+    paths = db.scalars(select(Assignment.original_image_path).order_by(Assignment.id)).all()
+    assert paths[0] == paths[1] and open(paths[2], "rb").read() == b"page-b"
+    assert not list(storage.rglob("*.part"))
+
+    # 模拟中断后补充新文件再次执行：已导入的跳过，已有学生不重复创建
+    _write(data / "2024002" / "test2" / "c.jpg", b"page-c")
+    stats = data_importer.import_data_tree(db, data, storage)
+
+    assert (stats["imported"], stats["skipped"], stats["created_users"]) == (1, 3, 0)
+    assert _count(db, Assignment) == 4
+    assert _count(db, User) == 2
+
+
+def test_import_key_is_idempotent_and_scoped_to_root(db, tmp_path):
+    """测试幂等键随作业一起入库：重复执行不会重复导入；相同相对路径在不同导入根目录下视为不同文件"""
+    first, second, storage = tmp_path / "Data", tmp_path / "Data2", tmp_path / "storage"
+    _write(first / "2024001" / "test1" / "a.jpg", b"page-a")
+    _write(second / "2024001" / "test1" / "a.jpg", b"page-a")
+
+    data_importer.import_data_tree(db, first, storage)
+    keys = db.scalars(select(Assignment.import_key)).all()
+    assert keys == [data_importer._import_key(first, "2024001/test1/a.jpg")]
+
+    assert data_importer.import_data_tree(db, first, storage)["imported"] == 0
+    assert data_importer.import_data_tree(db, second, storage)["imported"] == 1
+    assert _count(db, Assignment) == 2
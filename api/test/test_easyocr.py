@@ -0,0 +1,79 @@
+import sys
+import os
+import types
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.EasyOCR import EasyOCR
+
+
+# 替身 easyocr 模块：记录每次创建的 Reader，readtext 返回固定结果
+class FakeReader:
+    created = []
+
+    def __init__(self, langs, gpu=False):
+        self.langs = langs
+        self.gpu = gpu
+        FakeReader.created.append(self)
+
+    def readtext(self, image, **kwargs):
+        return [([[0, 0], [10, 0], [10, 5], [0, 5]], "int main() {", 0.91),
+                ([[0, 8], [4, 8], [4, 13], [0, 13]], "}", 0.5)]
+
+
+@pytest.fixture
+def fake_easyocr(monkeypatch):
+    FakeReader.created = []
+    monkeypatch.setitem(sys.modules, "easyocr", types.SimpleNamespace(Reader=FakeReader))
+    monkeypatch.setattr(EasyOCR, "_readers", {})
+    monkeypatch.setattr(EasyOCR, "_reader_locks", {})
+    return FakeReader
+
+
+def test_readers_are_cached_per_langs_and_gpu(fake_easyocr):
+    reader = EasyOCR.get_reader(("en",), gpu=False)
+    assert EasyOCR.get_reader(["en"], gpu=False) is reader
+    assert EasyOCR.get_reader(("en",), gpu=0) is reader
+
+    gpu_reader = EasyOCR.get_reader(("en",), gpu=True)
+    zh_reader = EasyOCR.get_reader(("ch_sim", "en"), gpu=False)
+    assert len({id(reader), id(gpu_reader), id(zh_reader)}) == 3
+    assert len(fake_easyocr.created) == 3
+    assert (gpu_reader.gpu, zh_reader.langs) == (True, ["ch_sim", "en"])
+    assert set(EasyOCR._reader_locks) == {id(r) for r in fake_easyocr.created}
+
+
+@pytest.mark.parametrize("flag, expected", [
+    ("1", True), ("true", True), (" YES ", True),
+    ("0", False), ("false", False), ("", False), ("no", False),
+])
+def test_easyocr_gpu_env_overrides_detection(monkeypatch, fake_easyocr, flag, expected):
+    monkeypatch.setenv("EASYOCR_GPU", flag)
+    assert EasyOCR._use_gpu() is expected
+    assert EasyOCR.get_reader().gpu is expected
+
+
+def test_gpu_defaults_to_cuda_detection(monkeypatch):
+    monkeypatch.delenv("EASYOCR_GPU", raising=False)
+    monkeypatch.setitem(sys.modules, "torch", None)  # 未安装 torch
+    assert EasyOCR._use_gpu() is False
+
+    cuda = types.SimpleNamespace(is_available=lambda: True)
+    monkeypatch.setitem(sys.modules, "torch", types.SimpleNamespace(cuda=cuda))
+    assert EasyOCR._use_gpu() is True
+
+
+def test_results_to_page_matches_paddle_layout(monkeypatch, fake_easyocr):
+    monkeypatch.setenv("EASYOCR_GPU", "0")
+    page = EasyOCR.results_to_page(EasyOCR.ocr_recognition("image", langs=("en",)))
+    assert page == {
+        "rec_texts": ["int main() {", "}"],
+        "rec_scores": [0.91, 0.5],
+        "rec_polys": [[[0.0, 0.0], [10.0, 0.0], [10.0, 5.0], [0.0, 5.0]],
+                      [[0.0, 8.0], [4.0, 8.0], [4.0, 13.0], [0.0, 13.0]]],
+    }
+    assert all(isinstance(v, float) for poly in page["rec_polys"] for point in poly for v in point)
+    assert EasyOCR.results_to_page([]) == {"rec_texts": [], "rec_scores": [], "rec_polys": []}
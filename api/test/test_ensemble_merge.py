@@ -0,0 +1,34 @@
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.Ensemble.ensemble_ocr import merge_lines
+
+KEYWORDS = ["int", "return", "cout"]
+
+
+def _line(text, score, y0, y1):
+    return {"text": text, "score": score, "box": [100.0, y0, 400.0, y1], "indent": 0}
+
+
+def test_merge_picks_keyword_valid_then_higher_score():
+    """测试逐行择优：优先取含关键字的一方，否则取置信度更高的一方"""
+    paddle = [_line("imt main() {", 0.95, 100, 140), _line("    retumn 0;", 0.6, 160, 200)]
+    easy = [_line("int main() {", 0.7, 102, 142), _line("retumm 0;", 0.9, 158, 198)]
+
+    merged = merge_lines(paddle, easy, KEYWORDS)
+
+    # 第一行只有 EasyOCR 含关键字；第二行两者都不含，取置信度更高的 EasyOCR 结果并沿用 Paddle 的缩进
+    assert [ln["text"] for ln in merged] == ["int main() {", "    retumm 0;"]
+
+
+def test_unmatched_secondary_lines_need_keywords():
+    """测试未对齐的行：主引擎全部保留，辅助引擎只补入含关键字的行"""
+    paddle = [_line("int x;", 0.9, 100, 140)]
+    easy = [_line("int x;", 0.8, 100, 140), _line("noise", 0.99, 300, 340), _line("return x;", 0.9, 400, 440)]
+
+    merged = merge_lines(paddle, easy, KEYWORDS)
+
+    assert [ln["text"] for ln in merged] == ["int x;", "return x;"]
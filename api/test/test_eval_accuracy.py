@@ -0,0 +1,49 @@
+import json
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from benchmark.eval_accuracy import edit_distance, error_rates, pareto_frontier, run_evaluation
+from benchmark.pipeline_bench import file_sha256
+
+
+def test_error_rates():
+    """测试字符/行错误率（忽略缩进与空行）"""
+    truth = "int main() {\n    return 0;\n}\n"
+
+    assert error_rates("int main() {\nreturn 0;\n\n}", truth) == (0.0, 0.0)
+    cer, ler = error_rates("int main() {\n    retum 0;\n}\n", truth)
+    assert abs(cer - 2 / len("int main() {\nreturn 0;\n}")) < 1e-9
+    assert abs(ler - 1 / 3) < 1e-9
+    assert edit_distance("kitten", "sitting") == 3
+
+
+def test_pareto_frontier():
+    """测试前沿只保留更慢但更准的配置"""
+    points = [("fast", 100, 0.30), ("slow-worse", 400, 0.35), ("mid", 200, 0.20), ("slow", 500, 0.10)]
+    assert pareto_frontier(points) == ["fast", "mid", "slow"]
+
+
+def test_run_evaluation_from_cached_ocr(tmp_path):
+    """测试使用缓存的 OCR 结果评估（不加载识别模型）"""
+    image = tmp_path / "Data" / "2024001" / "test1" / "a.jpg"
+    image.parent.mkdir(parents=True)
+    image.write_bytes(b"fake-image")
+    image.with_suffix(".cpp").write_text("int main() {\n    return 0;\n}\n", encoding="utf-8")
+    # 没有标准答案的图片不参与评估
+    (image.parent / "b.jpg").write_bytes(b"other")
+
+    cache = tmp_path / "cache" / "paddle-server-pro" / f"{file_sha256(image)}.json"
+    cache.parent.mkdir(parents=True)
+    pages = [{"rec_texts": ["int main() {", "return 0;", "}"], "rec_scores": [0.9, 0.9, 0.9]}]
+    cache.write_text(json.dumps({"pages": pages, "ocr_seconds": 0.5}), encoding="utf-8")
+
+    report = run_evaluation(tmp_path / "Data", [{"engine": "paddle", "preprocess": "pro", "postprocess": "none"}],
+                            cache_dir=tmp_path / "cache", workers=1)
+
+    result = report["configs"]["paddle-server-pro-none"]
+    assert report["meta"]["images_with_truth"] == 1
+    assert (result["images"], result["cache_hits"], result["cer"], result["compile_rate"]) == (1, 1, 0.0, 1.0)
+    assert report["frontier"] == ["paddle-server-pro-none"]
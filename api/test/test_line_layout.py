@@ -0,0 +1,58 @@
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.PaddleOCR.line_layout import extract_code_lines, group_lines, lines_to_code_string
+
+
+def _box(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def test_lines_ordered_by_geometry():
+    """测试按 y 聚类成行、行内按 x 排序，而不是按识别输出顺序"""
+    page = {
+        "rec_texts": ["return 0;", "int", "main() {", "}"],
+        "rec_scores": [0.9, 0.8, 0.95, 0.99],
+        "rec_polys": [
+            _box(140, 210, 320, 250),
+            _box(100, 100, 160, 140),
+            _box(180, 104, 340, 144),
+            _box(100, 320, 120, 360),
+        ],
+    }
+
+    lines = extract_code_lines([page])
+
+    assert [ln["text"].strip() for ln in lines] == ["int main() {", "return 0;", "}"]
+    # 行内置信度按字符数加权
+    assert abs(lines[0]["score"] - (0.8 * 3 + 0.95 * 8) / 11) < 1e-9
+
+
+def test_indentation_recovered_from_x_offset():
+    """测试由行首 x 偏移恢复缩进"""
+    texts = ["void f() {", "x = 1;", "}"]
+    polys = [_box(100, 100, 300, 140), _box(140, 160, 260, 200), _box(100, 220, 120, 260)]
+
+    lines = group_lines(texts, [1.0, 1.0, 1.0], polys)
+
+    assert lines_to_code_string(lines) == "void f() {\n    x = 1;\n}\n"
+    assert [ln["indent"] for ln in lines] == [0, 1, 0]
+
+
+def test_missing_polys_falls_back_to_emitted_order():
+    """测试缺少坐标时按识别输出顺序成行"""
+    page = {"rec_texts": ["a", "", "b"], "rec_scores": [0.5, 0.1, 0.7]}
+
+    lines = extract_code_lines(page)
+
+    assert lines_to_code_string(lines) == "a\nb\n"
+    assert [ln["score"] for ln in lines] == [0.5, 0.7]
+
+
+def test_empty_results():
+    """测试空结果"""
+    assert extract_code_lines(None) == []
+    assert lines_to_code_string(extract_code_lines([{"rec_texts": []}])) == ""
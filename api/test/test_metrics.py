@@ -0,0 +1,85 @@
+import pytest
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.monitor_api.monitor import router as monitor_router
+from common.monitor import stage_timer
+from common.monitor.collectors import register_default_collectors
+from common.monitor.metrics import MetricsMiddleware, Registry, http_requests_total, start_metrics_server
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    register_default_collectors()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    app.include_router(monitor_router)
+    with TestClient(app) as c:
+        yield c
+
+
+def test_histogram_render_is_cumulative():
+    registry = Registry()
+    h = registry.histogram("job_seconds", "耗时", ("kind",), buckets=(0.1, 1.0))
+    h.observe(0.05, kind="a")
+    h.observe(0.5, kind="a")
+    h.observe(5, kind="a")
+    text = registry.render()
+    assert 'job_seconds_bucket{kind="a",le="0.1"} 1' in text
+    assert 'job_seconds_bucket{kind="a",le="1"} 2' in text
+    assert 'job_seconds_bucket{kind="a",le="+Inf"} 3' in text
+    assert 'job_seconds_count{kind="a"} 3' in text
+    assert "# TYPE job_seconds histogram" in text
+
+
+def test_requests_are_labelled_by_route_template(client):
+    before = http_requests_total.value(method="GET", route="/items/{item_id}", status="200")
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/no-such-path")
+    assert http_requests_total.value(method="GET", route="/items/{item_id}", status="200") == before + 2
+    assert http_requests_total.value(method="GET", route="<unmatched>", status="404") >= 1
+
+
+def test_metrics_endpoint_exposes_stage_and_threadpool_metrics(client):
+    with stage_timer.stage("llm_scoring"):
+        pass
+    client.get("/items/3")
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    assert 'pipeline_stage_duration_seconds_count{stage="llm_scoring"}' in body
+    assert "threadpool_capacity" in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/items/{item_id}"' in body
+
+
+def test_metrics_server_exposes_registry_on_its_own_port():
+    from urllib.error import HTTPError
+    from urllib.request import urlopen
+
+    registry = Registry()
+    registry.counter("worker_jobs_total", "任务数").inc(3)
+    server = start_metrics_server("127.0.0.1", 0, registry)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urlopen(f"{base}/metrics") as resp:
+            assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "worker_jobs_total 3" in resp.read().decode("utf-8")
+        with pytest.raises(HTTPError) as exc:
+            urlopen(f"{base}/other")
+        assert exc.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.OCRWorker import ocr_worker
+from src.OCRWorker.ocr_worker import OCRWorkerServer, OCRWorkerClient, parse_address
+
+AUTHKEY = b"test-authkey"
+
+
+class FakeEngine:
+    """按批计时的假引擎：每批固定耗时，返回以路径为文本的页结果"""
+
+    def __init__(self, batch_seconds=0.05):
+        self.batch_seconds = batch_seconds
+        self.batch_sizes = []
+        self._lock = threading.Lock()
+
+    def __call__(self, paths):
+        with self._lock:
+            self.batch_sizes.append(len(paths))
+        if any(isinstance(p, str) and p == "bad.jpg" for p in paths):
+            raise FileNotFoundError("bad.jpg")
+        time.sleep(self.batch_seconds)
+        # 图片数组（如局部重新识别的裁剪图）以尺寸作为文本
+        return [[{"rec_texts": [p if isinstance(p, str) else f"array{p.shape}"], "rec_scores": [1.0], "rec_polys": []}]
+                for p in paths]
+
+
+@pytest.fixture
+def worker(tmp_path):
+    engine = FakeEngine()
+    server = OCRWorkerServer(engine, str(tmp_path / "ocr.sock"), authkey=AUTHKEY,
+                             batch_window_ms=30, max_batch=8).start()
+    client = OCRWorkerClient(server.address, authkey=AUTHKEY, timeout=10)
+    yield server, client, engine
+    client.close()
+    server.stop()
+
+
+def test_parse_address():
+    assert parse_address("/tmp/ocr.sock") == "/tmp/ocr.sock"
+    assert parse_address("127.0.0.1:9000") == ("127.0.0.1", 9000)
+
+
+def test_concurrent_jobs_are_batched_and_routed_back(worker):
+    server, client, engine = worker
+    paths = [f"img{i}.jpg" for i in range(16)]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(client.recognize, paths))
+
+    assert [r[0]["rec_texts"][0] for r in results] == paths
+    assert max(engine.batch_sizes) > 1
+    assert all(size <= 8 for size in engine.batch_sizes)
+    stats = client.stats()
+    assert stats["jobs"] == 16
+    assert stats["batches"] == len(engine.batch_sizes)
+
+
+def test_failing_image_only_fails_its_own_job(worker):
+    server, client, engine = worker
+    futures = [client.submit(p) for p in ("a.jpg", "bad.jpg", "b.jpg")]
+    assert futures[0].result(timeout=10)[0]["rec_texts"] == ["a.jpg"]
+    with pytest.raises(RuntimeError, match="FileNotFoundError"):
+        futures[1].result(timeout=10)
+    assert futures[2].result(timeout=10)[0]["rec_texts"] == ["b.jpg"]
+
+
+def test_region_crops_are_sent_to_the_worker(worker, monkeypatch):
+    """测试配置了工作进程时，局部重新识别的裁剪图交给工作进程识别（API 进程不加载模型）"""
+    from src.RegionOCR import region_ocr
+    server, client, engine = worker
+    monkeypatch.setattr(ocr_worker, "get_client", lambda: client)
+
+    pages = region_ocr.paddle_pages(np.zeros((10, 20, 3), dtype=np.uint8))
+
+    assert pages[0]["rec_texts"] == ["array(10, 20, 3)"]
+    assert "src.PaddleOCR.PaddleOCR" not in sys.modules or not sys.modules["src.PaddleOCR.PaddleOCR"]._ocr_engines
+
+
+def test_cancelled_job_does_not_break_the_connection(worker):
+    """测试调用方超时取消任务后，迟到的结果被丢弃，后续任务照常返回"""
+    server, client, engine = worker
+    future = client.submit("slow.jpg")
+    future.cancel()  # 与 asyncio.wait_for 超时时 wrap_future 的行为相同
+    time.sleep(0.2)  # 等迟到的结果到达
+
+    assert client.recognize("next.jpg")[0]["rec_texts"] == ["next.jpg"]
+
+
+def test_worker_requires_authkey_and_private_socket(worker, tmp_path):
+    """测试未配置密钥时拒绝启动，套接字文件只有当前用户可访问"""
+    server, _, _ = worker
+    assert os.stat(server.address).st_mode & 0o777 == 0o600
+    with pytest.raises(RuntimeError, match="OCR_WORKER_AUTHKEY"):
+        OCRWorkerServer(FakeEngine(), str(tmp_path / "other.sock"), authkey=b"")
+    with pytest.raises(RuntimeError, match="OCR_WORKER_AUTHKEY"):
+        OCRWorkerClient(server.address, authkey=b"")
+
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    shared.chmod(0o777)
+    with pytest.raises(RuntimeError, match="0700"):
+        OCRWorkerServer(FakeEngine(), str(shared / "ocr.sock"), authkey=AUTHKEY).start()
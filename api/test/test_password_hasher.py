@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.core_db import password_hasher
+from core.core_db.database import Base
+from core.core_db.crud import user_crud
+from core.core_db.schemas import UserBase, UserCreate
+
+
+@pytest.fixture(autouse=True)
+def fast_rounds(monkeypatch):
+    """测试中使用最低成本因子，结束后关闭进程池"""
+    monkeypatch.setattr(password_hasher, "BCRYPT_ROUNDS", 4)
+    yield
+    password_hasher.shutdown()
+
+
+def test_hash_passwords_in_pool():
+    """测试进程池批量哈希：顺序与输入一致，成本因子可配置"""
+    hashes = password_hasher.hash_passwords(["a", "b", "c"])
+
+    assert [password_hasher.verify_password(p, h) for p, h in zip("abc", hashes)] == [True, True, True]
+    assert all(h.startswith("$2b$04$") for h in hashes)
+    assert password_hasher.hash_password("d", rounds=5).startswith("$2b$05$")
+    assert password_hasher.hash_passwords([]) == []
+
+
+def test_hash_password_async():
+    """测试异步哈希不阻塞事件循环"""
+    async def run():
+        return await password_hasher.hash_passwords_async(["x", "y"])
+
+    hashes = asyncio.run(run())
+    assert password_hasher.verify_password("y", hashes[1])
+    assert not password_hasher.verify_password("x", hashes[1])
+
+
+def test_bulk_roster_import():
+    """测试批量导入班级名单：一次插入全部用户"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, expire_on_commit=False)()
+    roster = [UserCreate(username=f"s{i}", email=f"s{i}@example.com", password=f"pw{i}") for i in range(6)]
+
+    users = user_crud.create_users_bulk(db, roster)
+
+    assert [u.username for u in users] == [u.username for u in roster]
+    assert all(u.id is not None and u.role == "student" for u in users)
+    assert password_hasher.verify_password("pw3", users[3].password_hash)
+    db.close()
+
+
+def test_accounts_without_password_cannot_log_in_until_set():
+    """测试未设置密码的账号：任何密码（包括用户名）都校验失败，设置密码后才能登录"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, expire_on_commit=False)()
+
+    user, = user_crud.create_users_without_password_bulk(db, [UserBase(username="2024001", email="a@example.com")])
+
+    assert not password_hasher.has_usable_password(user.password_hash)
+    assert not password_hasher.verify_password("2024001", user.password_hash)
+    user = user_crud.set_password(db, user.id, "s3cret")
+    assert password_hasher.verify_password("s3cret", user.password_hash)
+    db.close()
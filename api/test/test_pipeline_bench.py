@@ -0,0 +1,35 @@
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from benchmark.pipeline_bench import summarize, compare_reports
+
+
+def test_summarize_percentiles():
+    """测试阶段耗时统计（秒 -> 毫秒分位数）"""
+    stats = summarize([i / 1000.0 for i in range(1, 101)])
+
+    assert stats["count"] == 100
+    assert abs(stats["p50_ms"] - 50.5) < 1e-6
+    assert abs(stats["p99_ms"] - 99.01) < 1e-6
+    assert stats["max_ms"] == 100.0
+    assert summarize([]) == {"count": 0}
+
+
+def test_compare_reports():
+    """测试与基线报告对比：计算各阶段分位数的变化百分比"""
+    old = {"stages": {"ocr": {"count": 3, "p50_ms": 100.0, "p95_ms": 200.0, "p99_ms": 250.0},
+                      "score": {"count": 0}},
+           "totals": {"throughput_images_per_s": 2.0, "peak_rss_mb": 900.0}}
+    new = {"stages": {"ocr": {"count": 3, "p50_ms": 80.0, "p95_ms": 220.0, "p99_ms": 250.0},
+                      "score": {"count": 0}},
+           "totals": {"throughput_images_per_s": 2.5, "peak_rss_mb": 950.0}}
+
+    diff = compare_reports(old, new)
+
+    assert diff["ocr"]["p50_ms"]["change_pct"] == -20.0
+    assert diff["ocr"]["p95_ms"]["change_pct"] == 10.0
+    assert "score" not in diff
+    assert diff["totals"]["throughput_images_per_s"] == {"old": 2.0, "new": 2.5}
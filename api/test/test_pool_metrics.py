@@ -0,0 +1,49 @@
+import sys
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from core.core_db.database import MonitoredQueuePool, get_pool_metrics
+
+
+@pytest.fixture
+def small_engine(tmp_path):
+    # 单连接、不允许溢出的连接池，第二个连接请求必然等待并超时
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=MonitoredQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    yield engine
+    engine.dispose()
+
+
+def test_pool_metrics_shape_and_wait_stats(small_engine):
+    with small_engine.connect() as conn:
+        conn.execute(text("select 1"))
+        busy = get_pool_metrics(small_engine)
+        assert (busy["checked_out"], busy["checked_in"]) == (1, 0)
+
+        with pytest.raises(PoolTimeoutError):
+            small_engine.connect()
+
+    metrics = get_pool_metrics(small_engine)
+    assert set(metrics) == {"status", "pool_size", "max_overflow", "checked_out", "checked_in", "overflow", "wait"}
+    assert (metrics["pool_size"], metrics["max_overflow"]) == (1, 0)
+    assert (metrics["checked_out"], metrics["checked_in"]) == (0, 1)
+    assert set(metrics["wait"]) == {"count", "avg_ms", "max_ms", "timeouts"}
+    assert metrics["wait"]["count"] == 2
+    assert metrics["wait"]["timeouts"] == 1
+    assert metrics["wait"]["max_ms"] >= 50
+
+
+def test_wait_stats_survive_dispose(small_engine):
+    with small_engine.connect():
+        pass
+    small_engine.dispose()
+    with small_engine.connect():
+        pass
+    assert isinstance(small_engine.pool, MonitoredQueuePool)
+    assert get_pool_metrics(small_engine)["wait"]["count"] == 2
@@ -0,0 +1,63 @@
+import pytest
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.PaddleOCR.ocr_v2 import postprocess_code, postprocess_code_incremental, LineCache
+
+
+def test_low_confidence_lines_get_full_correction():
+    """测试低置信行（或未提供置信度）仍执行激进改写与关键字模糊匹配"""
+    code = "i = buffer[top];\nretrun 0"
+
+    assert postprocess_code(code) == "i = buffer[++top];\nreturn 0;"
+    assert postprocess_code(code, line_scores=[0.3, 0.4]) == "i = buffer[++top];\nreturn 0;"
+
+
+def test_high_confidence_lines_skip_aggressive_rewrites():
+    """测试高置信行跳过 buffer[top] -> buffer[++top] 之类的激进改写"""
+    code = "i = buffer[top];\nretrun 0"
+
+    corrected = postprocess_code(code, line_scores=[0.99, 0.5])
+
+    assert corrected == "i = buffer[top];\nreturn 0;"
+
+
+def test_safe_rules_apply_to_confident_lines():
+    """测试安全规则（如重复 <<）对高置信行同样生效"""
+    corrected = postprocess_code('cout << << "hi";', line_scores=[0.99])
+
+    assert corrected == 'cout << "hi";'
+
+
+def test_mismatched_scores_fall_back_to_full_treatment():
+    """测试置信度与行数对不上时按低置信处理"""
+    assert postprocess_code("retrun 0", line_scores=[0.99, 0.99]) == "return 0;"
+
+
+def test_incremental_matches_full_postprocess():
+    """测试增量后处理与完整后处理结果一致（含跨行合并与噪声行）"""
+    code = "int main() {\n日期\n  i = buffer[top];\n\n   top--;\nretrun 0\n[\n}"
+    for scores in (None, [0.99] * 8, [0.3, 0.99, 0.99, 0.5, 0.2, 0.99, 0.1, 0.99]):
+        corrected, _ = postprocess_code_incremental(code, line_scores=scores, cache=LineCache())
+        assert corrected == postprocess_code(code, line_scores=scores)
+
+
+def test_incremental_only_recomputes_edited_lines():
+    """测试修改一行后重新提交，只有该行重新计算"""
+    cache = LineCache()
+    code = "int main() {\n    i = buffer[top];\n    top--;\n    retrun 0\n}"
+    _, stats = postprocess_code_incremental(code, cache=cache)
+    assert stats == {"lines": 5, "cacheHits": 0, "recomputed": 5}
+
+    edited = code.replace("retrun 0", "retrun 1")
+    corrected, stats = postprocess_code_incremental(edited, cache=cache)
+    assert stats == {"lines": 5, "cacheHits": 4, "recomputed": 1}
+    assert corrected == postprocess_code(edited)
+    assert corrected.endswith("return 1;")
+
+    # 同一行在不同置信度档位下分别缓存
+    _, stats = postprocess_code_incremental(edited, line_scores=[0.99] * 5, cache=cache)
+    assert stats["recomputed"] == 5
@@ -0,0 +1,53 @@
+import pytest
+import sys
+import os
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from common.monitor import profiler, stage_timer
+
+
+def _busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < end:
+        n += 1
+    return n
+
+
+def test_disabled_profiler_returns_none(monkeypatch):
+    monkeypatch.setattr(profiler, "OCR_PROFILE_ENABLED", False)
+    assert profiler.start_profile() is None
+    assert profiler.active_profile() is None
+
+
+def test_samples_only_threads_running_stages(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiler, "OCR_PROFILE_ENABLED", True)
+    monkeypatch.setattr(profiler, "OCR_PROFILE_INTERVAL_MS", 1.0)
+
+    profile = profiler.start_profile()
+    assert profiler.active_profile() is profile
+    _busy_loop(0.05)  # 不在阶段中，不应被采样
+    with stage_timer.stage("predict"):
+        _busy_loop(0.2)
+    profiler.stop_profile(profile)
+    assert profiler.active_profile() is None
+
+    assert profile.samples > 0
+    folded = profile.folded()
+    for line in folded.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert "test_samples_only_threads_running_stages" in stack
+    assert "_busy_loop" in folded
+    assert profiler.is_slow(profile, threshold_ms=100)
+    assert not profiler.is_slow(profile, threshold_ms=10_000)
+
+    meta = profiler.save_profile(profile, 7, profile_dir=tmp_path)
+    path = profiler.profile_path(meta, profile_dir=tmp_path)
+    assert path.read_text(encoding="utf-8") == folded
+    assert meta["samples"] == profile.samples
+    # 元信息中的路径不能越出剖析目录
+    assert profiler.profile_path({"file": "../../etc/passwd"}, profile_dir=tmp_path) is None
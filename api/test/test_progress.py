@@ -0,0 +1,120 @@
+import asyncio
+import json
+import threading
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.progress_api import progress_api
+from common.monitor import progress
+from common.monitor.stage_timer import stage
+
+
+def test_backlog_and_live_events_from_worker_threads():
+    bus = progress.ProgressBus(history=10)
+
+    async def run():
+        first = bus.publish(1, "status", state="queued")
+        bus.publish(2, "status", state="queued")
+        subscription, backlog = bus.subscribe(1)
+        assert [m["id"] for m in backlog] == [first["id"]]
+
+        # 线程池中发布的事件交给订阅者所在的事件循环
+        worker = threading.Thread(target=bus.publish, args=(1, "line"), kwargs={"index": 0, "text": "int main() {"})
+        worker.start()
+        worker.join()
+        message = await subscription.get(timeout=1)
+        assert message["event"] == "line" and message["data"]["text"] == "int main() {"
+
+        # 断线重连：只补发 Last-Event-ID 之后的事件
+        _, backlog = bus.subscribe(1, last_event_id=first["id"])
+        assert [m["event"] for m in backlog] == ["line"]
+
+        bus.unsubscribe(subscription)
+        assert bus.subscriber_count() == 1
+
+    asyncio.run(run())
+
+
+def test_stages_publish_start_and_end_inside_channel():
+    async def run():
+        subscription, _ = progress.bus.subscribe(101)
+        with stage("compile"):
+            pass  # 不在 channel 中，不发布
+        with progress.channel(101):
+            with stage("compile", in_chars=12):
+                pass
+        events = [await subscription.get(timeout=1) for _ in range(2)]
+        progress.bus.unsubscribe(subscription)
+        assert [e["data"]["state"] for e in events] == ["start", "end"]
+        assert events[1]["data"]["sizes"] == {"in_chars": 12}
+        assert subscription.queue.empty()
+
+    asyncio.run(run())
+
+
+def test_sse_endpoint_replays_until_done():
+    app = FastAPI()
+    app.include_router(progress_api.router)
+    progress.bus.publish(202, "line", run="r1", index=0, text="return 0;")
+    progress.bus.publish(202, "done", run="r1", route="ocr", recognizedCode="return 0;\n")
+    progress.bus.publish(202, "done", run="r2", route="compile", compileSuccess=True)
+
+    response = TestClient(app).get("/api/assignments/202/events?once=true&run=r1")
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = [f for f in response.text.split("\n\n") if f.startswith("id:")]
+    assert [f.split("\n")[1] for f in frames] == ["event: line", "event: done"]
+    data = json.loads(frames[1].split("data: ", 1)[1])
+    assert (data["run"], data["recognizedCode"]) == ("r1", "return 0;\n")
+
+    body, _ = TestClient(app).get("/api/assignments/202/events?run=bad%20id").json()
+    assert body["code"] == 1001
+
+
+class _ConnectedRequest:
+    async def is_disconnected(self):
+        return False
+
+
+def test_once_ignores_previous_runs_terminal_event():
+    """未指定 run 的首次连接：历史中上一次调用的 done 不会让事件流立即关闭，等到本次调用的 done"""
+    async def run():
+        progress.bus.publish(303, "done", run="old", route="ocr", recognizedCode="old")
+        stream = progress_api._event_stream(_ConnectedRequest(), 303, None, once=True)
+        assert await stream.__anext__() == "retry: 3000\n\n"
+
+        with progress.channel(303):
+            progress.publish("status", route="ocr", state="running")
+            progress.publish("done", route="ocr", recognizedCode="new")
+            current = progress.current_run()
+        frames = [frame async for frame in stream]
+        events = [json.loads(f.split("data: ", 1)[1]) for f in frames]
+        assert [e["run"] for e in events] == [current, current]
+        assert events[-1]["recognizedCode"] == "new"
+
+    asyncio.run(run())
+
+
+def test_route_publishes_events_under_client_run_id(monkeypatch):
+    from api.Compile_run import run_api
+    monkeypatch.setattr(run_api.run_api, "compile_run", lambda code: {"data": {
+        "language": "cpp", "codeLengthBytes": len(code), "submitTime": 0, "evalTime": 0,
+        "compileSuccess": True, "output": "Hello, World!\n", "error": ""}})
+    app = FastAPI()
+    app.include_router(run_api.router)
+    app.include_router(progress_api.router)
+    client = TestClient(app)
+
+    body, _ = client.post("/api/assignments/404/Compile_run?runId=compile-1").json()
+    assert body["code"] == 0
+    frames = client.get("/api/assignments/404/events?once=true&run=compile-1").text
+    done = [f for f in frames.split("\n\n") if "event: done" in f]
+    assert json.loads(done[0].split("data: ", 1)[1])["run"] == "compile-1"
+
+    body, _ = client.post("/api/assignments/404/Compile_run?runId=not%20valid").json()
+    assert body["code"] == 1001
@@ -0,0 +1,77 @@
+import asyncio
+import sys
+import os
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from multiprocessing import AuthenticationError
+
+from common.monitor import progress
+from common.monitor.progress_relay import ProgressRelay, RelayClient
+
+AUTHKEY = b"test-relay-key"
+
+
+@pytest.fixture
+def relay(tmp_path):
+    server = ProgressRelay(str(tmp_path / "relay" / "relay.sock"), AUTHKEY).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def buses(relay):
+    # 两个总线各自连接中继，模拟 api 池与 ocr 池中的两个工作进程
+    api_bus, ocr_bus = progress.ProgressBus(history=10), progress.ProgressBus(history=10)
+    for bus in (api_bus, ocr_bus):
+        bus.connect_relay(relay.address, AUTHKEY)
+    yield api_bus, ocr_bus
+    for bus in (api_bus, ocr_bus):
+        bus.close_relay()
+
+
+def test_events_published_in_one_process_reach_the_other(relay, buses):
+    api_bus, ocr_bus = buses
+    assert oct(os.stat(relay.address).st_mode & 0o777) == oct(0o600)
+
+    async def run():
+        subscription, _ = ocr_bus.subscribe(7)
+        api_subscription, _ = api_bus.subscribe(7)
+        api_bus.publish(7, "compile", run="r1", ok=True)
+        compiled = await subscription.get(timeout=2)
+        assert (compiled["event"], compiled["data"]) == ("compile", {"run": "r1", "ok": True})
+        ocr_bus.publish(7, "done", run="r1")
+        done = await subscription.get(timeout=2)
+        assert done["event"] == "done" and done["id"] > compiled["id"]
+
+        # 发布者自己也从中继收到事件，两个进程的历史相同，断线后重连到另一个进程时 Last-Event-ID 仍然有效
+        assert [(await api_subscription.get(timeout=2))["id"] for _ in range(2)] == [compiled["id"], done["id"]]
+        _, backlog = api_bus.subscribe(7, last_event_id=compiled["id"])
+        assert [(m["id"], m["event"]) for m in backlog] == [(done["id"], "done")]
+
+    asyncio.run(run())
+
+
+def test_publish_falls_back_to_local_delivery_without_relay(relay, buses):
+    api_bus, _ = buses
+    relay.stop()
+
+    async def run():
+        subscription, _ = api_bus.subscribe(3)
+        for _ in range(50):  # 中继关闭后连接断开需要一点时间
+            message = api_bus.publish(3, "status", state="queued")
+            if "id" in message:
+                break
+            await asyncio.sleep(0.05)
+        assert "id" in message
+        assert (await subscription.get(timeout=1))["id"] == message["id"]
+
+    asyncio.run(run())
+
+
+def test_relay_rejects_wrong_authkey(relay):
+    with pytest.raises(AuthenticationError):
+        RelayClient(lambda message: None, relay.address, b"wrong").connect(timeout=0)
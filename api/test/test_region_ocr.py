@@ -0,0 +1,186 @@
+import numpy as np
+import pytest
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.RegionOCR import region_ocr
+
+
+def _line(text, x0, y0, x1, y1, indent=0):
+    return {"text": " " * (4 * indent) + text, "score": 0.9, "box": [x0, y0, x1, y1], "indent": indent}
+
+
+@pytest.fixture
+def layout():
+    return region_ocr.new_layout([
+        _line("int main() {", 10, 10, 130, 30),
+        _line("int x = 1;", 30, 40, 130, 60, indent=1),
+        _line("return 0;", 30, 70, 120, 90, indent=1),
+        _line("}", 10, 100, 20, 120),
+    ], "/uploads/a.jpg")
+
+
+def test_region_reocr_keeps_line_ids_and_untouched_lines(layout):
+    image = np.zeros((200, 300, 3), dtype=np.uint8)
+    crops = []
+
+    # 假识别：在裁剪图坐标中返回一行修正后的文本
+    def recognize_pages(crop):
+        crops.append(crop.shape)
+        return [{"rec_texts": ["int x = 42;"], "rec_scores": [0.99],
+                 "rec_polys": [[[8, 8], [108, 8], [108, 28], [8, 28]]]}]
+
+    # 区域只盖住第二行的一部分，会扩展到整行
+    new_layout, changes, regions = region_ocr.reocr_regions(layout, image, [[60, 45, 80, 55]], recognize_pages)
+
+    assert regions == [[22, 32, 138, 68]]
+    assert crops == [(36, 116, 3)]
+    assert [ln["id"] for ln in new_layout["lines"]] == ["L1", "L2", "L3", "L4"]
+    assert new_layout["lines"][1]["text"] == "    int x = 42;"
+    assert new_layout["lines"][1]["indent"] == 1
+    assert new_layout["lines"][2] == layout["lines"][2]
+    assert changes == {"updated": ["L2"], "added": [], "removed": []}
+
+
+def test_new_line_in_empty_region_gets_fresh_id(layout):
+    image = np.zeros((200, 300, 3), dtype=np.uint8)
+
+    def recognize_pages(crop):
+        return [{"rec_texts": ["x++;"], "rec_scores": [0.95],
+                 "rec_polys": [[[22, 10], [70, 10], [70, 26], [22, 26]]]}]
+
+    new_layout, changes, _ = region_ocr.reocr_regions(layout, image, [[30, 130, 200, 150]], recognize_pages)
+    assert changes["added"] == ["L5"]
+    assert new_layout["lines"][-1]["id"] == "L5"
+
+
+def test_changed_regions_finds_only_the_edited_area():
+    old = np.full((200, 300, 3), 255, dtype=np.uint8)
+    new = old.copy()
+    new[50:70, 100:180] = 0
+    regions = region_ocr.changed_regions(old, new)
+    assert len(regions) == 1
+    x0, y0, x1, y1 = regions[0]
+    assert x0 <= 100 and y0 <= 50 and x1 >= 180 and y1 >= 70
+    assert (x1 - x0) * (y1 - y0) < 300 * 200 / 4
+
+
+def test_region_patch_saves_composite_and_points_layout_at_it(layout, tmp_path):
+    import cv2
+    original, patch = tmp_path / "a.png", tmp_path / "patch.png"
+    cv2.imwrite(str(original), np.full((200, 300, 3), 255, dtype=np.uint8))
+    cv2.imwrite(str(patch), np.zeros((20, 40, 3), dtype=np.uint8))
+
+    def recognize_pages(crop):
+        return [{"rec_texts": [], "rec_scores": [], "rec_polys": []}]
+
+    new_layout, _, regions = region_ocr.reocr(layout, str(original), [200, 150, 240, 170], str(patch),
+                                              recognize_pages=recognize_pages)
+
+    # 之后的识别读取合成图：补拍区域是新像素，其余保持原图
+    assert new_layout["image_path"] == str(region_ocr.composite_path(patch))
+    composite = cv2.imread(new_layout["image_path"])
+    assert composite[160, 220].tolist() == [0, 0, 0]
+    assert composite[10, 10].tolist() == [255, 255, 255]
+
+
+@pytest.fixture
+def region_client(tmp_path, monkeypatch, layout):
+    """局部重识别路由：上传目录放在临时目录，已保存的识别结果直接返回固定的 layout"""
+    from types import SimpleNamespace
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from api.ocr_api import ocr
+    from api.upload_img import upload_api
+    from core.core_db.async_database import get_async_db
+
+    monkeypatch.setattr(upload_api, "UPLOAD_DIR", tmp_path / "uploads")
+
+    async def latest(db, assignment_id, step):
+        return SimpleNamespace(process_result=layout)
+
+    async def no_db():
+        yield None
+
+    monkeypatch.setattr(ocr.async_image_process_crud, "get_latest_image_process", latest)
+    app = FastAPI()
+    app.include_router(ocr.router)
+    app.dependency_overrides[get_async_db] = no_db
+    return TestClient(app), ocr, upload_api.UPLOAD_DIR
+
+
+def test_region_patch_is_removed_when_rejected_or_reocr_fails(region_client, monkeypatch):
+    from common.admission.admission import AdmissionController
+    client, ocr, upload_dir = region_client
+    form = {"x0": "0", "y0": "0", "x1": "40", "y1": "20"}
+    patch = {"image": ("patch.png", b"patch")}
+
+    monkeypatch.setattr(ocr, "ocr_admission", AdmissionController("ocr", 0, 0, 1))
+    assert client.post("/api/assignments/1/ocr/region", data=form, files=patch).status_code == 503
+    assert list(upload_dir.iterdir()) == []
+
+    def invalid_region(layout, image_path, region, new_image_path):
+        region_ocr.composite_path(new_image_path).write_bytes(b"composite")
+        raise ValueError("补拍图片与区域尺寸不一致")
+
+    monkeypatch.setattr(ocr, "ocr_admission", AdmissionController("ocr", 1, 1, 1))
+    monkeypatch.setattr(ocr.region_ocr, "reocr", invalid_region)
+    body, _ = client.post("/api/assignments/1/ocr/region", data=form, files=patch).json()
+    assert body["code"] != 0
+    assert list(upload_dir.iterdir()) == []
+
+
+class FakePaddleOCR:
+    """替身 PaddleOCR：把暗色笔画的连通域当作文本框。启用文档方向分类或矫正时，像真实引擎一样先把倒置的页面
+    转正再检测，检测框随之落在转正后的图上"""
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.transforms = kwargs.get("use_doc_orientation_classify") or kwargs.get("use_doc_unwarping")
+
+    def predict(self, image):
+        import cv2
+        if self.transforms:
+            image = cv2.rotate(image, cv2.ROTATE_180)
+        mask = (image[..., 0] < 128).astype(np.uint8)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(cv2.dilate(mask, np.ones((3, 9), np.uint8)))
+        boxes = sorted((int(y), int(x), int(x + w), int(y + h)) for x, y, w, h, area in stats[1:count] if area >= 20)
+        return [{"rec_texts": [f"line {y0}" for y0, *_ in boxes], "rec_scores": [0.9] * len(boxes),
+                 "rec_polys": [np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]]) for y0, x0, x1, y1 in boxes]}]
+
+
+def test_full_and_region_ocr_share_original_coordinates_on_rotated_page(tmp_path, monkeypatch):
+    import cv2
+    from types import SimpleNamespace
+    from src.PaddleOCR import PaddleOCR, line_layout
+
+    monkeypatch.setitem(sys.modules, "paddleocr", SimpleNamespace(PaddleOCR=FakePaddleOCR))
+    monkeypatch.setattr(PaddleOCR, "_ocr_engines", {})
+
+    # 倒着拍的一页：两行“代码”，第二行缩进
+    page = np.full((200, 300, 3), 255, dtype=np.uint8)
+    cv2.rectangle(page, (20, 30), (200, 38), (0, 0, 0), -1)
+    cv2.rectangle(page, (60, 70), (260, 78), (0, 0, 0), -1)
+    path = tmp_path / "rotated.png"
+    cv2.imwrite(str(path), cv2.rotate(page, cv2.ROTATE_180))
+    image = cv2.imread(str(path))
+
+    layout = region_ocr.new_layout(line_layout.extract_code_lines(PaddleOCR.paddle_ocr(str(path))), str(path))
+    engine = PaddleOCR.get_ocr_engine()
+    assert not engine.kwargs["use_doc_orientation_classify"] and not engine.kwargs["use_doc_unwarping"]
+
+    # 完整识别的行框是原图像素坐标：框中心落在原图的笔画上
+    assert len(layout["lines"]) == 2
+    for ln in layout["lines"]:
+        x0, y0, x1, y1 = ln["box"]
+        assert image[int((y0 + y1) / 2), int((x0 + x1) / 2)].tolist() == [0, 0, 0]
+
+    # 老师按原图坐标框选第一行：局部识别裁到的正是这一行，沿用原行ID，框的位置不变
+    first = layout["lines"][0]
+    new_layout, changes, _ = region_ocr.reocr(layout, str(path), first["box"])
+    assert changes == {"updated": [first["id"]], "added": [], "removed": []}
+    assert np.allclose(new_layout["lines"][0]["box"], first["box"], atol=3)
+    assert new_layout["lines"][1] == layout["lines"][1]
@@ -0,0 +1,113 @@
+import asyncio
+import pytest
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from fastapi.testclient import TestClient
+
+import serve
+from router import enter
+
+
+def test_default_workers_sized_from_cpu_count(monkeypatch):
+    monkeypatch.setattr(serve, "OCR_THREADS_PER_WORKER", 4)
+    assert serve.default_workers("api", cpu_count=8) == 8
+    assert serve.default_workers("ocr", cpu_count=8) == 2
+    assert serve.default_workers("ocr", cpu_count=2) == 1
+
+
+def test_ocr_role_only_mounts_ocr_and_monitor_routes():
+    client = TestClient(enter.router("ocr"))
+    paths = client.get("/openapi.json").json()["paths"]
+    assert "/api/assignments/{assignmentId}/ocr" in paths
+    assert "/api/assignments/{assignmentId}/events" in paths
+    assert "/api/assignments" not in paths
+    assert "/users/" not in paths
+
+    with pytest.raises(ValueError):
+        enter.router("gpu")
+
+
+def test_progress_stream_is_mounted_on_both_roles():
+    # 事件经中继广播到所有工作进程，api 池与 ocr 池都能提供 /events
+    assert "progress" in enter.ROLE_ROUTES["ocr"]
+    assert "progress" in enter.ROLE_ROUTES["api"]
+
+
+def test_preloading_ensemble_or_paddle_before_fork_is_rejected():
+    pool = serve.Pool("ocr", "127.0.0.1", 0, 1)
+    with pytest.raises(ValueError):
+        pool.prepare(["ensemble"])
+    with pytest.raises(ValueError, match="OCR_WARMUP_ENGINES"):
+        pool.prepare(["paddle"])
+
+
+def test_warm_up_only_runs_in_ocr_roles(monkeypatch):
+    warmed = []
+    monkeypatch.setattr(enter, "OCR_WARMUP_ENGINES", ["paddle"])
+    monkeypatch.setattr(enter, "warm_up_engines", lambda engines: warmed.append(list(engines)))
+
+    async def run(role):
+        async with enter.make_lifespan(role)(None):
+            pass
+
+    asyncio.run(run("api"))
+    assert warmed == []
+    asyncio.run(run("ocr"))
+    assert warmed == [["paddle"]]
+
+
+def test_lifespan_shuts_down_worker_processes(monkeypatch):
+    from src.Ensemble import ensemble_ocr
+    from core.core_db import password_hasher
+    calls = []
+    monkeypatch.setattr(ensemble_ocr, "shutdown", lambda: calls.append("ensemble"))
+    monkeypatch.setattr(password_hasher, "shutdown", lambda: calls.append("password_hasher"))
+
+    with TestClient(enter.router("ocr")):
+        assert calls == []
+    assert sorted(calls) == ["ensemble", "password_hasher"]
+
+
+def test_each_worker_keeps_its_own_metrics_port(monkeypatch):
+    api, ocr = serve.Pool("api", "127.0.0.1", 0, 3), serve.Pool("ocr", "127.0.0.1", 0, 2)
+    serve.assign_metrics_ports([api, ocr], 9300)
+    assert (api.metrics_port, ocr.metrics_port) == (9300, 9303)
+
+    pids = iter(range(100, 200))
+    monkeypatch.setattr(serve.os, "fork", lambda: next(pids))
+    for _ in range(ocr.workers):
+        ocr.spawn()
+    assert ocr.slots == {100: 0, 101: 1}
+
+    # 退出的工作进程在原序号（原指标端口）上重新拉起
+    assert ocr.respawn(100) == 102
+    assert ocr.pids == {101, 102}
+    assert ocr.slots == {101: 1, 102: 0}
+
+    disabled = serve.Pool("api", "127.0.0.1", 0, 2)
+    serve.assign_metrics_ports([disabled], 0)
+    assert disabled.metrics_port is None
+
+
+def test_relay_is_stopped_when_startup_fails(monkeypatch):
+    stopped = []
+
+    class FakeRelay:
+        def __init__(self):
+            monkeypatch.setenv("PROGRESS_RELAY_ADDRESS", "/tmp/unused.sock")
+
+        def start(self):
+            return 12345
+
+        def stop(self):
+            stopped.append(True)
+
+    monkeypatch.delenv("PROGRESS_RELAY_ADDRESS", raising=False)
+    monkeypatch.setattr(serve, "ProgressRelayProcess", FakeRelay)
+    with pytest.raises(ValueError):
+        serve.serve_prefork([serve.Pool("ocr", "127.0.0.1", 0, 1)], ["ensemble"], metrics_port=0)
+    assert stopped == [True]
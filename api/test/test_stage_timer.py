@@ -0,0 +1,190 @@
+import asyncio
+import pytest
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from common.monitor import stage_timer
+from core.core_db import stage_writer
+from core.core_db.async_database import create_pooled_async_engine
+from core.core_db.database import Base
+from core.core_db.async_crud import async_assignment_crud
+from core.core_db.models import ImageProcess, Task
+from core.core_db.schemas import AssignmentCreate
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    stage_timer.histograms.reset()
+    stage_timer.drain_pending()
+    yield
+    stage_timer.histograms.reset()
+    stage_timer.drain_pending()
+
+
+def test_histogram_and_error_counting():
+    """测试阶段计时计入直方图，异常会被记为错误并继续抛出"""
+
+    @stage_timer.timed_stage("compile", describe=lambda a, k, r, rec: rec.sizes.update(in_chars=len(a[0])))
+    def compile_code(code):
+        if not code:
+            raise ValueError("empty")
+        return code
+
+    compile_code("int main(){}")
+    with pytest.raises(ValueError):
+        compile_code("")
+
+    snap = stage_timer.histograms.snapshot()["compile"]
+    assert snap["count"] == 2
+    assert snap["errors"] == 1
+    assert sum(b["count"] for b in snap["buckets"]) == 2
+    # 不在作业上下文中的调用只进直方图，不写库
+    assert stage_timer.pending_count() == 0
+
+
+def test_describe_failure_does_not_break_call():
+    @stage_timer.timed_stage("extract", describe=lambda a, k, r, rec: 1 / 0)
+    def extract():
+        return [1, 2]
+
+    assert extract() == [1, 2]
+    assert stage_timer.histograms.snapshot()["extract"]["errors"] == 0
+
+
+def test_flush_writes_task_time_and_image_process(tmp_path):
+    """测试作业上下文中的记录被批量写入 ImageProcess 与 Task.processing_time"""
+    engine = create_pooled_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with factory() as db:
+            assignment, = await async_assignment_crud.create_assignments_bulk(
+                db, [AssignmentCreate(original_image_path="a.jpg")])
+
+        with stage_timer.assignment_context(assignment.id):
+            with stage_timer.stage("load") as rec:
+                rec.sizes["width"] = 10
+            with stage_timer.stage("predict") as rec:
+                rec.confidence = 0.9
+            with stage_timer.stage("postprocess"):
+                pass
+        with stage_timer.stage("load"):
+            pass
+
+        assert await stage_writer.flush(factory) == 3
+        assert await stage_writer.flush(factory) == 0
+
+        async with factory() as db:
+            steps = (await db.execute(select(ImageProcess).where(
+                ImageProcess.assignment_id == assignment.id))).scalars().all()
+            assert sorted(s.process_step for s in steps) == ["load", "predict"]
+            load = next(s for s in steps if s.process_step == "load")
+            assert load.process_result["sizes"] == {"width": 10}
+
+            tasks = {t.task_type: t.processing_time for t in (await db.execute(
+                select(Task).where(Task.assignment_id == assignment.id))).scalars()}
+            assert tasks["image_processing"] is not None
+            assert tasks["ocr"] is not None
+            assert tasks["code_correction"] is not None
+            assert tasks["compilation"] is None
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_failed_flush_puts_records_back(monkeypatch):
+    """测试写库失败时记录放回队列（不丢失），队列满时挤掉最旧的记录"""
+    class BrokenSession:
+        async def __aenter__(self):
+            raise ConnectionError("db down")
+
+        async def __aexit__(self, *exc):
+            return False
+
+    with stage_timer.assignment_context(1):
+        with stage_timer.stage("load"):
+            pass
+        with stage_timer.stage("predict"):
+            pass
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(stage_writer.flush(BrokenSession))
+    assert [r.stage for r in stage_timer.drain_pending()] == ["load", "predict"]
+
+    monkeypatch.setattr(stage_timer, "MAX_PENDING_RECORDS", 2)
+    monkeypatch.setattr(stage_timer, "_pending", stage_timer.deque(maxlen=2))
+    dropped = stage_timer.dropped_records()
+    stage_timer.requeue([stage_timer.StageRecord(name, 1) for name in ("a", "b", "c")])
+    assert [r.stage for r in stage_timer.drain_pending()] == ["b", "c"]
+    assert stage_timer.dropped_records() == dropped + 1
+
+
+def test_bad_record_is_isolated_and_the_rest_are_written(tmp_path):
+    """测试批次中一条违反外键的记录只放弃它自己，其余记录照常写入，之后的刷新不受影响"""
+    engine = create_pooled_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def enable_foreign_keys(conn, record):
+        conn.execute("PRAGMA foreign_keys=ON")
+
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with factory() as db:
+            assignment, = await async_assignment_crud.create_assignments_bulk(
+                db, [AssignmentCreate(original_image_path="a.jpg")])
+
+        for assignment_id in (assignment.id, assignment.id, 999, assignment.id):
+            with stage_timer.assignment_context(assignment_id):
+                with stage_timer.stage("load"):
+                    pass
+        rejected = stage_timer.rejected_records()
+
+        assert await stage_writer.flush(factory) == 3
+        assert stage_timer.rejected_records() == rejected + 1
+        assert stage_timer.pending_count() == 0
+
+        with stage_timer.assignment_context(assignment.id):
+            with stage_timer.stage("predict"):
+                pass
+        assert await stage_writer.flush(factory) == 1
+
+        async with factory() as db:
+            steps = (await db.execute(select(ImageProcess.process_step, ImageProcess.assignment_id))).all()
+        assert sorted(steps) == [("load", assignment.id)] * 3 + [("predict", assignment.id)]
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_records_are_given_up_after_max_attempts(monkeypatch):
+    """测试持续写库失败的记录重试 STAGE_FLUSH_MAX_ATTEMPTS 次后放弃"""
+    class BrokenSession:
+        async def __aenter__(self):
+            raise ConnectionError("db down")
+
+        async def __aexit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(stage_writer, "STAGE_FLUSH_MAX_ATTEMPTS", 3)
+    with stage_timer.assignment_context(1):
+        with stage_timer.stage("load"):
+            pass
+    rejected = stage_timer.rejected_records()
+
+    for attempt in range(3):
+        assert stage_timer.pending_count() == 1
+        with pytest.raises(ConnectionError):
+            asyncio.run(stage_writer.flush(BrokenSession))
+    assert stage_timer.pending_count() == 0
+    assert stage_timer.rejected_records() == rejected + 1
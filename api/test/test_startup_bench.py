@@ -0,0 +1,30 @@
+import pytest
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from benchmark.startup_bench import parse_importtime, group_by_package, measure_import
+
+
+def test_parse_importtime():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   numpy.core\n"
+        "import time:        30 |        150 | numpy\n"
+        "import time:        10 |         10 |     numpy.linalg\n"
+        "Traceback (most recent call last):\n"
+    )
+    entries = parse_importtime(stderr)
+    assert [e["module"] for e in entries] == ["numpy.core", "numpy", "numpy.linalg"]
+    assert [e["depth"] for e in entries] == [1, 0, 2]
+    assert group_by_package(entries) == {"numpy": 160}
+
+
+@pytest.mark.parametrize("module", ["src.PaddleOCR.ocr_v2", "src.EasyOCR.EasyOCR", "src.Ensemble.ensemble_ocr"])
+def test_engine_modules_do_not_import_heavy_libraries(module):
+    """识别模块导入时不应加载 paddleocr / easyocr / cv2 等，它们在首次使用或预热时才导入"""
+    ok, _, _, heavy, error = measure_import(module)
+    assert ok, error
+    assert heavy == []
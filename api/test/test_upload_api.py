@@ -0,0 +1,102 @@
+import asyncio
+import pytest
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from api.upload_img import upload_api
+from core.core_db.async_database import create_pooled_async_engine, get_async_db
+from core.core_db.database import Base
+from core.core_db.models import Assignment, Task
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """上传目录与数据库都放在临时目录中"""
+    monkeypatch.setattr(upload_api, "UPLOAD_DIR", tmp_path / "uploads")
+    engine = create_pooled_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+
+    async def get_db():
+        async with factory() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(upload_api.router)
+    app.dependency_overrides[get_async_db] = get_db
+    yield TestClient(app), factory
+    asyncio.run(engine.dispose())
+
+
+def _count_assignments(factory):
+    async def run():
+        async with factory() as db:
+            return await db.scalar(select(func.count()).select_from(Assignment))
+    return asyncio.run(run())
+
+
+# 各作业的 (id, 原图路径) 与其阶段任务的优先级集合
+def _assignments_and_priorities(factory):
+    async def run():
+        async with factory() as db:
+            assignments = (await db.execute(
+                select(Assignment.id, Assignment.original_image_path).order_by(Assignment.id))).all()
+            priorities = set((await db.scalars(select(Task.priority))).all())
+            return [tuple(a) for a in assignments], priorities
+    return asyncio.run(run())
+
+
+def test_batch_upload_creates_assignments(client):
+    client, factory = client
+    files = [("files", ("a.jpg", b"page-a")), ("files", ("b.jpg", b"page-b"))]
+    resp = client.post("/api/assignments/batch", files=files, data={"userId": "7"})
+
+    # 路由返回 (ApiResponse, HTTP状态码) 元组，序列化为 [响应体, 状态码]
+    assert resp.status_code == 200
+    body, status = resp.json()
+    assert (status, body["code"]) == (200, 0)
+
+    assignments, priorities = _assignments_and_priorities(factory)
+    assert body["data"] == [{"assignmentId": assignments[0][0], "fileName": "a.jpg"},
+                            {"assignmentId": assignments[1][0], "fileName": "b.jpg"}]
+    assert priorities == {"bulk"}
+    assert sorted(str(p) for p in upload_api.UPLOAD_DIR.iterdir()) == sorted(path for _, path in assignments)
+
+
+def test_single_upload_is_interactive(client):
+    client, factory = client
+    body, status = client.post("/api/assignments", files={"file": ("c.jpg", b"page-c")}).json()
+
+    assignments, priorities = _assignments_and_priorities(factory)
+    assert (status, body["code"]) == (200, 0)
+    assert body["data"] == {"assignmentId": assignments[0][0], "fileName": "c.jpg"}
+    assert priorities == {"interactive"}
+
+
+def test_failed_transaction_removes_written_files(client, monkeypatch):
+    """测试创建作业的事务失败时，已写入的上传文件被删除"""
+    async def fail(*args, **kwargs):
+        raise RuntimeError("db down")
+
+    client, factory = client
+    monkeypatch.setattr(upload_api.async_assignment_crud, "create_assignments_bulk", fail)
+    files = [("files", ("a.jpg", b"page-a")), ("files", ("b.jpg", b"page-b"))]
+
+    client.post("/api/assignments/batch", files=files)
+    client.post("/api/assignments", files={"file": ("c.jpg", b"page-c")})
+
+    assert _count_assignments(factory) == 0
+    assert list(upload_api.UPLOAD_DIR.iterdir()) == []
@@ -1,28 +1,96 @@
-from fastapi import FastAPI, HTTPException, APIRouter
+from fastapi import FastAPI, HTTPException, APIRouter, Depends
 from common.res.response import success_response, validation_error_response, service_error_response, ApiResponse
 
 from fastapi import UploadFile, File, Form
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
+import asyncio
+import os
 import uuid
 import aiofiles
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.core_db.async_database import get_async_db
+from core.core_db.async_crud import async_assignment_crud
+from core.core_db.schemas import AssignmentCreate
 
 # 创建路由实例，添加API前缀和标签
 router = APIRouter()
 
+# 初始图片上传目录（可通过环境变量 UPLOAD_DIR 指定）
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "C:/IT/AI/OCR/two_ocr/uploads/original_image  "))
+
 """
     FastAPI 利用 Form 和 File 依赖解析 multipart/form-data 数据：
     file: Optional[UploadFile] = File(None)：从 form-data 中提取 file 字段，封装为 UploadFile 对象，包含文件内容、文件名、MIME 类型等。
 """
 
 
+# 把上传文件以唯一文件名写入上传目录，返回保存路径
+async def save_upload(file: UploadFile) -> Path:
+    # 生成唯一的assignment_path_id
+    assignment_path_id = str(uuid.uuid4())
+
+    # 提取文件扩展名（如 '.jpg' 或 '.cpp'），使用assignment_path_id + 扩展名作为存储文件名，避免冲突
+    safe_name = f"{assignment_path_id}{Path(file.filename).suffix}"
+
+    # 定义初始图片上传目录
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+    # 构建文件保存路径
+    file_path = UPLOAD_DIR / safe_name
+
+    # 异步写入文件内容
+    async with aiofiles.open(file_path, 'wb') as out_file:
+        # 读取前端上传的文件内容（二进制数据）
+        content = await file.read()
+        # 写入到本地文件
+        await out_file.write(content)
+    return file_path
+
+
+# 删除已写入的上传文件（创建作业的事务失败时调用，避免留下没有作业记录的孤立文件）
+def remove_uploads(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# 并发写入全部上传文件；任一文件写入失败时删除其余已写入的文件
+async def save_uploads(files: List[UploadFile]) -> List[Path]:
+    results = await asyncio.gather(*(save_upload(f) for f in files), return_exceptions=True)
+    paths = [r for r in results if not isinstance(r, BaseException)]
+    for r in results:
+        if isinstance(r, BaseException):
+            remove_uploads(paths)
+            raise r
+    return paths
+
+
+# 为已写入的文件创建作业及其阶段任务（一个事务）；事务失败时回滚并删除这些文件
+async def create_assignments_for_uploads(db: AsyncSession, file_paths: List[Path], user_id: Optional[int],
+                                         priority: str = "interactive"):
+    try:
+        return await async_assignment_crud.create_assignments_bulk(db, [
+            AssignmentCreate(original_image_path=str(path), user_id=user_id) for path in file_paths
+        ], priority=priority, submitted_by=user_id)
+    except BaseException:
+        await db.rollback()
+        remove_uploads(file_paths)
+        raise
+
+
 @router.post("/api/assignments")
-async def ocr_api(file: Optional[UploadFile] = File(None)):
+async def ocr_api(file: Optional[UploadFile] = File(None), userId: Optional[int] = Form(None),
+                  db: AsyncSession = Depends(get_async_db)):
     """
     上传作业文件（支持图片或源码文件），从上传文件中提取文件名，服务端存储文件并返回唯一assignmentId。
 
     请求形式：multipart/form-data
     - file: 上传的文件内容，必填，文件名从 file.filename 提取
+    - userId: 提交作业的用户ID，可选
 
     响应：
     - 成功时返回 assignmentId 和 fileName（从 file.filename 获取）
@@ -48,32 +116,12 @@ async def ocr_api(file: Optional[UploadFile] = File(None)):
         if not fileName or not fileName.strip():
             raise validation_error_response("文件名不能为空或仅包含空格")
 
-        # 生成唯一的assignment_path_id
-        assignment_path_id = str(uuid.uuid4())
-
-        # 提取文件扩展名（如 '.jpg' 或 '.cpp'）
-        ext = Path(fileName).suffix
+        file_path = await save_upload(file)
+        # print("file_path:", file_path)
 
-        # 使用assignment_path_id + 扩展名作为存储文件名，避免冲突
-        safe_name = f"{assignment_path_id}{ext}"
-
-        # 定义初始图片上传目录
-        upload_dir = Path("C:/IT/AI/OCR/two_ocr/uploads/original_image  ")
-        upload_dir.mkdir(exist_ok=True)
-
-        # 构建文件保存路径
-        file_path = upload_dir / safe_name
-        # print("upload_dir:", upload_dir);print("safe_name:", safe_name);print("file_path:", file_path)
-
-        # 异步写入文件内容
-        async with aiofiles.open(file_path, 'wb') as out_file:
-            # 读取前端上传的文件内容（二进制数据）
-            content = await file.read()
-            # 写入到本地文件
-            await out_file.write(content)
-
-        """ file_path根据查询数据库（where file_path == original_image_path），找到上传图片的id """
-        assignment_id = 1
+        # 作业与全部阶段任务在同一个事务中创建
+        assignments = await create_assignments_for_uploads(db, [file_path], userId)
+        assignment_id = assignments[0].id
 
         # 准备响应数据，回显从file.filename获取的fileName
         data = {
@@ -92,3 +140,45 @@ async def ocr_api(file: Optional[UploadFile] = File(None)):
         # 非预期错误，记录日志（假设有logger）
         # logger.exception(e)
         return service_error_response(message=str("请求服务器错误"+str(e)))
+
+
+@router.post("/api/assignments/batch")
+async def batch_upload_api(files: List[UploadFile] = File(...), userId: Optional[int] = Form(None),
+                           db: AsyncSession = Depends(get_async_db)):
+    """
+    批量上传作业文件（如教师一次上传整个班级的作业），所有作业及其阶段任务在一个事务中创建。
+
+    请求形式：multipart/form-data
+    - files: 多个上传文件，必填
+    - userId: 提交作业的用户ID，可选
+
+    响应示例：
+    {
+        "code": 0,
+        "message": "成功",
+        "data": [
+            {"assignmentId": 1, "fileName": "homework1.jpg"},
+            {"assignmentId": 2, "fileName": "homework2.jpg"}
+        ]
+    }
+    """
+    try:
+        if not files:
+            return validation_error_response("缺少必填字段：files")
+        if any(not f.filename or not f.filename.strip() for f in files):
+            return validation_error_response("文件名不能为空或仅包含空格")
+
+        # 并发写入全部文件
+        file_paths = await save_uploads(files)
+
+        assignments = await create_assignments_for_uploads(db, file_paths, userId, priority="bulk")
+
+        return success_response(data=[
+            {"assignmentId": a.id, "fileName": f.filename} for a, f in zip(assignments, files)
+        ])
+
+    except ValueError as e:
+        return validation_error_response(message=str(e))
+
+    except Exception as e:
+        return service_error_response(message=str("请求服务器错误"+str(e)))
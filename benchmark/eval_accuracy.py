@@ -0,0 +1,294 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from benchmark.pipeline_bench import summarize, file_sha256
+from src.Importer.data_importer import scan_data_tree
+from src.PaddleOCR import line_layout
+
+# 识别精度与速度的评估：把 Data/ 中的图片与人工转写的 .cpp 标准答案配对，
+# 对每种流水线配置（识别模型、预处理方式、后处理规则）计算
+#   - CER：字符错误率（编辑距离 / 标准答案字符数）
+#   - LER：行错误率（按行的编辑距离 / 标准答案行数）
+#   - 后处理后可编译的比例
+# 并给出精度/延迟的帕累托前沿。各配置的 OCR 结果按 (引擎, 模型, 预处理, 图片 sha256) 缓存，
+# 只改后处理规则时无需重新识别。
+#
+# 标准答案位置：默认为图片同目录同名的 .cpp 文件；或用 --truth 指定与 Data/ 结构相同的目录。
+#
+# 用法（在项目根目录执行）:
+#   python -m benchmark.eval_accuracy --truth truth --cache eval_cache --output eval.json --plot frontier.png
+
+PREPROCESS_PROFILES = ("pro", "raw")
+POSTPROCESS_PROFILES = ("none", "safe", "confidence", "full")
+
+DEFAULT_CONFIGS = [
+    {"engine": "paddle", "model": "server", "preprocess": "pro", "postprocess": "confidence"},
+    {"engine": "paddle", "model": "server", "preprocess": "pro", "postprocess": "full"},
+    {"engine": "paddle", "model": "server", "preprocess": "pro", "postprocess": "none"},
+    {"engine": "paddle", "model": "server", "preprocess": "raw", "postprocess": "confidence"},
+    {"engine": "paddle", "model": "mobile", "preprocess": "pro", "postprocess": "confidence"},
+    {"engine": "easyocr", "model": "en", "preprocess": "pro", "postprocess": "confidence"},
+]
+
+
+# 补全配置名称并校验取值
+def normalize_config(config):
+    config = dict(config)
+    config.setdefault("model", "server" if config.get("engine") == "paddle" else "en")
+    if config.get("engine") not in ("paddle", "easyocr"):
+        raise ValueError(f"不支持的识别引擎: {config.get('engine')}")
+    if config.get("preprocess") not in PREPROCESS_PROFILES:
+        raise ValueError(f"不支持的预处理方式: {config.get('preprocess')}")
+    if config.get("postprocess") not in POSTPROCESS_PROFILES:
+        raise ValueError(f"不支持的后处理规则: {config.get('postprocess')}")
+    config.setdefault("name", f"{config['engine']}-{config['model']}-{config['preprocess']}-{config['postprocess']}")
+    return config
+
+
+# 序列编辑距离（字符串按字符、列表按元素）
+def edit_distance(a, b):
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i]
+        for j, y in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y)))
+        previous = current
+    return previous[-1]
+
+
+# 比较前的规范化：去掉每行首尾空白与空行（缩进不影响 C++ 语义）
+def _normalized_lines(code):
+    return [ln.strip() for ln in code.splitlines() if ln.strip()]
+
+
+def error_rates(prediction, truth):
+    """返回 (CER, LER)；标准答案为空时错误率按预测长度计"""
+    pred_lines, truth_lines = _normalized_lines(prediction), _normalized_lines(truth)
+    pred_text, truth_text = "\n".join(pred_lines), "\n".join(truth_lines)
+    cer = edit_distance(pred_text, truth_text) / max(len(truth_text), 1)
+    ler = edit_distance(pred_lines, truth_lines) / max(len(truth_lines), 1)
+    return cer, ler
+
+
+# 检查代码能否编译：有 g++ 时做语法检查，否则使用模拟编译器
+def compiles(code):
+    compiler = shutil.which("g++") or shutil.which("clang++")
+    if compiler:
+        try:
+            proc = subprocess.run([compiler, "-fsyntax-only", "-x", "c++", "-"], input=code, text=True,
+                                  capture_output=True, timeout=20)
+            return proc.returncode == 0
+        except (OSError, subprocess.SubprocessError):
+            pass
+    from src.Compile_run.run_api import MockCppCompiler
+    return MockCppCompiler().compile_and_run(code)["data"]["compileSuccess"]
+
+
+# 取精度/延迟的帕累托前沿：按延迟升序，只保留错误率严格下降的配置
+def pareto_frontier(points):
+    """
+    输入: list[(name, latency, error)]
+    返回: 位于前沿上的 name 列表（延迟从低到高）
+    """
+    frontier, best = [], float("inf")
+    for name, latency, error in sorted(points, key=lambda p: (p[1], p[2])):
+        if error < best:
+            frontier.append(name)
+            best = error
+    return frontier
+
+
+# 查找图片对应的标准答案
+def find_truth(item, truth_dir=None):
+    if truth_dir is not None:
+        path = Path(truth_dir) / item["student_id"] / item["test_name"] / (Path(item["path"]).stem + ".cpp")
+    else:
+        path = Path(item["path"]).with_suffix(".cpp")
+    return path if path.is_file() else None
+
+
+# ---- 以下在工作进程中执行 ----
+
+# 按配置识别一张图片（带缓存），返回 (页结果, 识别耗时秒, 是否命中缓存)
+def _recognize(config, image_path, cache_dir):
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = (Path(cache_dir) / f"{config['engine']}-{config['model']}-{config['preprocess']}"
+                      / f"{file_sha256(image_path)}.json")
+        if cache_file.is_file():
+            with open(cache_file, encoding="utf-8") as fp:
+                cached = json.load(fp)
+            return cached["pages"], cached["ocr_seconds"], True
+
+    if config["engine"] == "paddle":
+        from src.PaddleOCR import PaddleOCR as module
+    else:
+        from src.EasyOCR import EasyOCR as module
+    image = module.load_img(image_path)
+    start = time.perf_counter()
+    if config["preprocess"] == "pro":
+        image = module.preprocess_img_pro(image)
+    if config["engine"] == "paddle":
+        pages = module.results_to_pages(module.ocr_recognition(image, model=config["model"]))
+    else:
+        pages = [module.results_to_page(module.ocr_recognition(image, langs=(config["model"],)))]
+    seconds = time.perf_counter() - start
+
+    if cache_file is not None:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as fp:
+            json.dump({"pages": pages, "ocr_seconds": seconds}, fp, ensure_ascii=False)
+        os.replace(tmp, cache_file)
+    return pages, seconds, False
+
+
+def _postprocess(profile, code_str, lines):
+    if profile == "none":
+        return code_str
+    from src.PaddleOCR import ocr_v2
+    if profile == "safe":
+        # 全部按高置信处理：只做规范化与安全修正
+        return ocr_v2.postprocess_code(code_str, line_scores=[1.0] * len(lines), confidence_threshold=0.0)
+    if profile == "full":
+        return ocr_v2.postprocess_code(code_str)
+    return ocr_v2.postprocess_code(code_str, line_scores=[ln["score"] for ln in lines])
+
+
+def _evaluate(job):
+    config, image_key, image_path, truth_path, cache_dir = job
+    try:
+        pages, ocr_seconds, cached = _recognize(config, image_path, cache_dir)
+        lines = line_layout.extract_code_lines(pages)
+        code_str = line_layout.lines_to_code_string(lines)
+        start = time.perf_counter()
+        corrected = _postprocess(config["postprocess"], code_str, lines)
+        post_seconds = time.perf_counter() - start
+
+        truth = Path(truth_path).read_text(encoding="utf-8")
+        cer, ler = error_rates(corrected, truth)
+        return {"config": config["name"], "image": image_key, "cer": cer, "ler": ler,
+                "compiles": compiles(corrected), "ocr_s": ocr_seconds, "post_s": post_seconds,
+                "cached": cached}
+    except Exception as e:
+        return {"config": config["name"], "image": image_key, "error": f"{type(e).__name__}: {e}"}
+
+
+# ---- 汇总 ----
+
+def summarize_config(results):
+    ok = [r for r in results if "error" not in r]
+    if not ok:
+        return {"images": 0, "errors": len(results)}
+    latency = [r["ocr_s"] + r["post_s"] for r in ok]
+    return {
+        "images": len(ok),
+        "errors": len(results) - len(ok),
+        "cer": round(float(np.mean([r["cer"] for r in ok])), 4),
+        "ler": round(float(np.mean([r["ler"] for r in ok])), 4),
+        "compile_rate": round(sum(r["compiles"] for r in ok) / len(ok), 4),
+        "latency": summarize(latency),
+        "ocr_latency": summarize([r["ocr_s"] for r in ok]),
+        "postprocess_latency": summarize([r["post_s"] for r in ok]),
+        "cache_hits": sum(r["cached"] for r in ok),
+    }
+
+
+def run_evaluation(data_root, configs=None, truth_dir=None, cache_dir=None, workers=None):
+    """
+    对每种配置评估全部有标准答案的图片，在多个进程中并行执行。
+    返回: 报告 dict（各配置的精度、延迟与前沿）
+    """
+    configs = [normalize_config(c) for c in (configs or DEFAULT_CONFIGS)]
+    pairs = [(item, find_truth(item, truth_dir)) for item in scan_data_tree(data_root)]
+    pairs = [(item, truth) for item, truth in pairs if truth is not None]
+    workers = workers or min(4, os.cpu_count() or 1)
+
+    # 按配置分组提交：同一时间各进程多使用同一个模型，减少重复加载
+    jobs = [(config, item["key"], str(item["path"]), str(truth), str(cache_dir) if cache_dir else None)
+            for config in configs for item, truth in pairs]
+    start = time.perf_counter()
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(_evaluate, jobs))
+    else:
+        results = []
+    elapsed = time.perf_counter() - start
+
+    by_config = {c["name"]: summarize_config([r for r in results if r["config"] == c["name"]]) for c in configs}
+    points = [(name, s["latency"]["p50_ms"], s["cer"]) for name, s in by_config.items() if s["images"]]
+    return {
+        "meta": {"data_root": str(data_root), "images_with_truth": len(pairs), "workers": workers,
+                 "elapsed_s": round(elapsed, 3)},
+        "configs": {c["name"]: {**c, **by_config[c["name"]]} for c in configs},
+        "frontier": pareto_frontier(points),
+        "errors": [r for r in results if "error" in r],
+    }
+
+
+# 绘制精度/延迟散点图并连出前沿（需要 matplotlib）
+def plot_frontier(report, output):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    configs = {name: c for name, c in report["configs"].items() if c.get("images")}
+    for name, c in configs.items():
+        ax.scatter(c["latency"]["p50_ms"], c["cer"], color="tab:blue")
+        ax.annotate(name, (c["latency"]["p50_ms"], c["cer"]), fontsize=7, xytext=(4, 4),
+                    textcoords="offset points")
+    front = [configs[name] for name in report["frontier"]]
+    ax.plot([c["latency"]["p50_ms"] for c in front], [c["cer"] for c in front], color="tab:red", label="frontier")
+    ax.set_xlabel("p50 latency per image (ms)")
+    ax.set_ylabel("CER")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(output, dpi=150)
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR 精度/速度评估")
+    parser.add_argument("--data", default="Data", help="数据目录（<学号>/<testN>/*.jpg）")
+    parser.add_argument("--truth", default=None, help="标准答案目录（结构同 Data/），默认读取图片旁的 .cpp")
+    parser.add_argument("--configs", default=None, help="配置列表 JSON 文件，默认使用内置配置")
+    parser.add_argument("--cache", default=None, help="OCR 结果缓存目录")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数")
+    parser.add_argument("--output", default=None, help="JSON 报告输出路径")
+    parser.add_argument("--plot", default=None, help="前沿图输出路径（PNG，需要 matplotlib）")
+    args = parser.parse_args()
+
+    config_list = None
+    if args.configs:
+        with open(args.configs, encoding="utf-8") as fp:
+            config_list = json.load(fp)
+
+    report = run_evaluation(args.data, config_list, args.truth, args.cache, args.workers)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fp:
+            json.dump(report, fp, ensure_ascii=False, indent=2)
+    if args.plot:
+        try:
+            plot_frontier(report, args.plot)
+        except ImportError:
+            print("未安装 matplotlib，跳过绘图")
+
+    print(f"有标准答案的图片: {report['meta']['images_with_truth']}，耗时 {report['meta']['elapsed_s']}s")
+    print(f"{'config':<40}{'CER':>8}{'LER':>8}{'compile':>9}{'p50 ms':>10}")
+    for config_name, c in report["configs"].items():
+        if c.get("images"):
+            print(f"{config_name:<40}{c['cer']:>8.3f}{c['ler']:>8.3f}{c['compile_rate']:>9.2f}"
+                  f"{c['latency']['p50_ms']:>10.1f}")
+    print("前沿:", " -> ".join(report["frontier"]))
@@ -0,0 +1,277 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from src.Importer.data_importer import scan_data_tree
+from src.PaddleOCR import line_layout
+
+# 端到端基准测试：对 Data/ 下每张图片依次执行
+#   load -> preprocess -> ocr -> extract -> postprocess -> compile -> score
+# 统计每个阶段的 p50/p95/p99 延迟、整体吞吐量、峰值内存与 CPU 利用率，并输出 JSON 报告，
+# 可用 --compare 与上一次的报告对比各阶段延迟变化。
+#
+# 用法（在项目根目录执行）:
+#   python -m benchmark.pipeline_bench --engine paddle --ocr-cache bench_cache --output report.json
+#   python -m benchmark.pipeline_bench --engine replay --ocr-cache bench_cache --compare report.json
+
+STAGES = ("load", "preprocess", "ocr", "extract", "postprocess", "compile", "score")
+ENGINES = ("paddle", "easyocr", "replay")
+REPORT_VERSION = 1
+
+
+# 统计一组耗时样本（秒），返回毫秒单位的分位数
+def summarize(samples):
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "total_s": round(float(ms.sum()) / 1000.0, 3),
+    }
+
+
+# 对比两份报告中各阶段的分位数，返回 {stage: {metric: {"old", "new", "change_pct"}}}
+def compare_reports(old, new, metrics=("p50_ms", "p95_ms", "p99_ms")):
+    diff = {}
+    for stage, stats in new.get("stages", {}).items():
+        base = old.get("stages", {}).get(stage)
+        if not base or not stats.get("count") or not base.get("count"):
+            continue
+        diff[stage] = {}
+        for m in metrics:
+            change = (stats[m] - base[m]) / base[m] * 100.0 if base[m] else None
+            diff[stage][m] = {"old": base[m], "new": stats[m],
+                              "change_pct": round(change, 1) if change is not None else None}
+    for key in ("throughput_images_per_s", "peak_rss_mb"):
+        if old.get("totals", {}).get(key) is not None and new.get("totals", {}).get(key) is not None:
+            diff.setdefault("totals", {})[key] = {"old": old["totals"][key], "new": new["totals"][key]}
+    return diff
+
+
+# 当前进程的峰值常驻内存（MB），无法获取时返回 None
+def _peak_rss_mb():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为 KB，macOS 为字节
+        return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+    return None
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# 各识别引擎的 (load, preprocess, recognize) 函数；recognize 返回 PaddleOCR 结构的页结果列表
+def _engine_stages(engine):
+    if engine == "easyocr":
+        from src.EasyOCR import EasyOCR
+        return (EasyOCR.load_img, EasyOCR.preprocess_img_pro,
+                lambda image: [EasyOCR.results_to_page(EasyOCR.ocr_recognition(image))])
+    if engine == "paddle":
+        from src.PaddleOCR import PaddleOCR
+        return (PaddleOCR.load_img, PaddleOCR.preprocess_img_pro,
+                lambda image: PaddleOCR.results_to_pages(PaddleOCR.ocr_recognition(image)))
+    # replay：读取缓存的识别结果，只测 OCR 之外的阶段；缺少 OCR 依赖时跳过图片阶段
+    try:
+        from src.PaddleOCR import PaddleOCR
+        return PaddleOCR.load_img, PaddleOCR.preprocess_img_pro, None
+    except ImportError:
+        return None, None, None
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 规则评分（占位）：编译成功得基础分，按识别置信度浮动
+def _stub_score(compile_result, lines):
+    compiled = compile_result["data"]["compileSuccess"]
+    confidence = float(np.mean([ln["score"] for ln in lines])) if lines else 0.0
+    return {"final_score": round((60.0 if compiled else 20.0) + 40.0 * confidence, 2)}
+
+
+def run_benchmark(data_root, engine="paddle", ocr_cache=None, limit=None, warmup=1):
+    """
+    对 data_root 下的全部图片运行完整流水线。
+    输入:
+        engine: paddle / easyocr / replay（replay 从 ocr_cache 读取识别结果）
+        ocr_cache: 识别结果缓存目录；非 replay 模式下会写入该目录
+        limit: 只测前 limit 张图片
+        warmup: 前 warmup 张图片用于预热（模型加载等），不计入统计
+    返回: 报告 dict
+    """
+    from src.PaddleOCR import ocr_v2
+    from src.Compile_run.run_api import MockCppCompiler
+
+    if engine not in ENGINES:
+        raise ValueError(f"不支持的识别引擎: {engine}")
+    if engine == "replay" and not ocr_cache:
+        raise ValueError("replay 模式需要指定 ocr_cache")
+    cache_dir = Path(ocr_cache) if ocr_cache else None
+    if cache_dir is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+    files = scan_data_tree(data_root)[:limit] if limit else scan_data_tree(data_root)
+    load, preprocess, recognize = _engine_stages(engine)
+    compiler = MockCppCompiler()
+
+    samples = {stage: [] for stage in STAGES}
+    failures = []
+    measured = 0
+    wall_start = cpu_start = None
+
+    for i, f in enumerate(files):
+        if i == warmup:
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+        timings = {}
+        try:
+            if load is not None:
+                t = time.perf_counter()
+                image = load(str(f["path"]))
+                timings["load"] = time.perf_counter() - t
+
+                t = time.perf_counter()
+                image = preprocess(image)
+                timings["preprocess"] = time.perf_counter() - t
+
+            cache_file = cache_dir / f"{file_sha256(f['path'])}.json" if cache_dir is not None else None
+            t = time.perf_counter()
+            if recognize is None:
+                with open(cache_file, encoding="utf-8") as fp:
+                    pages = json.load(fp)
+            else:
+                pages = recognize(image)
+            timings["ocr"] = time.perf_counter() - t
+            if recognize is not None and cache_file is not None:
+                with open(cache_file, "w", encoding="utf-8") as fp:
+                    json.dump(pages, fp, ensure_ascii=False)
+
+            t = time.perf_counter()
+            lines = line_layout.extract_code_lines(pages)
+            code_str = line_layout.lines_to_code_string(lines)
+            timings["extract"] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            corrected = ocr_v2.postprocess_code(code_str, line_scores=[ln["score"] for ln in lines])
+            timings["postprocess"] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            compile_result = compiler.compile_and_run(corrected)
+            timings["compile"] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            _stub_score(compile_result, lines)
+            timings["score"] = time.perf_counter() - t
+        except Exception as e:
+            failures.append({"image": f["key"], "error": f"{type(e).__name__}: {e}"})
+            continue
+
+        if i >= warmup:
+            measured += 1
+            for stage, seconds in timings.items():
+                samples[stage].append(seconds)
+
+    wall = time.perf_counter() - wall_start if wall_start is not None else 0.0
+    cpu = time.process_time() - cpu_start if cpu_start is not None else 0.0
+    cpu_count = os.cpu_count() or 1
+    return {
+        "version": REPORT_VERSION,
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "engine": engine,
+            "data_root": str(data_root),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": cpu_count,
+            "images": len(files),
+            "warmup": min(warmup, len(files)),
+        },
+        "stages": {stage: summarize(samples[stage]) for stage in STAGES},
+        "totals": {
+            "measured_images": measured,
+            "wall_s": round(wall, 3),
+            "throughput_images_per_s": round(measured / wall, 3) if wall > 0 else None,
+            "cpu_s": round(cpu, 3),
+            # 进程 CPU 时间 / 墙钟时间：1.0 表示平均占满一个核
+            "cpu_cores_used": round(cpu / wall, 2) if wall > 0 else None,
+            "cpu_utilisation_pct": round(cpu / wall / cpu_count * 100.0, 1) if wall > 0 else None,
+            "peak_rss_mb": _peak_rss_mb(),
+        },
+        "failures": failures,
+    }
+
+
+def _print_report(report, diff=None):
+    print(f"engine={report['meta']['engine']} images={report['meta']['images']} "
+          f"commit={report['meta']['git_commit']}")
+    print(f"{'stage':<12}{'count':>7}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'max ms':>11}")
+    for stage, s in report["stages"].items():
+        if s["count"]:
+            print(f"{stage:<12}{s['count']:>7}{s['p50_ms']:>11.2f}{s['p95_ms']:>11.2f}"
+                  f"{s['p99_ms']:>11.2f}{s['max_ms']:>11.2f}")
+    print(json.dumps(report["totals"], ensure_ascii=False))
+    if report["failures"]:
+        print(f"失败 {len(report['failures'])} 张，首个错误: {report['failures'][0]}")
+    if diff:
+        print("与基线对比（change_pct 为正表示变慢）:")
+        print(json.dumps(diff, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR 流水线端到端基准测试")
+    parser.add_argument("--data", default="Data", help="数据目录（<学号>/<testN>/*.jpg）")
+    parser.add_argument("--engine", default="paddle", choices=ENGINES)
+    parser.add_argument("--ocr-cache", default=None, help="识别结果缓存目录（replay 模式从这里读取）")
+    parser.add_argument("--limit", type=int, default=None, help="只测前 N 张图片")
+    parser.add_argument("--warmup", type=int, default=1, help="预热图片数（不计入统计）")
+    parser.add_argument("--output", default=None, help="JSON 报告输出路径")
+    parser.add_argument("--compare", default=None, help="作为基线对比的 JSON 报告")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.data, args.engine, args.ocr_cache, args.limit, args.warmup)
+    baseline_diff = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fp:
+            baseline_diff = compare_reports(json.load(fp), result)
+        result["compare"] = {"baseline": args.compare, "diff": baseline_diff}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fp:
+            json.dump(result, fp, ensure_ascii=False, indent=2)
+    _print_report(result, baseline_diff)
@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+# 启动耗时基准：在全新的解释器中逐个导入目标模块（python -X importtime），报告
+#   - 导入目标模块的墙钟时间与 importtime 给出的累计导入时间（多次重复取中位数）
+#   - 按顶层包汇总的导入耗时排行（找出是谁拖慢了启动）
+#   - 导入后是否已经加载了 paddleocr / easyocr / torch / cv2 / matplotlib 等重量级依赖
+#
+# 用法（在项目根目录执行）:
+#   python -m benchmark.startup_bench --output startup.json
+#   python -m benchmark.startup_bench --targets api.upload_img.upload_api router.enter --repeat 5
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_TARGETS = (
+    "router.enter",
+    "api.ocr_api.ocr",
+    "api.upload_img.upload_api",
+    "src.PaddleOCR.ocr_v2",
+    "src.Ensemble.ensemble_ocr",
+    "core.core_db.crud",
+)
+HEAVY_MODULES = ("paddleocr", "paddle", "easyocr", "torch", "cv2", "matplotlib")
+
+# 导入完成后在子进程中打印已加载的重量级模块
+_PROBE = ("import sys, json; print(json.dumps(sorted(m for m in sys.modules if m in {heavy!r})))")
+
+
+# 解析 -X importtime 的输出，返回 [{"module", "self_us", "cumulative_us", "depth"}]
+def parse_importtime(stderr):
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # 表头
+        name = parts[2].rstrip()
+        indent = len(name) - len(name.lstrip())
+        entries.append({
+            "module": name.strip(),
+            "self_us": int(parts[0]),
+            "cumulative_us": int(parts[1]),
+            "depth": max(0, (indent - 1) // 2),
+        })
+    return entries
+
+
+# 按顶层包汇总自身导入时间
+def group_by_package(entries):
+    totals = defaultdict(int)
+    for e in entries:
+        totals[e["module"].split(".")[0]] += e["self_us"]
+    return dict(totals)
+
+
+def measure_import(target, python=None):
+    """在新解释器中导入 target 一次，返回 (是否成功, 墙钟毫秒, importtime 条目, 已加载的重量级模块, 错误信息)"""
+    code = f"import {target}; " + _PROBE.format(heavy=set(HEAVY_MODULES))
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    proc = subprocess.run([python or sys.executable, "-X", "importtime", "-c", code],
+                          cwd=PROJECT_ROOT, capture_output=True, text=True, env=env)
+    wall_ms = (time.perf_counter() - start) * 1000.0
+    entries = parse_importtime(proc.stderr)
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"
+        return False, wall_ms, entries, [], error
+    heavy = json.loads(proc.stdout.strip().splitlines()[-1])
+    return True, wall_ms, entries, heavy, None
+
+
+def run_startup_benchmark(targets=DEFAULT_TARGETS, repeat=3, top=15):
+    """
+    对每个目标模块重复 repeat 次冷启动导入。
+    返回: 报告 dict，targets 下每个模块包含 wall_ms / import_ms 中位数、耗时最多的 top 个顶层包与已加载的重量级依赖
+    """
+    results = {}
+    for target in targets:
+        walls, imports, packages = [], [], defaultdict(list)
+        heavy, error = [], None
+        for _ in range(repeat):
+            ok, wall_ms, entries, heavy, error = measure_import(target)
+            if not ok:
+                break
+            walls.append(wall_ms)
+            own = [e for e in entries if e["module"] == target]
+            imports.append(own[-1]["cumulative_us"] / 1000.0 if own else sum(e["self_us"] for e in entries) / 1000.0)
+            for package, us in group_by_package(entries).items():
+                packages[package].append(us / 1000.0)
+        if error is not None:
+            results[target] = {"ok": False, "error": error}
+            continue
+        ranked = sorted(((p, statistics.median(v)) for p, v in packages.items()), key=lambda x: -x[1])[:top]
+        results[target] = {
+            "ok": True,
+            "wall_ms": round(statistics.median(walls), 1),
+            "import_ms": round(statistics.median(imports), 1),
+            "heavy_modules_loaded": heavy,
+            "top_packages_ms": [{"package": p, "self_ms": round(ms, 1)} for p, ms in ranked],
+        }
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "repeat": repeat,
+        },
+        "targets": results,
+    }
+
+
+def _print_report(report):
+    print(f"{'module':<32}{'wall ms':>10}{'import ms':>11}  heavy modules loaded")
+    for target, r in report["targets"].items():
+        if not r["ok"]:
+            print(f"{target:<32}  导入失败: {r['error']}")
+            continue
+        print(f"{target:<32}{r['wall_ms']:>10.1f}{r['import_ms']:>11.1f}  {', '.join(r['heavy_modules_loaded']) or '-'}")
+    for target, r in report["targets"].items():
+        if r["ok"]:
+            top = ", ".join(f"{p['package']} {p['self_ms']:.0f}" for p in r["top_packages_ms"][:8])
+            print(f"  {target}: {top}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="模块导入（服务冷启动）耗时基准")
+    parser.add_argument("--targets", nargs="+", default=list(DEFAULT_TARGETS), help="要测量的模块")
+    parser.add_argument("--repeat", type=int, default=3, help="每个模块的冷启动次数（取中位数）")
+    parser.add_argument("--top", type=int, default=15, help="每个模块列出的最耗时顶层包数")
+    parser.add_argument("--output", default=None, help="JSON 报告输出路径")
+    args = parser.parse_args()
+
+    result = run_startup_benchmark(args.targets, args.repeat, args.top)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fp:
+            json.dump(result, fp, ensure_ascii=False, indent=2)
+    _print_report(result)
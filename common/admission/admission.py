@@ -0,0 +1,225 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from common.monitor.metrics import registry
+from common.res.response import ResponseCode, ResponseMessage, error_response, json_response
+
+# 昂贵接口（OCR、编译、AI 报告）的准入控制：
+#   - 每个路由同时执行的请求数不超过 max_concurrent，其余请求在有界队列中等待
+#   - 队列已满或等待超过 queue_timeout 秒时立即拒绝（服务繁忙，HTTP 503），不让请求堆积占满内存
+#   - 拒绝响应带 Retry-After 头（取 queue_timeout 向上取整），客户端/网关据此退避后重试
+#   - 同一用户在该路由上执行中 + 排队中的请求数不超过 per_user_limit，超出时拒绝（请求过多，HTTP 429）
+#   - 名额空出时先按优先级选出队列，再在该队列内按用户轮转分配：每个排队用户轮流获得一个名额，
+#     一位老师批量提交不会让其他人一直等待
+#   - 优先级（与 Task.priority 一致）：interactive（学生等待单份作业结果）优先于 bulk（整班重批、批量导入）；
+#     bulk 请求按 "入队时间 + PRIORITY_AGING_SECONDS" 参与比较，排队足够久后仍会先于新到的 interactive 请求，
+#     不会被饿死
+# 限制按工作进程生效（多进程部署时总并发为 工作进程数 × max_concurrent）。
+
+OCR_MAX_CONCURRENT = int(os.getenv('OCR_MAX_CONCURRENT', '2'))
+OCR_MAX_QUEUE = int(os.getenv('OCR_MAX_QUEUE', '16'))
+OCR_QUEUE_TIMEOUT = float(os.getenv('OCR_QUEUE_TIMEOUT', '30'))
+COMPILE_MAX_CONCURRENT = int(os.getenv('COMPILE_MAX_CONCURRENT', '4'))
+COMPILE_MAX_QUEUE = int(os.getenv('COMPILE_MAX_QUEUE', '32'))
+COMPILE_QUEUE_TIMEOUT = float(os.getenv('COMPILE_QUEUE_TIMEOUT', '10'))
+REPORT_MAX_CONCURRENT = int(os.getenv('REPORT_MAX_CONCURRENT', '4'))
+REPORT_MAX_QUEUE = int(os.getenv('REPORT_MAX_QUEUE', '32'))
+REPORT_QUEUE_TIMEOUT = float(os.getenv('REPORT_QUEUE_TIMEOUT', '60'))
+ADMISSION_PER_USER_LIMIT = int(os.getenv('ADMISSION_PER_USER_LIMIT', '8'))  # 0 表示不限制
+PRIORITY_AGING_SECONDS = float(os.getenv('PRIORITY_AGING_SECONDS', '20'))
+
+# 优先级类别，按先后顺序依次让后一类多"等待"一个 PRIORITY_AGING_SECONDS
+PRIORITY_CLASSES = ("interactive", "bulk")
+
+queue_wait_seconds = registry.histogram(
+    "admission_queue_wait_seconds", "请求获准入前的排队时间（秒）", ("route", "priority"))
+
+USER_HEADER = "X-User-Id"
+
+
+class AdmissionRejected(Exception):
+    """请求未获准入；code 为业务代码（ResponseCode），由 response() 生成带 429/503 状态码的响应"""
+
+    def __init__(self, code: ResponseCode, message: str, reason: str, retry_after: int = 1):
+        super().__init__(message)
+        self.code = code.value
+        self.message = message
+        self.reason = reason
+        self.retry_after = retry_after
+
+    # 拒绝响应：状态码由 error_response 按业务代码映射，并告诉客户端多少秒后重试
+    def response(self):
+        return json_response(error_response(self.code, self.message),
+                             headers={"Retry-After": str(self.retry_after)})
+
+
+class AdmissionController:
+    """单个路由的并发名额与按优先级、按用户轮转的等待队列（只在一个事件循环中使用，无需加锁）"""
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout, per_user_limit=ADMISSION_PER_USER_LIMIT,
+                 aging_seconds=PRIORITY_AGING_SECONDS):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.per_user_limit = per_user_limit
+        self.aging_seconds = aging_seconds
+        self._active = 0
+        self._active_by_user = {}
+        # 优先级 -> (用户 -> 等待中的 (Future, 入队时间) 队列)；内层字典顺序即轮转顺序
+        self._waiters = {priority: OrderedDict() for priority in PRIORITY_CLASSES}
+        self.admitted = 0
+        self.rejected = {}
+        self.waits = {priority: {"count": 0, "sum_ms": 0.0, "max_ms": 0.0} for priority in PRIORITY_CLASSES}
+
+    def queued(self, user=None, priority=None):
+        classes = [self._waiters[priority]] if priority is not None else self._waiters.values()
+        if user is not None:
+            return sum(len(users.get(user, ())) for users in classes)
+        return sum(len(q) for users in classes for q in users.values())
+
+    def active(self, user=None):
+        if user is not None:
+            return self._active_by_user.get(user, 0)
+        return self._active
+
+    def _reject(self, code, message, reason):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        raise AdmissionRejected(code, message, reason, retry_after=max(1, math.ceil(self.queue_timeout)))
+
+    def _grant(self, user, priority, wait_seconds):
+        self._active += 1
+        self._active_by_user[user] = self._active_by_user.get(user, 0) + 1
+        self.admitted += 1
+        stats = self.waits[priority]
+        stats["count"] += 1
+        stats["sum_ms"] += wait_seconds * 1000.0
+        stats["max_ms"] = max(stats["max_ms"], wait_seconds * 1000.0)
+        queue_wait_seconds.observe(wait_seconds, route=self.name, priority=priority)
+
+    async def acquire(self, user, priority="interactive"):
+        if priority not in self._waiters:
+            raise ValueError(f"不支持的优先级: {priority}")
+        if self.per_user_limit and self.active(user) + self.queued(user) >= self.per_user_limit:
+            self._reject(ResponseCode.TOO_MANY_REQUESTS,
+                         f"{ResponseMessage.TOO_MANY_REQUESTS.value}：该用户已有 {self.per_user_limit} 个请求在处理",
+                         "user_limit")
+        if self._active < self.max_concurrent and not self.queued():
+            self._grant(user, priority, 0.0)
+            return
+        if self.queued() >= self.max_queue:
+            self._reject(ResponseCode.SERVICE_BUSY, ResponseMessage.SERVICE_BUSY.value, "queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, time.monotonic())
+        self._waiters[priority].setdefault(user, deque()).append(entry)
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # 名额已分到但等待方已放弃（超时与分配同时发生或客户端断开），转交给下一个请求
+                self.release(user)
+            else:
+                self._remove_waiter(user, priority, entry)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject(ResponseCode.SERVICE_BUSY,
+                         f"{ResponseMessage.SERVICE_BUSY.value}：排队超过 {self.queue_timeout:g} 秒", "timeout")
+
+    def release(self, user):
+        self._active -= 1
+        remaining = self._active_by_user.get(user, 0) - 1
+        if remaining > 0:
+            self._active_by_user[user] = remaining
+        else:
+            self._active_by_user.pop(user, None)
+        self._wake_next()
+
+    def _remove_waiter(self, user, priority, entry):
+        users = self._waiters[priority]
+        waiters = users.get(user)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(entry)
+        except ValueError:
+            pass
+        if not waiters:
+            del users[user]
+
+    # 选出下一个获得名额的优先级：比较各类中最早入队的请求，低优先级每低一级加 aging_seconds
+    def _next_priority(self):
+        best, best_key = None, None
+        for rank, priority in enumerate(PRIORITY_CLASSES):
+            users = self._waiters[priority]
+            if not users:
+                continue
+            key = min(q[0][1] for q in users.values()) + rank * self.aging_seconds
+            if best_key is None or key < best_key:
+                best, best_key = priority, key
+        return best
+
+    # 分配空出的名额：先选优先级，再在该优先级内按用户轮转（取队首用户的最早请求，再把该用户移到队尾）
+    def _wake_next(self):
+        while self._active < self.max_concurrent:
+            priority = self._next_priority()
+            if priority is None:
+                return
+            users = self._waiters[priority]
+            user, waiters = next(iter(users.items()))
+            future, enqueued_at = waiters.popleft()
+            if waiters:
+                users.move_to_end(user)
+            else:
+                del users[user]
+            if future.done():
+                continue  # 已超时或被取消
+            self._grant(user, priority, time.monotonic() - enqueued_at)
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def admit(self, user, priority="interactive"):
+        await self.acquire(user, priority)
+        try:
+            yield
+        finally:
+            self.release(user)
+
+    def snapshot(self):
+        return {
+            "active": self._active,
+            "queued": self.queued(),
+            "users": len(set(self._active_by_user).union(*self._waiters.values())),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "per_user_limit": self.per_user_limit,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "queued_by_priority": {priority: self.queued(priority=priority) for priority in PRIORITY_CLASSES},
+            "wait_by_priority": {
+                priority: {"count": w["count"],
+                           "avg_ms": round(w["sum_ms"] / w["count"], 3) if w["count"] else 0.0,
+                           "max_ms": round(w["max_ms"], 3)}
+                for priority, w in self.waits.items()
+            },
+        }
+
+
+# 请求所属用户：优先使用 X-User-Id 请求头（接入登录后由网关/前端填写），否则按客户端地址区分
+def client_key(request) -> str:
+    user = request.headers.get(USER_HEADER)
+    if user:
+        return f"user:{user}"
+    return f"ip:{request.client.host}" if request.client is not None else "anonymous"
+
+
+ocr_admission = AdmissionController("ocr", OCR_MAX_CONCURRENT, OCR_MAX_QUEUE, OCR_QUEUE_TIMEOUT)
+compile_admission = AdmissionController("compile", COMPILE_MAX_CONCURRENT, COMPILE_MAX_QUEUE, COMPILE_QUEUE_TIMEOUT)
+report_admission = AdmissionController("report", REPORT_MAX_CONCURRENT, REPORT_MAX_QUEUE, REPORT_QUEUE_TIMEOUT)
+
+controllers = {c.name: c for c in (ocr_admission, compile_admission, report_admission)}
@@ -0,0 +1,131 @@
+import sys
+
+from common.monitor import stage_timer
+from common.monitor.metrics import registry, executor_backlog, histogram_lines
+
+# /metrics 抓取时现算的状态指标。
+# 只读取已经导入的模块（sys.modules），不会为了采集指标而加载 OCR 引擎等重量级依赖。
+
+_registered = False
+
+
+# 流水线各阶段（含编译与 LLM 评分）的延迟直方图、CPU 时间、错误数与正在执行数
+def stage_metrics():
+    raw = stage_timer.histograms.raw()
+    buckets = [ms / 1000.0 for ms in stage_timer.histograms.buckets_ms]
+    lines = ["# HELP pipeline_stage_duration_seconds 流水线阶段墙钟耗时（秒）",
+             "# TYPE pipeline_stage_duration_seconds histogram"]
+    for name, h in raw.items():
+        lines.extend(histogram_lines("pipeline_stage_duration_seconds", ("stage",), (name,), buckets,
+                                     h["counts"], h["wall_ms_sum"] / 1000.0))
+    yield from lines
+    yield ("pipeline_stage_cpu_seconds_total", "counter", "流水线阶段占用的线程 CPU 时间（秒）",
+           [({"stage": name}, h["cpu_ms_sum"] / 1000.0) for name, h in raw.items()])
+    yield ("pipeline_stage_errors_total", "counter", "流水线阶段抛出异常的次数",
+           [({"stage": name}, h["errors"]) for name, h in raw.items()])
+    yield ("pipeline_stage_in_progress", "gauge", "正在执行的流水线阶段数（编译/LLM 调用的并发占用）",
+           [({"stage": name}, n) for name, n in stage_timer.histograms.in_progress().items()])
+    yield ("pipeline_stage_records_pending", "gauge", "尚未写库的阶段计时记录数",
+           [({}, stage_timer.pending_count())])
+    yield ("pipeline_stage_records_dropped_total", "counter", "因写库积压被丢弃的阶段计时记录数",
+           [({}, stage_timer.dropped_records())])
+    yield ("pipeline_stage_records_rejected_total", "counter", "无法写库而放弃的阶段计时记录数（数据错误或重试次数用尽）",
+           [({}, stage_timer.rejected_records())])
+
+
+# run_in_threadpool 使用的 anyio 默认线程池：占用线程数、容量与排队数（需在事件循环中调用）
+def threadpool_metrics():
+    try:
+        import anyio.to_thread
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        stats = limiter.statistics()
+    except Exception:
+        return
+    yield ("threadpool_busy_threads", "gauge", "正在执行同步任务的工作线程数", [({}, stats.borrowed_tokens)])
+    yield ("threadpool_capacity", "gauge", "工作线程上限", [({}, stats.total_tokens)])
+    yield ("threadpool_queue_length", "gauge", "等待工作线程的任务数", [({}, stats.tasks_waiting)])
+
+
+# 各进程池积压的任务数
+def executor_metrics():
+    samples = []
+    ensemble = sys.modules.get("src.Ensemble.ensemble_ocr")
+    if ensemble is not None:
+        for name, executor in list(ensemble._executors.items()):
+            samples.append(({"executor": f"ocr_{name}"}, executor_backlog(executor)))
+    hasher = sys.modules.get("core.core_db.password_hasher")
+    if hasher is not None and hasher._executor is not None:
+        samples.append(({"executor": "password_hash"}, executor_backlog(hasher._executor)))
+    samples = [(labels, n) for labels, n in samples if n is not None]
+    if samples:
+        yield ("executor_queue_length", "gauge", "进程池中已提交但尚未完成的任务数", samples)
+
+
+# 已常驻内存的 OCR 引擎数
+def ocr_engine_metrics():
+    samples = []
+    paddle = sys.modules.get("src.PaddleOCR.PaddleOCR")
+    if paddle is not None:
+        samples.append(({"engine": "paddle"}, len(paddle._ocr_engines)))
+    easy = sys.modules.get("src.EasyOCR.EasyOCR")
+    if easy is not None:
+        samples.append(({"engine": "easyocr"}, len(easy._readers)))
+    if samples:
+        yield ("ocr_engines_loaded", "gauge", "当前进程中已加载的 OCR 引擎数", samples)
+
+
+# 数据库连接池占用与获取连接的等待情况
+def db_pool_metrics():
+    database = sys.modules.get("core.core_db.database")
+    if database is None:
+        return
+    pool = database.get_pool_metrics()
+    for key, help_text in (("pool_size", "连接池大小"), ("checked_out", "已借出的连接数"),
+                           ("checked_in", "空闲连接数"), ("overflow", "溢出连接数")):
+        if key in pool:
+            yield (f"db_pool_{key}", "gauge", help_text, [({}, pool[key])])
+    wait = pool.get("wait")
+    if wait is not None:
+        yield ("db_pool_wait_total", "counter", "获取连接的次数", [({}, wait["count"])])
+        yield ("db_pool_wait_timeouts_total", "counter", "获取连接超时的次数", [({}, wait["timeouts"])])
+        yield ("db_pool_wait_max_seconds", "gauge", "获取连接的最长等待时间（秒）", [({}, wait["max_ms"] / 1000.0)])
+
+
+# 昂贵接口的准入控制：执行中/排队中的请求数、获准数与按原因统计的拒绝数
+def admission_metrics():
+    admission = sys.modules.get("common.admission.admission")
+    if admission is None:
+        return
+    snapshots = {name: c.snapshot() for name, c in admission.controllers.items()}
+    yield ("admission_in_flight", "gauge", "已获准入、正在执行的请求数",
+           [({"route": name}, snap["active"]) for name, snap in snapshots.items()])
+    yield ("admission_queue_length", "gauge", "等待准入的请求数",
+           [({"route": name, "priority": priority}, n)
+            for name, snap in snapshots.items() for priority, n in snap["queued_by_priority"].items()])
+    yield ("admission_admitted_total", "counter", "获准执行的请求数",
+           [({"route": name}, snap["admitted"]) for name, snap in snapshots.items()])
+    yield ("admission_rejected_total", "counter", "被拒绝的请求数（user_limit、queue_full、timeout）",
+           [({"route": name, "reason": reason}, n)
+            for name, snap in snapshots.items() for reason, n in snap["rejected"].items()])
+
+
+# 增量后处理的逐行缓存：缓存行数与命中/未命中次数
+def postprocess_cache_metrics():
+    ocr_v2 = sys.modules.get("src.PaddleOCR.ocr_v2")
+    if ocr_v2 is None:
+        return
+    snap = ocr_v2.line_cache.snapshot()
+    yield ("postprocess_cache_lines", "gauge", "后处理逐行缓存中的行数", [({}, snap["size"])])
+    yield ("postprocess_cache_hits_total", "counter", "后处理逐行缓存命中次数", [({}, snap["hits"])])
+    yield ("postprocess_cache_misses_total", "counter", "后处理逐行缓存未命中次数", [({}, snap["misses"])])
+
+
+# 注册上述全部采集函数（重复调用无副作用）
+def register_default_collectors():
+    global _registered
+    if _registered:
+        return
+    for collector in (stage_metrics, threadpool_metrics, executor_metrics, ocr_engine_metrics, db_pool_metrics,
+                      admission_metrics, postprocess_cache_metrics):
+        registry.register_collector(collector)
+    _registered = True
@@ -0,0 +1,272 @@
+import bisect
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prometheus 文本格式（0.0.4）的进程内指标：
+#   - Counter / Gauge / Histogram 在请求路径上只做一次加锁的字典累加，开销可忽略
+#   - 线程池排队、进程池积压、连接池占用、模型缓存等状态量不在请求路径上维护，
+#     由 register_collector 注册的采集函数在 /metrics 被抓取时现算
+#   - MetricsMiddleware 是纯 ASGI 中间件，按路由模板（而不是实际路径）统计请求数与延迟，避免标签基数失控
+#   - 指标只统计当前进程：多进程部署时各工作进程的注册表互相独立，由 start_metrics_server 在每个工作进程的
+#     独立端口上暴露，Prometheus 把每个端口作为一个抓取目标，再按需 sum() 汇总（见 serve.py）
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# HTTP 请求延迟直方图的桶上界（秒）
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}"
+                                for k, v in items]
+
+
+class Gauge(Counter):
+    """可增可减的瞬时值"""
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+
+class Histogram(_Metric):
+    """累计直方图（桶计数、总和与次数）"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = HTTP_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        index = bisect.bisect_left(self.buckets, value)
+        key = self._key(labels)
+        with self._lock:
+            h = self._values.get(key)
+            if h is None:
+                # [各桶计数..., +Inf 桶计数, 总和]
+                h = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            h[index] += 1
+            h[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(h)) for k, h in self._values.items()]
+        lines = self.header()
+        for key, h in items:
+            lines.extend(histogram_lines(self.name, self.labelnames, key, self.buckets, h[:-1], h[-1]))
+        return lines
+
+
+# 把一组（非累计的）桶计数渲染为 Prometheus 直方图样本行
+def histogram_lines(name: str, labelnames: Sequence[str], labelvalues: Sequence, buckets: Sequence[float],
+                    counts: Sequence[int], total: float) -> List[str]:
+    lines, running = [], 0
+    for le, c in zip(list(buckets) + [math.inf], counts):
+        running += c
+        labels = _format_labels(tuple(labelnames) + ("le",), tuple(labelvalues) + (_format_value(le),))
+        lines.append(f"{name}_bucket{labels} {running}")
+    base = _format_labels(labelnames, labelvalues)
+    lines.append(f"{name}_sum{base} {_format_value(total)}")
+    lines.append(f"{name}_count{base} {running}")
+    return lines
+
+
+# 采集函数返回的一组样本：(指标名, 类型, 说明, [(标签 dict, 值), ...])
+Family = Tuple[str, str, str, List[Tuple[dict, float]]]
+
+
+class Registry:
+    """指标注册表：渲染全部已注册指标和采集函数的结果"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable]):
+        """
+        注册抓取时调用的采集函数，它返回（或产出）Family 元组，或已渲染好的文本行列表。
+        单个采集函数出错只会被记录日志，不影响其他指标。
+        """
+        self._collectors.append(collector)
+        return collector
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=HTTP_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                for family in collector() or ():
+                    if isinstance(family, str):
+                        lines.append(family)
+                        continue
+                    name, type_name, documentation, samples = family
+                    lines.append(f"# HELP {name} {documentation}")
+                    lines.append(f"# TYPE {name} {type_name}")
+                    for labels, value in samples:
+                        lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} "
+                                     f"{_format_value(value)}")
+            except Exception as e:
+                logger.error(f"指标采集失败 {getattr(collector, '__name__', collector)}: {e}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP 请求总数", ("method", "route", "status"))
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP 请求处理耗时（秒）", ("method", "route"))
+http_requests_in_progress = registry.gauge(
+    "http_requests_in_progress", "正在处理的 HTTP 请求数", ("method",))
+ocr_engine_loads_total = registry.counter(
+    "ocr_engine_loads_total", "OCR 引擎（模型）加载次数", ("engine", "model"))
+ocr_engine_cache_hits_total = registry.counter(
+    "ocr_engine_cache_hits_total", "复用已加载 OCR 引擎的次数", ("engine", "model"))
+
+
+# 请求所匹配的路由模板；未匹配任何路由的请求归为一类，防止扫描类请求撑爆标签
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path if path is not None else "<unmatched>"
+
+
+class MetricsMiddleware:
+    """统计 HTTP 请求数、延迟与并发数的 ASGI 中间件"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc(method=method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_progress.dec(method=method)
+            route = _route_template(scope)
+            http_request_duration_seconds.observe(elapsed, method=method, route=route)
+            http_requests_total.inc(method=method, route=route, status=str(status_code))
+
+
+# 在独立端口上提供本进程的 /metrics（后台线程），返回 HTTP 服务对象，调用 shutdown() 停止
+def start_metrics_server(host: str, port: int, target: Registry = registry):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = target.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # 抓取请求不写访问日志
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+# 进程池积压的任务数（已提交但尚未完成）
+def executor_backlog(executor) -> Optional[int]:
+    if executor is None:
+        return None
+    pending = getattr(executor, "_pending_work_items", None)
+    if pending is not None:
+        return len(pending)
+    work_queue = getattr(executor, "_work_queue", None)
+    return work_queue.qsize() if work_queue is not None else None
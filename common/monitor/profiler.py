@@ -0,0 +1,160 @@
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 慢请求的采样剖析（默认关闭）：
+#   - 开启后，每个 OCR 请求开始时创建一个 Profile；请求中执行的流水线阶段（stage_timer）会把所在线程登记到该 Profile
+#   - 一个后台线程按固定间隔读取这些线程的调用栈并计数（只采样登记了的线程，不受并发的其他请求干扰）
+#   - 请求结束时耗时超过阈值才落盘，格式为 flamegraph.pl / speedscope 可直接读取的折叠栈（folded stacks）
+# 关闭时 start_profile 直接返回 None，阶段计时中只多一次 ContextVar 读取，不创建采样线程。
+
+OCR_PROFILE_ENABLED = os.getenv('OCR_PROFILE_ENABLED', 'false').strip().lower() in ('1', 'true', 'yes')
+OCR_PROFILE_THRESHOLD_MS = float(os.getenv('OCR_PROFILE_THRESHOLD_MS', '10000'))  # 超过该耗时的请求才保存剖析结果
+OCR_PROFILE_INTERVAL_MS = float(os.getenv('OCR_PROFILE_INTERVAL_MS', '10'))  # 采样间隔
+PROFILE_DIR = Path(os.getenv('PROFILE_DIR', 'profiles'))
+
+MAX_STACK_DEPTH = 128
+
+# 当前请求的 Profile（run_in_threadpool 会把上下文复制到工作线程）
+_active_profile = contextvars.ContextVar("active_profile", default=None)
+
+_profiles = set()
+_profiles_cond = threading.Condition()
+_sampler_thread = None
+
+
+class Profile:
+    """一次请求的采样结果"""
+
+    def __init__(self, interval_ms: float):
+        self.interval_ms = interval_ms
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self._lock = threading.Lock()
+        self._threads: Dict[int, int] = {}
+        self._token = None
+
+    # 把当前线程登记为该请求的工作线程（可嵌套，按引用计数）
+    def attach(self):
+        tid = threading.get_ident()
+        with self._lock:
+            self._threads[tid] = self._threads.get(tid, 0) + 1
+
+    def detach(self):
+        tid = threading.get_ident()
+        with self._lock:
+            n = self._threads.get(tid, 0) - 1
+            if n > 0:
+                self._threads[tid] = n
+            else:
+                self._threads.pop(tid, None)
+
+    def sample(self, frames):
+        with self._lock:
+            tids = list(self._threads)
+        for tid in tids:
+            frame = frames.get(tid)
+            if frame is not None:
+                self.stacks[_fold(frame)] += 1
+                self.samples += 1
+
+    def folded(self) -> str:
+        """折叠栈文本：每行 "根帧;...;叶帧 采样次数" """
+        return "".join(f"{stack} {n}\n" for stack, n in sorted(self.stacks.items()))
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _fold(frame) -> str:
+    names: List[str] = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _sampler_loop():
+    while True:
+        with _profiles_cond:
+            while not _profiles:
+                _profiles_cond.wait()
+            profiles = list(_profiles)
+        frames = sys._current_frames()
+        for profile in profiles:
+            profile.sample(frames)
+        del frames
+        time.sleep(min(p.interval_ms for p in profiles) / 1000.0)
+
+
+def _ensure_sampler():
+    global _sampler_thread
+    if _sampler_thread is None:
+        _sampler_thread = threading.Thread(target=_sampler_loop, name="ocr-profiler", daemon=True)
+        _sampler_thread.start()
+
+
+def active_profile() -> Optional[Profile]:
+    return _active_profile.get()
+
+
+def start_profile() -> Optional[Profile]:
+    """开始剖析当前请求；未开启时返回 None。返回的 Profile 必须由 stop_profile 结束"""
+    if not OCR_PROFILE_ENABLED:
+        return None
+    profile = Profile(OCR_PROFILE_INTERVAL_MS)
+    profile._token = _active_profile.set(profile)
+    with _profiles_cond:
+        _ensure_sampler()
+        _profiles.add(profile)
+        _profiles_cond.notify()
+    return profile
+
+
+def stop_profile(profile: Profile) -> Profile:
+    with _profiles_cond:
+        _profiles.discard(profile)
+    _active_profile.reset(profile._token)
+    profile.duration_ms = (time.perf_counter() - profile.started) * 1000.0
+    return profile
+
+
+def is_slow(profile: Profile, threshold_ms: Optional[float] = None) -> bool:
+    threshold = OCR_PROFILE_THRESHOLD_MS if threshold_ms is None else threshold_ms
+    return profile.duration_ms is not None and profile.duration_ms >= threshold and profile.samples > 0
+
+
+# 把折叠栈写入 <PROFILE_DIR>/<作业ID>/<时间>.folded，返回保存到 Task.result_data 的元信息
+def save_profile(profile: Profile, assignment_id: int, profile_dir: Optional[Path] = None) -> dict:
+    root = Path(profile_dir) if profile_dir is not None else PROFILE_DIR
+    target_dir = root / str(assignment_id)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    created_at = datetime.now()
+    name = f"{created_at:%Y%m%d-%H%M%S-%f}.folded"
+    (target_dir / name).write_text(profile.folded(), encoding="utf-8")
+    return {
+        "file": f"{assignment_id}/{name}",
+        "duration_ms": round(profile.duration_ms, 1),
+        "samples": profile.samples,
+        "interval_ms": profile.interval_ms,
+        "created_at": created_at.isoformat(timespec="seconds"),
+    }
+
+
+# 由保存的元信息得到剖析文件路径（限制在 PROFILE_DIR 内）
+def profile_path(meta: dict, profile_dir: Optional[Path] = None) -> Optional[Path]:
+    root = (Path(profile_dir) if profile_dir is not None else PROFILE_DIR).resolve()
+    path = (root / meta.get("file", "")).resolve()
+    if root not in path.parents or not path.is_file():
+        return None
+    return path
@@ -0,0 +1,183 @@
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Optional
+
+# 按作业推送处理进度（Server-Sent Events）：
+#   - 流水线在处理某份作业时（progress.channel(assignment_id) 上下文内）发布事件：
+#     阶段开始/结束（由 stage_timer.stage 自动发布）、识别出的每一行、编译诊断、评分结果等
+#   - 订阅者是 SSE 连接；事件可能在线程池线程中发布，通过 call_soon_threadsafe 交给订阅者所在的事件循环
+#   - 每份作业保留最近 PROGRESS_HISTORY 条事件，晚连上或断线重连（Last-Event-ID）的客户端先补发历史
+#   - 每次接口调用是一次运行（run），其事件的 data 都带 run 字段；客户端可以自带 runId 调用接口，
+#     并用 /events?run=<runId> 只订阅这次运行，不会把同一作业上一次运行的 done / error 当成本次结果
+# 多进程部署时配置 PROGRESS_RELAY_ADDRESS（serve.py 会自动拉起本机中继并设置），事件经 progress_relay 中继
+# 广播到所有工作进程，任一进程的 /events 都能收到其他进程发布的事件，事件 ID 全局递增；
+# 未配置时事件只在当前进程内传递（单进程开发环境）。
+
+PROGRESS_HISTORY = int(os.getenv('PROGRESS_HISTORY', '500'))  # 每份作业保留的事件数
+PROGRESS_MAX_ASSIGNMENTS = int(os.getenv('PROGRESS_MAX_ASSIGNMENTS', '1000'))  # 最多保留多少份作业的事件历史
+PROGRESS_SUBSCRIBER_QUEUE = int(os.getenv('PROGRESS_SUBSCRIBER_QUEUE', '1000'))  # 单个订阅者积压上限，超出后丢弃
+
+_channel = contextvars.ContextVar("progress_channel", default=None)  # (作业ID, 运行ID)
+
+# 客户端自带的运行ID：字母、数字、下划线与连字符，最长 64 个字符
+RUN_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+class Subscription:
+    """一个订阅者（SSE 连接）：事件放入其事件循环中的队列"""
+
+    def __init__(self, assignment_id, loop):
+        self.assignment_id = assignment_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=PROGRESS_SUBSCRIBER_QUEUE)
+        self.dropped = 0
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1  # 客户端读得太慢，丢弃事件而不是无限积压
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # 事件循环已关闭
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class ProgressBus:
+    def __init__(self, history=PROGRESS_HISTORY, max_assignments=PROGRESS_MAX_ASSIGNMENTS):
+        self.history = history
+        self.max_assignments = max_assignments
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._history = OrderedDict()  # 作业ID -> 最近事件；按最近活跃排序，超出上限时淘汰最久未活跃的作业
+        self._subscribers = {}
+        self._relay = None
+
+    def connect_relay(self, address=None, authkey=None):
+        """连接跨进程中继（在工作进程启动后调用）；之后发布的事件经中继广播，本进程也从中继接收全部事件"""
+        from common.monitor import progress_relay
+        client = progress_relay.RelayClient(self._deliver, address or progress_relay.PROGRESS_RELAY_ADDRESS,
+                                            authkey or progress_relay.PROGRESS_RELAY_AUTHKEY)
+        self._relay = client.connect()
+        return self._relay
+
+    def close_relay(self):
+        relay, self._relay = self._relay, None
+        if relay is not None:
+            relay.close()
+
+    def publish(self, assignment_id, event, run: Optional[str] = None, **data):
+        """
+        发布事件；可在任意线程中调用。返回事件 dict。
+        连接了中继时事件由中继分配全局 ID 后广播回来再投递（返回的 dict 不含 id）；
+        否则 seq 在进程内单调递增，作为 SSE 的 id。
+        """
+        if run is not None:
+            data = {"run": run, **data}
+        message = {"assignment": assignment_id, "event": event, "time": time.time(), "data": data}
+        relay = self._relay
+        if relay is not None and relay.send(message):
+            return message
+        message["id"] = next(self._seq)  # 未使用中继，或中继不可用时退回进程内传递
+        self._deliver(message)
+        return message
+
+    # 记入作业的事件历史并交给订阅者
+    def _deliver(self, message):
+        assignment_id = message["assignment"]
+        with self._lock:
+            history = self._history.get(assignment_id)
+            if history is None:
+                history = self._history[assignment_id] = deque(maxlen=self.history)
+                while len(self._history) > self.max_assignments:
+                    self._history.popitem(last=False)
+            else:
+                self._history.move_to_end(assignment_id)
+            history.append(message)
+            subscribers = list(self._subscribers.get(assignment_id, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+    def subscribe(self, assignment_id, last_event_id: Optional[int] = None):
+        """订阅作业的事件，返回 (订阅, 需要补发的历史事件)；历史与之后的实时事件之间不重不漏"""
+        subscription = Subscription(assignment_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(assignment_id, set()).add(subscription)
+            backlog = [e for e in self._history.get(assignment_id, ())
+                       if last_event_id is None or e["id"] > last_event_id]
+        return subscription, backlog
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.assignment_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.assignment_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+
+bus = ProgressBus()
+
+
+# 校验客户端自带的运行ID，未提供时生成一个新的
+def new_run(run_id: Optional[str] = None) -> str:
+    if run_id is None:
+        return uuid.uuid4().hex
+    if not RUN_ID_PATTERN.fullmatch(run_id):
+        raise ValueError("runId 只能包含字母、数字、下划线与连字符，且不超过 64 个字符")
+    return run_id
+
+
+@contextmanager
+def channel(assignment_id: Optional[int], run: Optional[str] = None):
+    """
+    在该上下文中执行的阶段与 publish 调用都会把进度发布到这份作业（run_in_threadpool 会带上该上下文）。
+    run 为本次运行的ID，未指定时生成一个新的。
+    """
+    token = _channel.set((assignment_id, run or new_run()) if assignment_id is not None else None)
+    try:
+        yield
+    finally:
+        _channel.reset(token)
+
+
+def current_channel() -> Optional[int]:
+    current = _channel.get()
+    return current[0] if current is not None else None
+
+
+def current_run() -> Optional[str]:
+    current = _channel.get()
+    return current[1] if current is not None else None
+
+
+# 向当前作业发布事件（带上本次运行的ID）；不在 channel 上下文中时什么也不做
+def publish(event: str, **data):
+    current = _channel.get()
+    if current is not None:
+        assignment_id, run = current
+        bus.publish(assignment_id, event, run=run, **data)
+
+
+# 把事件格式化为 SSE 文本帧
+def format_sse(message) -> str:
+    data = json.dumps(message["data"], ensure_ascii=False, default=str)
+    return f"id: {message['id']}\nevent: {message['event']}\ndata: {data}\n\n"
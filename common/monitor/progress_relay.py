@@ -0,0 +1,259 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+logger = logging.getLogger(__name__)
+
+# 跨进程的进度事件中继：
+#   - 每个工作进程（api 池与 ocr 池）启动时连接中继；发布的事件先发给中继，中继分配全局递增的事件ID后
+#     广播给所有已连接的工作进程，各进程再交给本进程的订阅者并记入历史
+#   - 因此 /events 可以由任意工作进程提供：编译、报告在 api 池执行，OCR 在 ocr 池执行，事件都能收到；
+#     事件ID全局单调递增，断线重连到另一个工作进程时 Last-Event-ID 仍然有效
+#   - serve.py 以多进程方式启动时自动拉起中继（只在本机内通信）；api 池与 ocr 池分别启动或分布在多台机器上时，
+#     单独运行一个中继并为所有进程配置相同的 PROGRESS_RELAY_ADDRESS（host:port）与 PROGRESS_RELAY_AUTHKEY
+# 消息为 JSON，连接使用 PROGRESS_RELAY_AUTHKEY 认证；Unix 套接字建在仅当前用户可访问的目录中，权限为 0600。
+#
+# 单独启动（在项目根目录执行）:
+#   python -m common.monitor.progress_relay --address 0.0.0.0:8790
+
+PROGRESS_RELAY_ADDRESS = os.getenv('PROGRESS_RELAY_ADDRESS', '')  # Unix 套接字路径或 host:port，留空表示事件只在进程内传递
+PROGRESS_RELAY_AUTHKEY = os.getenv('PROGRESS_RELAY_AUTHKEY', '').encode('utf-8')  # 使用中继时必填
+PROGRESS_RELAY_CONNECT_TIMEOUT = float(os.getenv('PROGRESS_RELAY_CONNECT_TIMEOUT', '10'))  # 启动时等待中继就绪的时间（秒）
+
+
+# 解析地址：含 ':' 且不是路径时视为 TCP
+def parse_address(address):
+    if ':' in address and not address.startswith(('/', '.')):
+        host, port = address.rsplit(':', 1)
+        return host, int(port)
+    return address
+
+
+# 未配置认证密钥时拒绝启动
+def require_authkey(authkey):
+    if not authkey:
+        raise RuntimeError("未设置 PROGRESS_RELAY_AUTHKEY：进度事件中继的连接必须使用随机密钥认证")
+    return authkey
+
+
+# Unix 套接字所在目录必须属于当前用户且其他用户不可访问（0700）
+def _private_socket_dir(path):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.stat(directory)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise RuntimeError(f"进度事件中继的套接字目录 {directory} 必须属于当前用户且权限为 0700")
+    return directory
+
+
+def _encode(message) -> bytes:
+    return json.dumps(message, ensure_ascii=False, default=str).encode('utf-8')
+
+
+# 中继登记新连接后发送的确认：客户端收到后才算连上，之后广播的事件不会漏掉这个连接
+READY = b'{"ready": true}'
+
+
+class ProgressRelay:
+    """中继服务：为收到的事件分配全局ID，并按同一顺序广播给全部连接"""
+
+    def __init__(self, address=PROGRESS_RELAY_ADDRESS, authkey=PROGRESS_RELAY_AUTHKEY):
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self.listener = None
+        self._lock = threading.Lock()
+        self._conns = set()
+        # 以启动时刻（微秒）为起点：中继重启后事件ID仍大于重启前的，客户端的 Last-Event-ID 不会跳过新事件
+        self._seq = itertools.count(time.time_ns() // 1000)
+        self._stopped = threading.Event()
+
+    def start(self):
+        if isinstance(self.address, str):
+            _private_socket_dir(self.address)
+            if os.path.exists(self.address):
+                os.remove(self.address)  # 上次异常退出留下的套接字文件
+            old_umask = os.umask(0o177)  # 套接字文件创建时即为 0600
+            try:
+                self.listener = Listener(self.address, authkey=self.authkey)
+            finally:
+                os.umask(old_umask)
+        else:
+            self.listener = Listener(self.address, authkey=self.authkey)
+        self.address = self.listener.address
+        threading.Thread(target=self._accept_loop, name="progress-relay-accept", daemon=True).start()
+        logger.info(f"进度事件中继监听 {self.address}")
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self.listener is not None:
+            self.listener.close()
+        with self._lock:
+            conns, self._conns = self._conns, set()
+        for conn in conns:
+            conn.close()
+
+    def serve_forever(self):
+        self.start()
+        try:
+            self._stopped.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def connection_count(self) -> int:
+        with self._lock:
+            return len(self._conns)
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                conn = self.listener.accept()
+            except AuthenticationError:
+                logger.warning("拒绝未通过认证的进度事件中继连接")
+                continue
+            except (OSError, EOFError):
+                if self._stopped.is_set():
+                    return
+                continue
+            with self._lock:
+                self._conns.add(conn)
+                try:
+                    conn.send_bytes(READY)
+                except (OSError, EOFError):
+                    self._conns.discard(conn)
+                    continue
+            threading.Thread(target=self._read_loop, args=(conn,), daemon=True).start()
+
+    def _read_loop(self, conn):
+        try:
+            while True:
+                self._broadcast(json.loads(conn.recv_bytes()))
+        except (EOFError, OSError):
+            pass
+        except ValueError:
+            logger.warning("进度事件中继收到无法解析的消息，断开该连接")
+        except Exception:
+            if self._stopped.is_set():
+                return  # stop() 已关闭连接
+            raise
+        with self._lock:
+            self._conns.discard(conn)
+        conn.close()
+
+    # 分配ID与发送在同一把锁内完成，所有连接收到的事件顺序一致
+    def _broadcast(self, message):
+        with self._lock:
+            message["id"] = next(self._seq)
+            payload = _encode(message)
+            for conn in list(self._conns):
+                try:
+                    conn.send_bytes(payload)
+                except (OSError, EOFError):
+                    self._conns.discard(conn)
+
+
+class RelayClient:
+    """工作进程到中继的连接：send 发布事件，接收线程把中继广播的事件交给 deliver 回调"""
+
+    def __init__(self, deliver, address=PROGRESS_RELAY_ADDRESS, authkey=PROGRESS_RELAY_AUTHKEY):
+        self.deliver = deliver
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._closed = False
+
+    def connect(self, timeout=PROGRESS_RELAY_CONNECT_TIMEOUT):
+        """连接中继（中继刚启动时可能尚未就绪，在 timeout 秒内重试）"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with self._lock:
+                    self._connection()
+                return self
+            except (OSError, EOFError):
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.1)
+
+    def _connection(self):
+        if self._conn is None:
+            conn = Client(self.address, authkey=self.authkey)
+            try:
+                if not conn.poll(PROGRESS_RELAY_CONNECT_TIMEOUT) or conn.recv_bytes() != READY:
+                    raise ConnectionError("进度事件中继未确认连接")
+            except BaseException:
+                conn.close()
+                raise
+            self._conn = conn
+            threading.Thread(target=self._receive_loop, args=(self._conn,), name="progress-relay-client",
+                             daemon=True).start()
+        return self._conn
+
+    def _receive_loop(self, conn):
+        try:
+            while True:
+                self.deliver(json.loads(conn.recv_bytes()))
+        except (EOFError, OSError):
+            pass
+        except Exception:
+            if self._closed:
+                return  # close() 已关闭连接
+            logger.exception("处理进度事件中继的消息失败，重置连接")
+        with self._lock:
+            if self._conn is conn:
+                self._conn = None
+        try:
+            conn.close()
+        except OSError:
+            pass
+        # 中继重启期间收不到其他进程的事件：在后台重连，只订阅不发布的进程也能恢复接收
+        if not self._closed:
+            logger.warning("与进度事件中继的连接已断开，正在重新连接")
+        while not self._closed:
+            try:
+                with self._lock:
+                    if not self._closed:
+                        self._connection()
+                return
+            except (OSError, EOFError):
+                time.sleep(1)
+
+    def send(self, message) -> bool:
+        """把事件发给中继；连接失败时返回 False（调用方退回进程内传递）"""
+        with self._lock:
+            try:
+                self._connection().send_bytes(_encode(message))
+                return True
+            except (OSError, EOFError):
+                self._conn = None
+                return False
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="进度事件中继")
+    parser.add_argument("--address", default=PROGRESS_RELAY_ADDRESS, help="Unix 套接字路径或 host:port")
+    args = parser.parse_args(argv)
+    if not args.address:
+        parser.error("请通过 --address 或 PROGRESS_RELAY_ADDRESS 指定监听地址")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    ProgressRelay(args.address).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from common.monitor import profiler, progress
+
+# 流水线各阶段的计时埋点：
+#   - timed_stage 装饰器 / stage 上下文管理器记录墙钟时间、当前线程 CPU 时间、数据大小与置信度
+#   - 所有记录都计入进程内的延迟直方图（供监控接口查询）
+#   - 处于 assignment_context 中时（如 OCR 接口处理某份作业），记录还会进入待写库队列，
+#     由 core.core_db.stage_writer 异步批量写入 Task.processing_time 与 ImageProcess
+
+# 阶段 -> 所属的流水线任务类型（Task.task_type）
+STAGE_TASK_TYPES = {
+    "load": "image_processing",
+    "preprocess": "image_processing",
+    "predict": "ocr",
+    "extract": "ocr",
+    "postprocess": "code_correction",
+    "compile": "compilation",
+    "llm_scoring": "scoring",
+}
+
+# 直方图桶上界（毫秒），最后一个桶为 +Inf
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 60000)
+
+# 待写库队列的上限，写库跟不上时丢弃最旧的记录，避免内存无限增长
+MAX_PENDING_RECORDS = 10000
+
+# 当前处理的作业 ID（run_in_threadpool 会把上下文复制到工作线程）
+_current_assignment = contextvars.ContextVar("current_assignment", default=None)
+
+
+class StageRecord:
+    """一次阶段执行的计时结果"""
+
+    __slots__ = ("stage", "assignment_id", "wall_ms", "cpu_ms", "sizes", "confidence", "error", "attempts")
+
+    def __init__(self, stage: str, assignment_id: Optional[int] = None):
+        self.stage = stage
+        self.assignment_id = assignment_id
+        self.wall_ms = 0.0
+        self.cpu_ms = 0.0
+        self.sizes: Dict[str, int] = {}
+        self.confidence: Optional[float] = None
+        self.error: Optional[str] = None
+        self.attempts = 0  # 写库失败的次数
+
+    def to_dict(self) -> dict:
+        return {
+            "wall_ms": round(self.wall_ms, 3),
+            "cpu_ms": round(self.cpu_ms, 3),
+            "sizes": self.sizes,
+            "error": self.error,
+        }
+
+
+class StageHistograms:
+    """各阶段墙钟耗时的累计直方图（线程安全）"""
+
+    def __init__(self, buckets_ms=HISTOGRAM_BUCKETS_MS):
+        self._lock = threading.Lock()
+        self.buckets_ms = tuple(buckets_ms)
+        self._stages: Dict[str, dict] = {}
+        self._in_progress: Dict[str, int] = {}
+
+    # 阶段开始/结束时调用，统计正在执行的数量（如编译、LLM 调用的并发占用）
+    def enter(self, stage: str):
+        with self._lock:
+            self._in_progress[stage] = self._in_progress.get(stage, 0) + 1
+
+    def leave(self, stage: str):
+        with self._lock:
+            self._in_progress[stage] -= 1
+
+    def in_progress(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._in_progress)
+
+    def observe(self, stage: str, wall_ms: float, cpu_ms: float, failed: bool = False):
+        index = bisect.bisect_left(self.buckets_ms, wall_ms)
+        with self._lock:
+            h = self._stages.get(stage)
+            if h is None:
+                h = self._stages[stage] = {"counts": [0] * (len(self.buckets_ms) + 1), "count": 0,
+                                           "wall_ms_sum": 0.0, "cpu_ms_sum": 0.0, "max_ms": 0.0, "errors": 0}
+            h["counts"][index] += 1
+            h["count"] += 1
+            h["wall_ms_sum"] += wall_ms
+            h["cpu_ms_sum"] += cpu_ms
+            h["max_ms"] = max(h["max_ms"], wall_ms)
+            if failed:
+                h["errors"] += 1
+
+    # 由桶计数估算分位数（返回所在桶的上界）
+    def _quantile(self, counts: List[int], total: int, q: float) -> float:
+        target, running = q * total, 0
+        for i, c in enumerate(counts):
+            running += c
+            if running >= target:
+                return float(self.buckets_ms[i]) if i < len(self.buckets_ms) else float("inf")
+        return float("inf")
+
+    # 原始累计数据的副本（供 Prometheus 导出）
+    def raw(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: {**h, "counts": list(h["counts"])} for name, h in self._stages.items()}
+
+    def snapshot(self) -> dict:
+        stages = self.raw()
+        result = {}
+        for name, h in stages.items():
+            n = h["count"]
+            result[name] = {
+                "count": n,
+                "errors": h["errors"],
+                "avg_wall_ms": round(h["wall_ms_sum"] / n, 3) if n else 0.0,
+                "avg_cpu_ms": round(h["cpu_ms_sum"] / n, 3) if n else 0.0,
+                "max_ms": round(h["max_ms"], 3),
+                "p50_le_ms": self._quantile(h["counts"], n, 0.50),
+                "p95_le_ms": self._quantile(h["counts"], n, 0.95),
+                "p99_le_ms": self._quantile(h["counts"], n, 0.99),
+                "buckets": [{"le_ms": le, "count": c} for le, c in
+                            zip(list(self.buckets_ms) + ["+Inf"], h["counts"])],
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._in_progress = {k: v for k, v in self._in_progress.items() if v}
+
+
+histograms = StageHistograms()
+
+# 队列满时 append 自动挤掉最旧的记录（O(1)）
+_pending = deque(maxlen=MAX_PENDING_RECORDS)
+_pending_lock = threading.Lock()
+_dropped = 0
+_rejected = 0
+
+
+def _enqueue(record: StageRecord):
+    global _dropped
+    with _pending_lock:
+        if len(_pending) >= MAX_PENDING_RECORDS:
+            _dropped += 1
+        _pending.append(record)
+
+
+# 取出全部待写库的记录
+def drain_pending() -> List[StageRecord]:
+    with _pending_lock:
+        records = list(_pending)
+        _pending.clear()
+    return records
+
+
+# 写库失败时把取出的记录放回队首，下次刷新重试；队列空间不足时丢弃其中最旧的记录。
+# 失败次数达到 max_attempts 的记录不再重试（计入 rejected_records），返回放弃的记录数
+def requeue(records: List[StageRecord], max_attempts: Optional[int] = None) -> int:
+    global _dropped
+    for r in records:
+        r.attempts += 1
+    retry = [r for r in records if max_attempts is None or r.attempts < max_attempts]
+    reject(len(records) - len(retry))
+    with _pending_lock:
+        room = MAX_PENDING_RECORDS - len(_pending)
+        keep = retry[len(retry) - room:] if room < len(retry) else retry
+        _dropped += len(retry) - len(keep)
+        _pending.extendleft(reversed(keep))
+    return len(records) - len(retry)
+
+
+# 记录无法写库而被放弃的记录数（数据本身有问题，或重试次数用尽）
+def reject(count: int = 1):
+    global _rejected
+    with _pending_lock:
+        _rejected += count
+
+
+def dropped_records() -> int:
+    return _dropped
+
+
+def rejected_records() -> int:
+    return _rejected
+
+
+@contextmanager
+def assignment_context(assignment_id: Optional[int]):
+    """在该上下文中执行的阶段都会关联到这份作业，并写入数据库"""
+    token = _current_assignment.set(assignment_id)
+    try:
+        yield
+    finally:
+        _current_assignment.reset(token)
+
+
+def current_assignment() -> Optional[int]:
+    return _current_assignment.get()
+
+
+def _finish(record: StageRecord, wall_start: float, cpu_start: float):
+    histograms.leave(record.stage)
+    record.wall_ms = (time.perf_counter() - wall_start) * 1000.0
+    # thread_time 只统计当前线程，避免把线程池里其他请求的 CPU 时间算进来
+    record.cpu_ms = (time.thread_time() - cpu_start) * 1000.0
+    histograms.observe(record.stage, record.wall_ms, record.cpu_ms, failed=record.error is not None)
+    if record.assignment_id is not None:
+        _enqueue(record)
+
+
+@contextmanager
+def stage(name: str, **sizes):
+    """
+    对一段代码计时:
+        with stage("compile", in_chars=len(code)) as rec:
+            ...
+            rec.sizes["out_chars"] = len(output)
+    """
+    record = StageRecord(name, _current_assignment.get())
+    record.sizes.update(sizes)
+    histograms.enter(name)
+    # 在 progress.channel 上下文中时，把阶段开始/结束推送给该作业的进度订阅者
+    progress.publish("stage", stage=name, state="start")
+    # 请求开启了采样剖析时，阶段执行期间把当前线程交给采样器
+    profile = profiler.active_profile()
+    if profile is not None:
+        profile.attach()
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        yield record
+    except BaseException as e:
+        record.error = type(e).__name__
+        raise
+    finally:
+        _finish(record, wall_start, cpu_start)
+        if profile is not None:
+            profile.detach()
+        progress.publish("stage", stage=name, state="error" if record.error else "end",
+                         wall_ms=round(record.wall_ms, 1), sizes=dict(record.sizes))
+
+
+def timed_stage(name: str, describe: Optional[Callable] = None):
+    """
+    函数计时装饰器。
+    describe(args, kwargs, result, record) 可选，用于在函数返回后补充 sizes / confidence；
+    它抛出的异常会被忽略，不影响被装饰函数。
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name) as record:
+                result = func(*args, **kwargs)
+                if describe is not None:
+                    try:
+                        describe(args, kwargs, result, record)
+                    except Exception:
+                        pass
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def pending_count() -> int:
+    with _pending_lock:
+        return len(_pending)
+
+
+# 常用的 describe：记录返回图片的尺寸
+def describe_image(args, kwargs, result, record):
+    record.sizes["height"], record.sizes["width"] = int(result.shape[0]), int(result.shape[1])
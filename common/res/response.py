@@ -2,6 +2,7 @@ from typing import Generic, TypeVar, Optional
 from pydantic import BaseModel
 from enum import Enum
 from fastapi import status
+from fastapi.responses import JSONResponse
 
 # 泛型类型变量，用于data字段
 T = TypeVar("T")
@@ -12,6 +13,8 @@ class ResponseCode(Enum):
     SUCCESS = 0  # SuccessCode (成功)
     FAIL_VALID = 1001  # FailValidCode (参数校验失败)
     FAIL_SERVICE = 1002  # FailServiceCode (服务异常)
+    TOO_MANY_REQUESTS = 1003  # TooManyRequestsCode (请求过多)
+    SERVICE_BUSY = 1004  # ServiceBusyCode (服务繁忙)
 
 
 # 枚举，用于对应的消息（自动映射）
@@ -19,6 +22,8 @@ class ResponseMessage(Enum):
     SUCCESS = "成功"
     FAIL_VALID = "参数校验失败"
     FAIL_SERVICE = "服务异常"
+    TOO_MANY_REQUESTS = "请求过多，请稍后重试"
+    SERVICE_BUSY = "服务繁忙，请稍后重试"
 
 
 # Pydantic模型，用于全局响应结构
@@ -98,6 +103,8 @@ def error_response(code: int, message: Optional[str] = None) -> tuple[ApiRespons
         status.HTTP_200_OK if code == ResponseCode.SUCCESS.value
         else status.HTTP_400_BAD_REQUEST if code == ResponseCode.FAIL_VALID.value
         else status.HTTP_500_INTERNAL_SERVER_ERROR if code == ResponseCode.FAIL_SERVICE.value
+        else status.HTTP_429_TOO_MANY_REQUESTS if code == ResponseCode.TOO_MANY_REQUESTS.value
+        else status.HTTP_503_SERVICE_UNAVAILABLE if code == ResponseCode.SERVICE_BUSY.value
         else status.HTTP_500_INTERNAL_SERVER_ERROR
     )
     return (
@@ -107,4 +114,18 @@ def error_response(code: int, message: Optional[str] = None) -> tuple[ApiRespons
             data=None
         ),
         http_status
-    )
\ No newline at end of file
+    )
+
+
+# 工具函数，把 (ApiResponse, HTTP状态码) 元组转成真正带该状态码的响应
+def json_response(response: tuple[ApiResponse, int], headers: Optional[dict] = None) -> JSONResponse:
+    """
+    路由直接返回元组时 FastAPI 会按 200 把它序列化成 JSON 数组；需要客户端/网关按状态码处理的响应
+    （如 429/503 拒绝）用本函数返回，状态码与响应头才会生效。
+
+    :param response: success_response / error_response 等返回的元组
+    :param headers: 可选的额外响应头（如 Retry-After）
+    :return: JSONResponse，响应体为 ApiResponse，状态码为元组中的HTTP状态
+    """
+    body, http_status = response
+    return JSONResponse(content=body.model_dump(), status_code=http_status, headers=headers)
@@ -0,0 +1,272 @@
+from sqlalchemy import func, select, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
+
+from core.core_db.models import User, Assignment, Task, ImageProcess
+from core.core_db.password_hasher import hash_password_async, hash_passwords_async
+from core.core_db.crud import (
+    INITIAL_TASK_TYPES, ASSIGNMENT_DETAIL_OPTIONS, USER_KEYSET, ASSIGNMENT_KEYSET, TASK_KEYSET,
+    _assignments_query, _page_bounds, _paginate, _keyset_stmt, _keyset_page, _tasks_query
+)
+from core.core_db.schemas import (
+    UserCreate, UserUpdate, AssignmentCreate, AssignmentUpdate,
+    TaskCreate, TaskUpdate, ImageProcessCreate, PaginatedAssignmentsWithDetails
+)
+
+
+# 按主键直接执行 UPDATE ... RETURNING，一次往返完成更新并取回最新行（不存在时返回 None）
+async def _update_by_id(db: AsyncSession, model, pk: int, values: dict):
+    if not values:
+        return await db.get(model, pk)
+    obj = (await db.scalars(update(model).where(model.id == pk).values(**values).returning(model))).first()
+    await db.commit()
+    return obj
+
+
+class AsyncUserCRUD:
+    @staticmethod
+    async def get_user(db: AsyncSession, user_id: int) -> Optional[User]:
+        return await db.get(User, user_id)
+
+    @staticmethod
+    async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+        result = await db.execute(select(User).where(User.username == username))
+        return result.scalars().first()
+
+    @staticmethod
+    async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[User]:
+        result = await db.execute(select(User).offset(skip).limit(limit))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_users_page(db: AsyncSession, cursor: Optional[str] = None,
+                             limit: int = 100) -> Tuple[List[User], Optional[str]]:
+        """按 id 游标分页查询用户，返回 (本页用户, 下一页游标)"""
+        rows = (await db.scalars(_keyset_stmt(select(User), USER_KEYSET, cursor, limit))).all()
+        return _keyset_page(list(rows), USER_KEYSET, limit)
+
+    @staticmethod
+    async def create_user(db: AsyncSession, user: UserCreate) -> User:
+        # bcrypt 是 CPU 密集型操作，放到进程池中执行，避免阻塞事件循环
+        hashed_password = await hash_password_async(user.password)
+        db_user = User(
+            username=user.username,
+            email=user.email,
+            password_hash=hashed_password,
+            role=user.role
+        )
+        db.add(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        return db_user
+
+    @staticmethod
+    async def create_users_bulk(db: AsyncSession, users: List[UserCreate]) -> List[User]:
+        """批量导入用户（如班级名单）：密码在进程池中并行哈希，再用一条 INSERT ... RETURNING 写入"""
+        if not users:
+            return []
+        hashed = await hash_passwords_async([u.password for u in users])
+        db_users = list((await db.scalars(
+            insert(User).returning(User, sort_by_parameter_order=True),
+            [{"username": u.username, "email": u.email, "password_hash": h, "role": u.role}
+             for u, h in zip(users, hashed)]
+        )).all())
+        await db.commit()
+        return db_users
+
+    @staticmethod
+    async def set_password(db: AsyncSession, user_id: int, password: str) -> Optional[User]:
+        """设置（重置）用户密码"""
+        return await _update_by_id(db, User, user_id, {"password_hash": await hash_password_async(password)})
+
+    @staticmethod
+    async def update_user(db: AsyncSession, user_id: int, user_update: UserUpdate) -> Optional[User]:
+        return await _update_by_id(db, User, user_id, user_update.model_dump(exclude_unset=True))
+
+    @staticmethod
+    async def delete_user(db: AsyncSession, user_id: int) -> bool:
+        db_user = await db.get(User, user_id)
+        if db_user:
+            await db.delete(db_user)
+            await db.commit()
+            return True
+        return False
+
+
+class AsyncAssignmentCRUD:
+    @staticmethod
+    async def get_assignment(db: AsyncSession, assignment_id: int) -> Optional[Assignment]:
+        return await db.get(Assignment, assignment_id)
+
+    @staticmethod
+    async def get_assignments_by_user(db: AsyncSession, user_id: int, skip: int = 0,
+                                      limit: int = 100) -> List[Assignment]:
+        result = await db.execute(
+            select(Assignment).where(Assignment.user_id == user_id).offset(skip).limit(limit))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_assignments_by_user_page(db: AsyncSession, user_id: int, cursor: Optional[str] = None,
+                                           limit: int = 100) -> Tuple[List[Assignment], Optional[str]]:
+        """按上传先后倒序游标分页查询用户作业，返回 (本页作业, 下一页游标)"""
+        stmt = select(Assignment).where(Assignment.user_id == user_id)
+        rows = (await db.scalars(_keyset_stmt(stmt, ASSIGNMENT_KEYSET, cursor, limit, descending=True))).all()
+        return _keyset_page(list(rows), ASSIGNMENT_KEYSET, limit)
+
+    @staticmethod
+    async def get_assignment_with_details(db: AsyncSession, assignment_id: int) -> Optional[Assignment]:
+        """查询单个作业并预加载 tasks、score、image_processes"""
+        result = await db.scalars(
+            select(Assignment).options(*ASSIGNMENT_DETAIL_OPTIONS).where(Assignment.id == assignment_id))
+        return result.unique().first()
+
+    @staticmethod
+    async def get_assignments_with_details(db: AsyncSession, user_ids: Optional[List[int]] = None, skip: int = 0,
+                                           limit: int = 100) -> List[Assignment]:
+        """查询作业列表并预加载详情，查询条数与作业数量无关（1 条主查询 + 2 条 IN 查询）"""
+        stmt = _assignments_query(user_ids).options(*ASSIGNMENT_DETAIL_OPTIONS)
+        result = await db.scalars(stmt.order_by(Assignment.id).offset(skip).limit(limit))
+        return list(result.unique().all())
+
+    @staticmethod
+    async def paginate_assignments_with_details(db: AsyncSession, user_ids: Optional[List[int]] = None,
+                                                page: int = 1, page_size: int = 20) -> PaginatedAssignmentsWithDetails:
+        """分页查询作业详情（如教师查看全班作业），page 从 1 开始，page_size 不超过 MAX_PAGE_SIZE"""
+        page, page_size = _page_bounds(page, page_size)
+        total = await db.scalar(_assignments_query(user_ids).with_only_columns(func.count(Assignment.id)))
+        items = await AsyncAssignmentCRUD.get_assignments_with_details(
+            db, user_ids, (page - 1) * page_size, page_size)
+        return _paginate(items, total, page, page_size)
+
+    @staticmethod
+    async def create_assignment(db: AsyncSession, assignment: AssignmentCreate) -> Assignment:
+        db_assignment = Assignment(**assignment.model_dump())
+        db.add(db_assignment)
+        await db.commit()
+        await db.refresh(db_assignment)
+        return db_assignment
+
+    @staticmethod
+    async def create_assignments_bulk(db: AsyncSession, assignments: List[AssignmentCreate],
+                                      with_initial_tasks: bool = True, priority: str = "interactive",
+                                      submitted_by: Optional[int] = None) -> List[Assignment]:
+        """批量创建作业（及其全部阶段任务），单个事务、每张表一条 INSERT ... RETURNING"""
+        if not assignments:
+            return []
+        db_assignments = list((await db.scalars(
+            insert(Assignment).returning(Assignment, sort_by_parameter_order=True),
+            [a.model_dump() for a in assignments]
+        )).all())
+        if with_initial_tasks:
+            await AsyncTaskCRUD.create_tasks_bulk(db, [
+                TaskCreate(task_type=task_type, assignment_id=a.id, priority=priority, submitted_by=submitted_by)
+                for a in db_assignments for task_type in INITIAL_TASK_TYPES
+            ], commit=False)
+        await db.commit()
+        return db_assignments
+
+    @staticmethod
+    async def update_assignment(db: AsyncSession, assignment_id: int,
+                                assignment_update: AssignmentUpdate) -> Optional[Assignment]:
+        return await _update_by_id(db, Assignment, assignment_id, assignment_update.model_dump(exclude_unset=True))
+
+
+class AsyncTaskCRUD:
+    @staticmethod
+    async def get_task(db: AsyncSession, task_id: int) -> Optional[Task]:
+        return await db.get(Task, task_id)
+
+    @staticmethod
+    async def get_tasks_by_assignment(db: AsyncSession, assignment_id: int) -> List[Task]:
+        result = await db.execute(select(Task).where(Task.assignment_id == assignment_id))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_task_by_type(db: AsyncSession, assignment_id: int, task_type: str) -> Optional[Task]:
+        return await db.scalar(select(Task).where(Task.assignment_id == assignment_id, Task.task_type == task_type)
+                               .order_by(Task.id).limit(1))
+
+    @staticmethod
+    async def get_tasks_by_status_page(db: AsyncSession, status: str, task_type: Optional[str] = None,
+                                       cursor: Optional[str] = None,
+                                       limit: int = 100) -> Tuple[List[Task], Optional[str]]:
+        """按 id 游标分页查询某状态（及阶段类型）的任务队列，返回 (本页任务, 下一页游标)"""
+        rows = (await db.scalars(_keyset_stmt(_tasks_query(status, task_type), TASK_KEYSET, cursor, limit))).all()
+        return _keyset_page(list(rows), TASK_KEYSET, limit)
+
+    @staticmethod
+    async def create_task(db: AsyncSession, task: TaskCreate) -> Task:
+        db_task = Task(**task.model_dump())
+        db.add(db_task)
+        await db.commit()
+        await db.refresh(db_task)
+        return db_task
+
+    @staticmethod
+    async def create_tasks_bulk(db: AsyncSession, tasks: List[TaskCreate], commit: bool = True) -> List[Task]:
+        """批量创建任务，一条 INSERT ... RETURNING；commit=False 时由调用方在同一事务中提交"""
+        if not tasks:
+            return []
+        db_tasks = list((await db.scalars(
+            insert(Task).returning(Task, sort_by_parameter_order=True),
+            [t.model_dump() for t in tasks]
+        )).all())
+        if commit:
+            await db.commit()
+        return db_tasks
+
+    @staticmethod
+    async def create_initial_tasks(db: AsyncSession, assignment_id: int, priority: str = "interactive",
+                                   submitted_by: Optional[int] = None) -> List[Task]:
+        """为作业创建初始处理任务（单个事务）"""
+        return await AsyncTaskCRUD.create_tasks_bulk(db, [
+            TaskCreate(task_type=task_type, assignment_id=assignment_id, priority=priority, submitted_by=submitted_by)
+            for task_type in INITIAL_TASK_TYPES
+        ])
+
+    @staticmethod
+    async def update_task(db: AsyncSession, task_id: int, task_update: TaskUpdate) -> Optional[Task]:
+        return await _update_by_id(db, Task, task_id, task_update.model_dump(exclude_unset=True))
+
+    @staticmethod
+    async def update_tasks_status(db: AsyncSession, task_ids: List[int], status: str,
+                                  error_message: Optional[str] = None) -> List[Task]:
+        """批量更新多个任务的状态，一条 UPDATE ... RETURNING；返回实际更新到的任务"""
+        if not task_ids:
+            return []
+        values = {"status": status}
+        if error_message is not None:
+            values["error_message"] = error_message
+        db_tasks = list((await db.scalars(
+            update(Task).where(Task.id.in_(task_ids)).values(**values).returning(Task)
+        )).all())
+        await db.commit()
+        return db_tasks
+
+
+class AsyncImageProcessCRUD:
+    @staticmethod
+    async def create_image_process(db: AsyncSession, image_process: ImageProcessCreate,
+                                   commit: bool = True) -> ImageProcess:
+        db_image_process = ImageProcess(**image_process.model_dump())
+        db.add(db_image_process)
+        if commit:
+            await db.commit()
+            await db.refresh(db_image_process)
+        return db_image_process
+
+    @staticmethod
+    async def get_latest_image_process(db: AsyncSession, assignment_id: int,
+                                       process_step: str) -> Optional[ImageProcess]:
+        """某份作业某个处理步骤的最新一条记录"""
+        return await db.scalar(select(ImageProcess)
+                               .where(ImageProcess.assignment_id == assignment_id,
+                                      ImageProcess.process_step == process_step)
+                               .order_by(ImageProcess.id.desc()).limit(1))
+
+
+# 实例化CRUD类
+async_user_crud = AsyncUserCRUD()
+async_assignment_crud = AsyncAssignmentCRUD()
+async_task_crud = AsyncTaskCRUD()
+async_image_process_crud = AsyncImageProcessCRUD()
@@ -0,0 +1,41 @@
+import os
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from core.core_db.database import (
+    DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+)
+
+# 异步数据库URL（asyncpg 驱动）；本地测试环境（APP_ENV=test）默认回退到 aiosqlite
+if os.getenv('APP_ENV') == 'test':
+    _default_async_url = "sqlite+aiosqlite:///./cpp_ocr_test.db"
+else:
+    _default_async_url = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL', _default_async_url)
+
+
+# 按连接池配置创建异步数据库引擎（SQLite 不使用连接池参数）
+def create_pooled_async_engine(url: str):
+    if url.startswith("sqlite"):
+        return create_async_engine(url)
+    return create_async_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+
+
+# 创建异步数据库引擎
+async_engine = create_pooled_async_engine(ASYNC_DATABASE_URL)
+
+# 创建异步Session类（异步会话不能在提交后隐式懒加载属性，因此提交后不使属性过期）
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+# 获取异步数据库会话的函数（FastAPI 依赖）
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,13 +1,124 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
-import bcrypt
+import base64
+import json
+import math
+from sqlalchemy import func, insert, literal, select, tuple_, update
+from sqlalchemy.orm import Session, joinedload, selectinload
+from typing import List, Optional, Tuple
 
 from core.core_db.models import User, Assignment, Task, Score, ImageProcess
+from core.core_db.password_hasher import hash_password, hash_passwords, unusable_password_hash
 from core.core_db.schemas import (
-    UserCreate, UserUpdate, AssignmentCreate, AssignmentUpdate,
-    TaskCreate, TaskUpdate, ScoreCreate, ImageProcessCreate
+    UserBase, UserCreate, UserUpdate, AssignmentCreate, AssignmentUpdate,
+    TaskCreate, TaskUpdate, ScoreCreate, ImageProcessCreate,
+    AssignmentWithDetails, PaginatedAssignmentsWithDetails
 )
 
+# 每份作业的流水线阶段任务
+INITIAL_TASK_TYPES = ["image_processing", "ocr", "code_correction", "compilation", "scoring"]
+
+
+# 作业详情的预加载选项：一对多用 selectinload（每个关系一条 IN 查询），一对一的 score 直接 JOIN
+ASSIGNMENT_DETAIL_OPTIONS = (
+    selectinload(Assignment.tasks),
+    joinedload(Assignment.score),
+    selectinload(Assignment.image_processes),
+)
+
+
+# 作业列表查询（可按用户过滤），按 id 排序保证分页稳定
+def _assignments_query(user_ids: Optional[List[int]] = None):
+    stmt = select(Assignment)
+    if user_ids is not None:
+        stmt = stmt.where(Assignment.user_id.in_(user_ids))
+    return stmt
+
+
+# 单页最多返回的作业数（作业详情包含全部任务与识别结果，页过大会拖慢查询并占满内存）
+MAX_PAGE_SIZE = 100
+
+
+# 规范分页参数：page 至少为 1，page_size 限制在 1..MAX_PAGE_SIZE，避免负数 OFFSET 或一次取出全表
+def _page_bounds(page: int, page_size: int) -> Tuple[int, int]:
+    return max(1, page), min(max(1, page_size), MAX_PAGE_SIZE)
+
+
+# 组装分页结果
+def _paginate(items: List[Assignment], total: int, page: int, page_size: int) -> PaginatedAssignmentsWithDetails:
+    return PaginatedAssignmentsWithDetails(
+        items=[AssignmentWithDetails.model_validate(a) for a in items],
+        total=total,
+        page=page,
+        page_size=page_size,
+        total_pages=math.ceil(total / page_size) if page_size else 0,
+    )
+
+
+# 游标：把排序键的取值编码为不透明字符串
+def encode_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, keys) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except ValueError:
+        raise ValueError("无效的分页游标")
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError("无效的分页游标")
+    return values
+
+
+# 键集（游标）分页：WHERE (k1, k2) > (v1, v2) ORDER BY k1, k2 LIMIT n+1，
+# 翻到任意深度都只扫描一页数据（需要有以这些列结尾的索引）
+def _keyset_stmt(stmt, keys, cursor: Optional[str], limit: int, descending: bool = False):
+    if cursor:
+        row = tuple_(*keys)
+        bound = tuple_(*[literal(v, k.type) for k, v in zip(keys, decode_cursor(cursor, keys))])
+        stmt = stmt.where(row < bound if descending else row > bound)
+    return stmt.order_by(*[k.desc() if descending else k.asc() for k in keys]).limit(limit + 1)
+
+
+# 截取一页结果并生成下一页游标
+def _keyset_page(rows: list, keys, limit: int) -> Tuple[list, Optional[str]]:
+    items = rows[:limit]
+    if len(rows) <= limit:
+        return items, None
+    return items, encode_cursor([getattr(items[-1], k.key) for k in keys])
+
+
+USER_KEYSET = (User.id,)
+# 作业 id 自增，与上传先后一致；不用 uploaded_at 作排序键，避免同一时刻批量上传的作业无法区分
+ASSIGNMENT_KEYSET = (Assignment.id,)
+TASK_KEYSET = (Task.id,)
+
+
+# 任务队列查询（按状态、可选阶段类型过滤）
+def _tasks_query(status: str, task_type: Optional[str] = None):
+    stmt = select(Task).where(Task.status == status)
+    if task_type is not None:
+        stmt = stmt.where(Task.task_type == task_type)
+    return stmt
+
+
+# 提交但不使会话中的对象过期：INSERT/UPDATE ... RETURNING 已取回最新值，
+# 会话按默认配置（expire_on_commit=True）提交时，返回的对象在首次访问属性时还会再 SELECT 一次
+def _commit_returning(db: Session):
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+
+# 按主键直接执行 UPDATE ... RETURNING，一次往返完成更新并取回最新行（不存在时返回 None）
+def _update_by_id(db: Session, model, pk: int, values: dict):
+    if not values:
+        return db.get(model, pk)
+    obj = db.scalars(update(model).where(model.id == pk).values(**values).returning(model)).first()
+    _commit_returning(db)
+    return obj
+
 
 class UserCRUD:
     @staticmethod
@@ -22,9 +133,16 @@ class UserCRUD:
     def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
         return db.query(User).offset(skip).limit(limit).all()
 
+    @staticmethod
+    def get_users_page(db: Session, cursor: Optional[str] = None,
+                       limit: int = 100) -> Tuple[List[User], Optional[str]]:
+        """按 id 游标分页查询用户，返回 (本页用户, 下一页游标)"""
+        rows = db.scalars(_keyset_stmt(select(User), USER_KEYSET, cursor, limit)).all()
+        return _keyset_page(list(rows), USER_KEYSET, limit)
+
     @staticmethod
     def create_user(db: Session, user: UserCreate) -> User:
-        hashed_password = bcrypt.hashpw(user.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_password = hash_password(user.password)
         db_user = User(
             username=user.username,
             email=user.email,
@@ -36,16 +154,38 @@ class UserCRUD:
         db.refresh(db_user)
         return db_user
 
+    @staticmethod
+    def create_users_bulk(db: Session, users: List[UserCreate]) -> List[User]:
+        """批量导入用户（如班级名单）：密码在进程池中并行哈希，再用一条 INSERT ... RETURNING 写入"""
+        if not users:
+            return []
+        return UserCRUD._insert_users(db, users, hash_passwords([u.password for u in users]))
+
+    @staticmethod
+    def create_users_without_password_bulk(db: Session, users: List[UserBase]) -> List[User]:
+        """批量创建未设置密码的账号（如批量导入的学生）：写入不可用的密码哈希，设置密码（set_password）前无法登录"""
+        if not users:
+            return []
+        return UserCRUD._insert_users(db, users, [unusable_password_hash() for _ in users])
+
+    @staticmethod
+    def _insert_users(db: Session, users, hashed: List[str]) -> List[User]:
+        db_users = list(db.scalars(
+            insert(User).returning(User, sort_by_parameter_order=True),
+            [{"username": u.username, "email": u.email, "password_hash": h, "role": u.role}
+             for u, h in zip(users, hashed)]
+        ).all())
+        _commit_returning(db)
+        return db_users
+
+    @staticmethod
+    def set_password(db: Session, user_id: int, password: str) -> Optional[User]:
+        """设置（重置）用户密码"""
+        return _update_by_id(db, User, user_id, {"password_hash": hash_password(password)})
+
     @staticmethod
     def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[User]:
-        db_user = db.query(User).filter(User.id == user_id).first()
-        if db_user:
-            update_data = user_update.dict(exclude_unset=True)
-            for field, value in update_data.items():
-                setattr(db_user, field, value)
-            db.commit()
-            db.refresh(db_user)
-        return db_user
+        return _update_by_id(db, User, user_id, user_update.model_dump(exclude_unset=True))
 
     @staticmethod
     def delete_user(db: Session, user_id: int) -> bool:
@@ -66,24 +206,67 @@ class AssignmentCRUD:
     def get_assignments_by_user(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Assignment]:
         return db.query(Assignment).filter(Assignment.user_id == user_id).offset(skip).limit(limit).all()
 
+    @staticmethod
+    def get_assignments_by_user_page(db: Session, user_id: int, cursor: Optional[str] = None,
+                                     limit: int = 100) -> Tuple[List[Assignment], Optional[str]]:
+        """按上传先后倒序游标分页查询用户作业，返回 (本页作业, 下一页游标)"""
+        stmt = select(Assignment).where(Assignment.user_id == user_id)
+        rows = db.scalars(_keyset_stmt(stmt, ASSIGNMENT_KEYSET, cursor, limit, descending=True)).all()
+        return _keyset_page(list(rows), ASSIGNMENT_KEYSET, limit)
+
+    @staticmethod
+    def get_assignment_with_details(db: Session, assignment_id: int) -> Optional[Assignment]:
+        """查询单个作业并预加载 tasks、score、image_processes"""
+        return db.scalars(
+            select(Assignment).options(*ASSIGNMENT_DETAIL_OPTIONS).where(Assignment.id == assignment_id)
+        ).unique().first()
+
+    @staticmethod
+    def get_assignments_with_details(db: Session, user_ids: Optional[List[int]] = None, skip: int = 0,
+                                     limit: int = 100) -> List[Assignment]:
+        """查询作业列表并预加载详情，查询条数与作业数量无关（1 条主查询 + 2 条 IN 查询）"""
+        stmt = _assignments_query(user_ids).options(*ASSIGNMENT_DETAIL_OPTIONS)
+        return list(db.scalars(stmt.order_by(Assignment.id).offset(skip).limit(limit)).unique().all())
+
+    @staticmethod
+    def paginate_assignments_with_details(db: Session, user_ids: Optional[List[int]] = None, page: int = 1,
+                                          page_size: int = 20) -> PaginatedAssignmentsWithDetails:
+        """分页查询作业详情（如教师查看全班作业），page 从 1 开始，page_size 不超过 MAX_PAGE_SIZE"""
+        page, page_size = _page_bounds(page, page_size)
+        total = db.scalar(_assignments_query(user_ids).with_only_columns(func.count(Assignment.id)))
+        items = AssignmentCRUD.get_assignments_with_details(db, user_ids, (page - 1) * page_size, page_size)
+        return _paginate(items, total, page, page_size)
+
     @staticmethod
     def create_assignment(db: Session, assignment: AssignmentCreate) -> Assignment:
-        db_assignment = Assignment(**assignment.dict())
+        db_assignment = Assignment(**assignment.model_dump())
         db.add(db_assignment)
         db.commit()
         db.refresh(db_assignment)
         return db_assignment
 
+    @staticmethod
+    def create_assignments_bulk(db: Session, assignments: List[AssignmentCreate],
+                                with_initial_tasks: bool = True, priority: str = "interactive",
+                                submitted_by: Optional[int] = None) -> List[Assignment]:
+        """批量创建作业（及其全部阶段任务），单个事务、每张表一条 INSERT ... RETURNING"""
+        if not assignments:
+            return []
+        db_assignments = list(db.scalars(
+            insert(Assignment).returning(Assignment, sort_by_parameter_order=True),
+            [a.model_dump() for a in assignments]
+        ).all())
+        if with_initial_tasks:
+            TaskCRUD.create_tasks_bulk(db, [
+                TaskCreate(task_type=task_type, assignment_id=a.id, priority=priority, submitted_by=submitted_by)
+                for a in db_assignments for task_type in INITIAL_TASK_TYPES
+            ], commit=False)
+        _commit_returning(db)
+        return db_assignments
+
     @staticmethod
     def update_assignment(db: Session, assignment_id: int, assignment_update: AssignmentUpdate) -> Optional[Assignment]:
-        db_assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
-        if db_assignment:
-            update_data = assignment_update.dict(exclude_unset=True)
-            for field, value in update_data.items():
-                setattr(db_assignment, field, value)
-            db.commit()
-            db.refresh(db_assignment)
-        return db_assignment
+        return _update_by_id(db, Assignment, assignment_id, assignment_update.model_dump(exclude_unset=True))
 
 
 class TaskCRUD:
@@ -95,32 +278,67 @@ class TaskCRUD:
     def get_tasks_by_assignment(db: Session, assignment_id: int) -> List[Task]:
         return db.query(Task).filter(Task.assignment_id == assignment_id).all()
 
+    @staticmethod
+    def get_task_by_type(db: Session, assignment_id: int, task_type: str) -> Optional[Task]:
+        return db.query(Task).filter(Task.assignment_id == assignment_id, Task.task_type == task_type) \
+            .order_by(Task.id).first()
+
+    @staticmethod
+    def get_tasks_by_status_page(db: Session, status: str, task_type: Optional[str] = None,
+                                 cursor: Optional[str] = None,
+                                 limit: int = 100) -> Tuple[List[Task], Optional[str]]:
+        """按 id 游标分页查询某状态（及阶段类型）的任务队列，返回 (本页任务, 下一页游标)"""
+        rows = db.scalars(_keyset_stmt(_tasks_query(status, task_type), TASK_KEYSET, cursor, limit)).all()
+        return _keyset_page(list(rows), TASK_KEYSET, limit)
+
     @staticmethod
     def create_task(db: Session, task: TaskCreate) -> Task:
-        db_task = Task(**task.dict())
+        db_task = Task(**task.model_dump())
         db.add(db_task)
         db.commit()
         db.refresh(db_task)
         return db_task
 
     @staticmethod
-    def create_initial_tasks(db: Session, assignment_id: int):
-        """为作业创建初始处理任务"""
-        task_types = ["image_processing", "ocr", "code_correction", "compilation", "scoring"]
-        for task_type in task_types:
-            task = TaskCreate(task_type=task_type, assignment_id=assignment_id)
-            TaskCRUD.create_task(db, task)
+    def create_tasks_bulk(db: Session, tasks: List[TaskCreate], commit: bool = True) -> List[Task]:
+        """批量创建任务，一条 INSERT ... RETURNING；commit=False 时由调用方在同一事务中提交"""
+        if not tasks:
+            return []
+        db_tasks = list(db.scalars(
+            insert(Task).returning(Task, sort_by_parameter_order=True),
+            [t.model_dump() for t in tasks]
+        ).all())
+        if commit:
+            _commit_returning(db)
+        return db_tasks
+
+    @staticmethod
+    def create_initial_tasks(db: Session, assignment_id: int, priority: str = "interactive",
+                             submitted_by: Optional[int] = None) -> List[Task]:
+        """为作业创建初始处理任务（单个事务）"""
+        return TaskCRUD.create_tasks_bulk(db, [
+            TaskCreate(task_type=task_type, assignment_id=assignment_id, priority=priority, submitted_by=submitted_by)
+            for task_type in INITIAL_TASK_TYPES
+        ])
 
     @staticmethod
     def update_task(db: Session, task_id: int, task_update: TaskUpdate) -> Optional[Task]:
-        db_task = db.query(Task).filter(Task.id == task_id).first()
-        if db_task:
-            update_data = task_update.dict(exclude_unset=True)
-            for field, value in update_data.items():
-                setattr(db_task, field, value)
-            db.commit()
-            db.refresh(db_task)
-        return db_task
+        return _update_by_id(db, Task, task_id, task_update.model_dump(exclude_unset=True))
+
+    @staticmethod
+    def update_tasks_status(db: Session, task_ids: List[int], status: str,
+                            error_message: Optional[str] = None) -> List[Task]:
+        """批量更新多个任务的状态，一条 UPDATE ... RETURNING；返回实际更新到的任务"""
+        if not task_ids:
+            return []
+        values = {"status": status}
+        if error_message is not None:
+            values["error_message"] = error_message
+        db_tasks = list(db.scalars(
+            update(Task).where(Task.id.in_(task_ids)).values(**values).returning(Task)
+        ).all())
+        _commit_returning(db)
+        return db_tasks
 
 
 # 实例化CRUD类
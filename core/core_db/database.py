@@ -1,7 +1,11 @@
 import os
+import threading
+import time
 from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 # 从环境变量获取数据库配置，并提供默认值
 DB_USER = os.getenv('DB_USER', 'postgres')
@@ -17,16 +21,136 @@ DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NA
 TEST_DB_NAME = os.getenv('TEST_DB_NAME', f"{DB_NAME}_test")
 TEST_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-# 创建数据库引擎
-engine = create_engine(DATABASE_URL)
-test_engine = create_engine(TEST_DATABASE_URL)
+# 连接池配置（批量上传时避免请求排队等待连接）
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))  # 常驻连接数
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))  # 高峰期允许额外创建的连接数
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))  # 获取连接的最长等待时间（秒）
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # 连接最长存活时间（秒），避免使用被服务端断开的连接
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')  # 取出连接前先探活
+
+
+class PoolWaitStats:
+    """连接获取等待时间统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.timeouts = 0
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "count": self.count,
+                "avg_ms": round(self.total_seconds / self.count * 1000, 3) if self.count else 0.0,
+                "max_ms": round(self.max_seconds * 1000, 3),
+                "timeouts": self.timeouts,
+            }
+
+
+class MonitoredQueuePool(QueuePool):
+    """记录连接获取等待时间的 QueuePool"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def recreate(self):
+        # engine.dispose() 会重建连接池，保留统计数据
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - start)
+        return conn
+
+
+# 按连接池配置创建数据库引擎
+def create_pooled_engine(url: str):
+    return create_engine(
+        url,
+        poolclass=MonitoredQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+
+
+# 创建数据库引擎（create_engine 不会立即建立连接）
+engine = create_pooled_engine(DATABASE_URL)
 
 # 创建Session类
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
 
 Base = declarative_base()
 
+# 测试数据库引擎在首次使用时才创建
+_test_engine = None
+_test_session_local = None
+_test_engine_lock = threading.Lock()
+
+
+def get_test_engine():
+    global _test_engine, _test_session_local
+    if _test_engine is None:
+        with _test_engine_lock:
+            if _test_engine is None:
+                new_engine = create_pooled_engine(TEST_DATABASE_URL)
+                _test_session_local = sessionmaker(autocommit=False, autoflush=False, bind=new_engine)
+                _test_engine = new_engine
+    return _test_engine
+
+
+def __getattr__(name):
+    # 兼容 `from core.core_db.database import test_engine, TestSessionLocal` 的用法，访问时才创建
+    if name == "test_engine":
+        return get_test_engine()
+    if name == "TestSessionLocal":
+        get_test_engine()
+        return _test_session_local
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# 获取连接池监控指标
+def get_pool_metrics(bind=None) -> dict:
+    """
+    返回连接池当前状态与连接获取等待时间统计。
+    :param bind: 要查看的引擎，默认为主数据库引擎
+    """
+    pool = (bind if bind is not None else engine).pool
+    metrics = {"status": pool.status()}
+    if isinstance(pool, QueuePool):
+        metrics.update({
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+        })
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        metrics["wait"] = wait_stats.snapshot()
+    return metrics
+
+
 # 获取数据库会话的函数
 def get_db():
     db = SessionLocal()
@@ -36,8 +160,9 @@ def get_db():
         db.close()
 
 def get_test_db():
-    db = TestSessionLocal()
+    get_test_engine()
+    db = _test_session_local()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
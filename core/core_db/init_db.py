@@ -1,23 +1,54 @@
 # init_database.py
+from sqlalchemy import inspect, text
+
 from core.core_db.database import engine, SessionLocal
 from core.core_db.models import Base, User, Assignment, Task, Score, ImageProcess
-import bcrypt
+from core.core_db.password_hasher import hash_password
 
 
 def init_database():
     """初始化数据库表结构"""
     print("创建数据库表...")
     Base.metadata.create_all(bind=engine)
+    create_missing_columns()
+    create_missing_indexes()
     print("数据库表创建完成!")
 
 
+def create_missing_columns(bind=None):
+    """为已存在的表补建模型中新增的列（如 tasks.priority / tasks.submitted_by），create_all 不会修改已有的表"""
+    bind = bind if bind is not None else engine
+    with bind.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=conn.dialect)}"
+                if column.default is not None and column.default.is_scalar:
+                    ddl += f" DEFAULT '{column.default.arg}'"
+                conn.execute(text(ddl))
+
+
+def create_missing_indexes(bind=None):
+    """为已存在的表补建模型中新增的索引（create_all 不会给已有的表加索引）"""
+    bind = bind if bind is not None else engine
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+
 def create_sample_data():
     """创建示例数据"""
     db = SessionLocal()
 
     try:
         # 创建示例用户
-        hashed_password = bcrypt.hashpw("password123".encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_password = hash_password("password123")
 
         users = [
             User(
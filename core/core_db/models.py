@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Numeric, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Numeric, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from core.core_db.database import Base
@@ -22,6 +22,16 @@ class User(Base):
 
 class Assignment(Base):
     __tablename__ = "assignments"
+    __table_args__ = (
+        # 用户作业列表：按 id（即上传先后）倒序的游标分页
+        Index("ix_assignments_user_id_id", "user_id", "id"),
+        # 按上传时间范围统计
+        Index("ix_assignments_uploaded_at", "uploaded_at"),
+        # 按状态筛选作业
+        Index("ix_assignments_status_id", "status", "id"),
+        # 批量导入的幂等键：同一文件重复导入时由数据库拒绝
+        Index("ux_assignments_import_key", "import_key", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
@@ -32,6 +42,7 @@ class Assignment(Base):
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
     processed_at = Column(DateTime(timezone=True))
     page_count = Column(Integer, default=1)
+    import_key = Column(String(64))  # 批量导入时为 sha256(导入根目录 + 学号/testN/文件名)，其余作业为空
 
     # 关系
     user = relationship("User", back_populates="assignments")
@@ -42,6 +53,13 @@ class Assignment(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # 查询某份作业的某个阶段任务
+        Index("ix_tasks_assignment_type", "assignment_id", "task_type"),
+        # 任务队列面板：如“全部待处理的 OCR 任务”
+        Index("ix_tasks_type_status_id", "task_type", "status", "id"),
+        Index("ix_tasks_status_id", "status", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     assignment_id = Column(Integer, ForeignKey("assignments.id", ondelete="CASCADE"))
@@ -52,6 +70,8 @@ class Task(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     processing_time = Column(Integer)  # 毫秒
+    priority = Column(String(20), default='interactive')  # interactive：单份作业的即时请求；bulk：批量导入/重批
+    submitted_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))  # 提交该任务的用户
 
     # 关系
     assignment = relationship("Assignment", back_populates="tasks")
@@ -0,0 +1,88 @@
+import asyncio
+import multiprocessing
+import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import List, Optional
+
+import bcrypt
+
+# 密码哈希服务：bcrypt 是 CPU 密集型操作（默认成本下每个密码数百毫秒），
+# 放到有界的进程池中执行，既不阻塞请求线程/事件循环，也不会因并发注册把所有 CPU 占满。
+
+# bcrypt 成本因子（4~31，每加 1 耗时翻倍）
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+# 哈希进程池大小
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# 不可用密码哈希的前缀：不是合法的 bcrypt 哈希，任何密码都校验失败
+UNUSABLE_PASSWORD_PREFIX = "!"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# 在当前进程内计算哈希（也是进程池中执行的函数）
+def hash_password_sync(password: str, rounds: Optional[int] = None) -> str:
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    if not has_usable_password(password_hash):
+        return False
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+# 生成不可用的密码哈希：用于尚未设置密码的账号（如批量导入的学生），需先设置密码才能登录
+def unusable_password_hash() -> str:
+    return UNUSABLE_PASSWORD_PREFIX + secrets.token_hex(16)
+
+
+def has_usable_password(password_hash: Optional[str]) -> bool:
+    return bool(password_hash) and not password_hash.startswith(UNUSABLE_PASSWORD_PREFIX)
+
+
+# 获取（必要时启动）哈希进程池
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # 使用 spawn 启动，避免 fork 继承 Web 服务进程中的线程与连接状态
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def hash_password(password: str, rounds: Optional[int] = None) -> str:
+    """在进程池中计算单个密码的哈希（同步等待结果）"""
+    return _get_executor().submit(hash_password_sync, password, rounds or BCRYPT_ROUNDS).result()
+
+
+def hash_passwords(passwords: List[str], rounds: Optional[int] = None) -> List[str]:
+    """在进程池中并行计算多个密码的哈希，返回顺序与输入一致"""
+    if not passwords:
+        return []
+    return list(_get_executor().map(hash_password_sync, passwords, repeat(rounds or BCRYPT_ROUNDS)))
+
+
+async def hash_password_async(password: str, rounds: Optional[int] = None) -> str:
+    """在进程池中计算单个密码的哈希，不阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), hash_password_sync, password, rounds or BCRYPT_ROUNDS)
+
+
+async def hash_passwords_async(passwords: List[str], rounds: Optional[int] = None) -> List[str]:
+    """在进程池中并行计算多个密码的哈希，不阻塞事件循环"""
+    return list(await asyncio.gather(*(hash_password_async(p, rounds) for p in passwords)))
+
+
+# 关闭哈希进程池
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -33,11 +33,13 @@ class AssignmentBase(BaseModel):
 
 
 class AssignmentCreate(AssignmentBase):
-    user_id: int
+    user_id: Optional[int] = None
+    import_key: Optional[str] = None  # 幂等键（批量导入使用）
 
 
 class AssignmentUpdate(BaseModel):
     status: Optional[str] = None
+    original_image_path: Optional[str] = None
     processed_image_path: Optional[str] = None
     extracted_code: Optional[str] = None
     processed_at: Optional[datetime] = None
@@ -45,7 +47,7 @@ class AssignmentUpdate(BaseModel):
 
 class AssignmentResponse(AssignmentBase):
     id: int
-    user_id: int
+    user_id: Optional[int]
     status: str
     uploaded_at: datetime
     processed_at: Optional[datetime]
@@ -58,6 +60,8 @@ class AssignmentResponse(AssignmentBase):
 class TaskBase(BaseModel):
     task_type: str
     assignment_id: int
+    priority: str = "interactive"
+    submitted_by: Optional[int] = None
 
 
 class TaskCreate(TaskBase):
@@ -176,4 +180,26 @@ class PaginatedUsers(PaginatedResponse):
 
 
 class PaginatedAssignments(PaginatedResponse):
-    items: List[AssignmentResponse]
\ No newline at end of file
+    items: List[AssignmentResponse]
+
+
+class PaginatedAssignmentsWithDetails(PaginatedResponse):
+    items: List[AssignmentWithDetails]
+
+
+# 游标分页响应：next_cursor 为空表示没有下一页
+class CursorPaginatedResponse(BaseModel):
+    items: List[Any]
+    next_cursor: Optional[str] = None
+
+
+class CursorPaginatedUsers(CursorPaginatedResponse):
+    items: List[UserResponse]
+
+
+class CursorPaginatedAssignments(CursorPaginatedResponse):
+    items: List[AssignmentResponse]
+
+
+class CursorPaginatedTasks(CursorPaginatedResponse):
+    items: List[TaskResponse]
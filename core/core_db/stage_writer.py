@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+
+from sqlalchemy import bindparam, func, insert, update
+from sqlalchemy.exc import DataError, IntegrityError
+
+from common.monitor import stage_timer
+from core.core_db.models import ImageProcess, Task
+
+logger = logging.getLogger(__name__)
+
+# 把 stage_timer 收集的阶段计时异步批量写库：
+#   - 图片相关阶段（加载、预处理、识别、版面提取）各写一条 ImageProcess 记录（含耗时、大小与置信度）
+#   - 各阶段耗时按 (作业, 任务类型) 累加到 Task.processing_time（毫秒）
+# 每次刷新通常只开一个事务，插入与更新都用 executemany，不在请求路径上访问数据库。
+
+STAGE_FLUSH_INTERVAL = float(os.getenv('STAGE_FLUSH_INTERVAL', '2'))  # 刷新间隔（秒）
+STAGE_FLUSH_MAX_ATTEMPTS = int(os.getenv('STAGE_FLUSH_MAX_ATTEMPTS', '5'))  # 单条记录最多写库失败几次，之后放弃
+IMAGE_PROCESS_STAGES = ("load", "preprocess", "predict", "extract")
+
+_tasks = Task.__table__
+
+
+# 单条记录违反约束或数据不合法（如所属作业已被删除），重试也不会成功
+DATA_ERRORS = (IntegrityError, DataError)
+
+
+# 在一个事务中写入一批记录：ImageProcess 批量插入，Task.processing_time 批量累加
+async def _write(session_factory, records):
+    image_rows = [
+        {"assignment_id": r.assignment_id, "process_step": r.stage, "process_result": r.to_dict(),
+         "confidence_score": r.confidence}
+        for r in records if r.stage in IMAGE_PROCESS_STAGES
+    ]
+    task_ms = defaultdict(float)
+    for r in records:
+        task_type = stage_timer.STAGE_TASK_TYPES.get(r.stage)
+        if task_type is not None:
+            task_ms[(r.assignment_id, task_type)] += r.wall_ms
+
+    async with session_factory() as db:
+        if image_rows:
+            await db.execute(insert(ImageProcess), image_rows)
+        if task_ms:
+            await db.execute(
+                update(_tasks)
+                .where(_tasks.c.assignment_id == bindparam("a_id"), _tasks.c.task_type == bindparam("t_type"))
+                .values(processing_time=func.coalesce(_tasks.c.processing_time, 0) + bindparam("ms")),
+                [{"a_id": a_id, "t_type": t_type, "ms": int(round(ms))} for (a_id, t_type), ms in task_ms.items()]
+            )
+        await db.commit()
+
+
+async def flush(session_factory=None) -> int:
+    """
+    把待写库的阶段记录写入数据库，返回写入的记录数。
+
+    正常情况下整批一个事务；某批违反约束或数据不合法（DATA_ERRORS）时对半拆分重试，
+    最终只放弃出问题的单条记录，其余照常写入。连接断开等其他错误时，未写入的记录放回队列下次重试，
+    同一条记录失败 STAGE_FLUSH_MAX_ATTEMPTS 次后放弃，不会让一条坏记录永远堵住后面的记录。
+    """
+    records = stage_timer.drain_pending()
+    if not records:
+        return 0
+    if session_factory is None:
+        from core.core_db.async_database import AsyncSessionLocal
+        session_factory = AsyncSessionLocal
+
+    written = 0
+    batches = [records]  # 待写入的批次（栈顶先写）
+    while batches:
+        batch = batches.pop()
+        try:
+            await _write(session_factory, batch)
+            written += len(batch)
+        except DATA_ERRORS as e:
+            if len(batch) == 1:
+                r = batch[0]
+                stage_timer.reject()
+                logger.warning(f"放弃无法写库的阶段记录（作业 {r.assignment_id}，阶段 {r.stage}）: {e}")
+                continue
+            mid = len(batch) // 2
+            batches.append(batch[mid:])
+            batches.append(batch[:mid])
+        except BaseException:
+            # 本批与尚未写入的批次放回队列等下次刷新；已提交的批次不重复写
+            remaining = batch + [r for b in reversed(batches) for r in b]
+            gave_up = stage_timer.requeue(remaining, STAGE_FLUSH_MAX_ATTEMPTS)
+            if gave_up:
+                logger.error(f"{gave_up} 条阶段记录写库失败 {STAGE_FLUSH_MAX_ATTEMPTS} 次，已放弃")
+            raise
+    return written
+
+
+class StageRecordWriter:
+    """后台定时刷新阶段记录（随应用启动/关闭）"""
+
+    def __init__(self, session_factory=None, interval: float = STAGE_FLUSH_INTERVAL):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await flush(self.session_factory)
+            except Exception as e:
+                logger.error(f"阶段计时写库失败: {e}")
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # 关闭前写入剩余记录
+        try:
+            await flush(self.session_factory)
+        except Exception as e:
+            logger.error(f"阶段计时写库失败: {e}")
+
+
+writer = StageRecordWriter()
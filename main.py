@@ -5,7 +5,7 @@ import uvicorn
 from core.core_db import init_db
 
 
-# 启动服务（可通过uvicorn运行）
+# 启动服务（可通过uvicorn运行；单进程，用于开发调试，生产环境使用 serve.py 多进程启动）
 if __name__ == "__main__":
     # 初始化数据库
     init_db.main()
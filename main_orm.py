@@ -1,41 +1,17 @@
 # main_orm.py
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import FastAPI
 
-from core.core_db import models, schemas, crud
-from core.core_db.database import SessionLocal, engine, get_db
+from api.orm_api.orm_api import router as orm_router
+from core.core_db import models
+from core.core_db.database import engine
 
 # 创建表
 models.Base.metadata.create_all(bind=engine)
 
+# 独立运行 ORM 接口（生产环境由 serve.py 与主应用合并启动）
 app = FastAPI(title="C++作业批改系统API - ORM版本")
-
-# 用户接口
-@app.post("/users/", response_model=schemas.UserResponse)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_username(db, username=user.username)
-    if db_user:
-        raise HTTPException(status_code=400, detail="用户名已存在")
-    return crud.create_user(db=db, user=user)
-
-@app.get("/users/{user_id}", response_model=schemas.UserResponse)
-def read_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = crud.get_user(db, user_id=user_id)
-    if db_user is None:
-        raise HTTPException(status_code=404, detail="用户不存在")
-    return db_user
-
-@app.get("/users/", response_model=List[schemas.UserResponse])
-def read_users(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    users = crud.get_users(db, skip=skip, limit=limit)
-    return users
-
-# 作业接口
-@app.post("/assignments/", response_model=schemas.AssignmentResponse)
-def create_assignment(assignment: schemas.AssignmentCreate, db: Session = Depends(get_db)):
-    return crud.create_assignment(db=db, assignment=assignment)
+app.include_router(orm_router)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,20 +1,120 @@
+import importlib
+import logging
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 
-from api.AI_api.ai_api import router as ai_router
-from api.ocr_api.ocr import router as ocr_router
-from api.Compile_run.run_api import router as compile_run_router
-from api.upload_img.upload_api import router as upload_router
+from fastapi.middleware.cors import CORSMiddleware
 
+from common.monitor import progress, progress_relay
+from common.monitor.collectors import register_default_collectors
+from common.monitor.metrics import MetricsMiddleware
+from core.core_db import password_hasher
+from core.core_db.stage_writer import writer as stage_writer
+
+
+logger = logging.getLogger(__name__)
+
+# 各路由模块（按需导入，只服务轻量接口的进程不会导入识别相关模块）
+ROUTE_MODULES = {
+    "ocr": "api.ocr_api.ocr",
+    "compile_run": "api.Compile_run.run_api",
+    "ai": "api.AI_api.ai_api",
+    "upload": "api.upload_img.upload_api",
+    "monitor": "api.monitor_api.monitor",
+    "progress": "api.progress_api.progress_api",
+    "import": "api.import_api.import_api",
+    "orm": "api.orm_api.orm_api",
+}
+
+# 进程角色 -> 挂载的路由：api 为轻量接口，ocr 为识别接口（占用模型内存与 CPU），all 为全部。
+# 进度事件经中继在进程间广播（见 common.monitor.progress_relay），两个角色都可以提供 /events
+ROLE_ROUTES = {
+    "all": ("ocr", "compile_run", "ai", "upload", "monitor", "progress", "import", "orm"),
+    "api": ("compile_run", "ai", "upload", "monitor", "progress", "import", "orm"),
+    "ocr": ("ocr", "monitor", "progress"),
+}
+
+# 启动时预热的识别引擎（逗号分隔：paddle、easyocr、ensemble），默认不预热，引擎在首个请求时才加载。
+# 只在 ocr / all 角色的进程中生效，api 角色的进程不会导入 paddleocr / easyocr / cv2。
+OCR_WARMUP_ENGINES = [e.strip() for e in os.getenv('OCR_WARMUP_ENGINES', '').split(',') if e.strip()]
+
+
+# 导入并加载指定的识别引擎
+def warm_up_engines(engines):
+    for name in engines:
+        start = time.perf_counter()
+        if name == "paddle":
+            from src.PaddleOCR import PaddleOCR
+            PaddleOCR.warm_up()
+        elif name == "easyocr":
+            from src.EasyOCR import EasyOCR
+            EasyOCR.warm_up()
+        elif name == "ensemble":
+            from src.Ensemble import ensemble_ocr
+            ensemble_ocr.warm_up()
+        else:
+            raise ValueError(f"不支持的识别引擎: {name}")
+        logger.info(f"识别引擎 {name} 预热完成，用时 {time.perf_counter() - start:.1f}s")
+
+
+# 关闭融合识别为每个引擎启动的工作进程（未导入过融合识别模块时什么也不做，避免关闭时才导入）
+def shutdown_engines():
+    ensemble = sys.modules.get("src.Ensemble.ensemble_ocr")
+    if ensemble is not None:
+        ensemble.shutdown()
 
-from fastapi.middleware.cors import CORSMiddleware
 
+# 提供识别接口、需要预热识别引擎的进程角色
+OCR_ROLES = ("ocr", "all")
+
+
+# 连接进度事件中继（配置了 PROGRESS_RELAY_ADDRESS 时）；连不上时记录错误，事件退回只在本进程内传递
+def connect_progress_relay():
+    if not progress_relay.PROGRESS_RELAY_ADDRESS:
+        return
+    try:
+        progress.bus.connect_relay()
+    except Exception as e:
+        logger.error(f"连接进度事件中继 {progress_relay.PROGRESS_RELAY_ADDRESS} 失败，进度事件只在本进程内传递: {e}")
+
+
+# 应用生命周期：预热识别引擎（只在提供识别接口的角色中，api 进程不加载模型）；
+# 连接进度事件中继（在工作进程中连接，fork 出的每个进程各有一条连接）；
+# 启动/停止阶段计时记录的后台批量写库任务（停止前会写完剩余记录）；
+# 停止时关闭识别与密码哈希用的子进程，热重载与退出时不留下孤儿进程
+def make_lifespan(role="all"):
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        if OCR_WARMUP_ENGINES and role in OCR_ROLES:
+            await run_in_threadpool(warm_up_engines, OCR_WARMUP_ENGINES)
+        await run_in_threadpool(connect_progress_relay)
+        await stage_writer.start()
+        try:
+            yield
+        finally:
+            progress.bus.close_relay()
+            await stage_writer.stop()
+            password_hasher.shutdown()
+            shutdown_engines()
+
+    return lifespan
+
+
+def router(role="all"):
+    if role not in ROLE_ROUTES:
+        raise ValueError(f"不支持的进程角色: {role}")
 
-def router():
     # 创建FastAPI应用实例
     app = FastAPI(
         title="OCR Service API",
         description="API for OCR recognition and related operations",
-        version="1.0.0"
+        version="1.0.0",
+        lifespan=make_lifespan(role),
     )
 
     # 配置CORS，允许前端跨域访问（根据需要调整）
@@ -26,14 +126,13 @@ def router():
         allow_headers=["*"],
     )
 
-    # 包含路由模块
-    app.include_router(ocr_router)
-
-    app.include_router(compile_run_router)
-
-    app.include_router(ai_router)
-    app.include_router(upload_router)
+    # 请求数、延迟与并发数统计（/metrics 暴露），以及抓取时现算的线程池/进程池/连接池等状态
+    app.add_middleware(MetricsMiddleware)
+    register_default_collectors()
 
+    # 包含路由模块
+    for name in ROLE_ROUTES[role]:
+        app.include_router(importlib.import_module(ROUTE_MODULES[name]).router)
 
     return app
 
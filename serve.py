@@ -0,0 +1,301 @@
+import argparse
+import logging
+import os
+import secrets
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import uvicorn
+
+# 生产环境启动器：
+#   - 合并主应用与 ORM 接口（router.enter.router），按 CPU 数启动多个工作进程
+#   - 两类工作进程池：api（上传、编译、报告、ORM 等轻量接口）与 ocr（识别接口，占用模型内存与 CPU），
+#     分别监听 SERVER_PORT 与 OCR_PORT，由前置反向代理把 /api/assignments/*/ocr 转发到 ocr 池；
+#     也可以用 --role all 在一个端口上提供全部接口
+#   - 进度事件：主进程拉起一个本机的进度事件中继（common.monitor.progress_relay，随机认证密钥、私有 Unix 套接字），
+#     各工作进程启动时连接它，任一进程发布的事件（OCR、编译诊断、评分）都会广播到全部进程，
+#     /api/assignments/{id}/events 可以由 api 池或 ocr 池的任意工作进程提供，反向代理无需粘滞路由。
+#     已设置 PROGRESS_RELAY_ADDRESS 时不再拉起，直接使用该中继（api 池与 ocr 池分别启动或分布在多台机器上时，
+#     单独运行 python -m common.monitor.progress_relay，并为所有进程配置相同的地址与 PROGRESS_RELAY_AUTHKEY）
+#   - 主进程先创建应用、（可选）预热模型并监听端口，再 fork 出工作进程：模型权重以写时复制的方式共享，
+#     工作进程退出后自动拉起
+#   - 指标：每个工作进程的指标注册表互相独立，而共享端口上的 /metrics 由内核随机分给某一个工作进程，
+#     抓到的只是那个进程的数据。因此每个工作进程另在 METRICS_PORT 起的连续端口上单独暴露 /metrics
+#     （先 api 池后 ocr 池，工作进程重启后沿用原端口），Prometheus 把这些端口逐个配置为抓取目标，
+#     instance 标签区分工作进程，查询时用 sum() 等汇总，例如 api 池 4 个、ocr 池 2 个工作进程：
+#       scrape_configs:
+#         - job_name: ocr_service
+#           static_configs:
+#             - targets: ["host:9300", "host:9301", "host:9302", "host:9303"]  # api 池
+#               labels: {pool: api}
+#             - targets: ["host:9304", "host:9305"]                          # ocr 池
+#               labels: {pool: ocr}
+#     METRICS_PORT=0 时不单独暴露
+#   - 不支持 fork 的平台（Windows）退化为 uvicorn 自带的多进程模式（每个工作进程各自加载，不单独暴露指标端口）
+#
+# 用法（在项目根目录执行）:
+#   python serve.py                                  # api 池 + ocr 池
+#   python serve.py --role all --workers 4           # 单端口、全部接口
+#   python serve.py --role ocr --ocr-workers 2 --preload easyocr
+#   python serve.py --metrics-port 9300             # 工作进程指标端口从 9300 起
+#
+# PaddleOCR 不在 fork 前预加载：创建推理引擎时会初始化推理库的线程池，fork 后子进程中这些线程不存在，
+# 是否还能正常推理未经验证。需要预热 PaddleOCR 时设置 OCR_WARMUP_ENGINES=paddle，由每个 ocr 工作进程启动后各自加载
+# （模型不共享内存，但不依赖 fork 安全性）。
+
+SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.getenv('SERVER_PORT', '8000'))
+OCR_PORT = int(os.getenv('OCR_PORT', str(SERVER_PORT + 1)))
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', '0'))  # 0 表示按 CPU 数自动计算
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', '0'))
+OCR_THREADS_PER_WORKER = int(os.getenv('OCR_THREADS_PER_WORKER', '4'))  # 每个识别进程的推理库大致占用的核数
+# fork 前在主进程中加载的识别引擎（逗号分隔，目前只支持 easyocr）；
+# ensemble 使用子进程、paddle 的推理线程池在 fork 后是否可用未经验证，都不能在 fork 前加载
+PRELOAD_ENGINES = [e.strip() for e in os.getenv('PRELOAD_ENGINES', '').split(',') if e.strip()]
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9300'))  # 第一个工作进程的指标端口，其余依次加一；0 表示不单独暴露
+
+FORK_SAFE_ENGINES = ("easyocr",)
+
+logger = logging.getLogger("serve")
+
+
+# 按 CPU 数计算默认工作进程数
+def default_workers(role, cpu_count=None):
+    cpus = cpu_count or os.cpu_count() or 1
+    if role == "ocr":
+        # 推理库本身是多线程的，进程数过多只会互相争抢核心并成倍占用内存
+        return max(1, cpus // OCR_THREADS_PER_WORKER)
+    # 轻量接口以 I/O 为主，每核一个事件循环进程
+    return cpus
+
+
+def bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Pool:
+    """一组共享监听端口、运行同一个应用的工作进程"""
+
+    def __init__(self, role, host, port, workers):
+        self.role = role
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.app = None
+        self.sock = None
+        self.pids = set()
+        self.slots = {}  # 工作进程 pid -> 序号，重启的进程沿用原序号（与指标端口）
+        self.metrics_port = None  # 本池第一个工作进程的指标端口
+
+    def prepare(self, preload_engines=()):
+        from router import enter
+        self.app = enter.router(self.role)
+        if self.role in enter.OCR_ROLES and preload_engines:
+            unsafe = [e for e in preload_engines if e not in FORK_SAFE_ENGINES]
+            if unsafe:
+                raise ValueError(f"以下引擎不能在 fork 前加载: {', '.join(unsafe)}"
+                                 f"（改用 OCR_WARMUP_ENGINES 在各工作进程中预热）")
+            enter.warm_up_engines(preload_engines)
+        self.sock = bind_socket(self.host, self.port)
+
+    def spawn(self, slot=None):
+        if slot is None:
+            slot = len(self.slots)
+        metrics_port = self.metrics_port + slot if self.metrics_port else None
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(self.app, self.sock, self.host, metrics_port)
+            os._exit(0)
+        self.pids.add(pid)
+        self.slots[pid] = slot
+        return pid
+
+    # 工作进程退出后在原序号上重新拉起
+    def respawn(self, pid):
+        self.pids.discard(pid)
+        return self.spawn(self.slots.pop(pid, None))
+
+
+# 为各池依次分配指标端口：每个工作进程一个，先 api 池后 ocr 池
+def assign_metrics_ports(pools, first_port):
+    if not first_port:
+        return
+    port = first_port
+    for pool in pools:
+        pool.metrics_port = port
+        port += pool.workers
+
+
+# 工作进程：丢弃从主进程继承的数据库连接，在独立端口上暴露本进程的指标，在继承的监听端口上运行 uvicorn
+def _run_worker(app, sock, host, metrics_port=None):
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    from core.core_db import database
+    database.engine.dispose(close=False)
+    if metrics_port:
+        from common.monitor.metrics import start_metrics_server
+        try:
+            start_metrics_server(host, metrics_port)
+        except OSError as e:
+            # 端口被占用时照常提供接口，只是抓不到这个进程的指标
+            logger.error(f"工作进程 {os.getpid()} 的指标端口 {metrics_port} 监听失败: {e}")
+    config = uvicorn.Config(app, log_level="info", access_log=False)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class ProgressRelayProcess:
+    """主进程拉起的本机进度事件中继子进程：地址与随机密钥通过环境变量传给中继和之后 fork 的工作进程"""
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp(prefix="progress_relay-")  # 0700，仅当前用户可访问
+        self.address = os.path.join(self.directory, "relay.sock")
+        os.environ["PROGRESS_RELAY_ADDRESS"] = self.address
+        os.environ["PROGRESS_RELAY_AUTHKEY"] = secrets.token_hex(32)
+        self.process = None
+
+    def start(self):
+        self.process = subprocess.Popen([sys.executable, "-m", "common.monitor.progress_relay"],
+                                        cwd=os.path.dirname(os.path.abspath(__file__)))
+        logger.info(f"进度事件中继: 进程 {self.process.pid}，监听 {self.address}")
+        return self.process.pid
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def serve_prefork(pools, preload_engines=(), metrics_port=METRICS_PORT):
+    # 必须在创建应用（导入 progress_relay 读取环境变量）之前设置中继地址
+    relay = None if os.getenv("PROGRESS_RELAY_ADDRESS") else ProgressRelayProcess()
+    try:
+        _supervise(pools, preload_engines, metrics_port, relay)
+    finally:
+        # 启动失败（如创建应用、监听端口出错）时也不留下中继进程与套接字目录
+        if relay is not None:
+            relay.stop()
+
+
+def _supervise(pools, preload_engines, metrics_port, relay):
+    relay_pid = relay.start() if relay is not None else None
+
+    assign_metrics_ports(pools, metrics_port)
+    for pool in pools:
+        pool.prepare(preload_engines)
+        logger.info(f"{pool.role} 池: {pool.workers} 个工作进程，监听 {pool.host}:{pool.port}")
+        if pool.metrics_port:
+            logger.info(f"{pool.role} 池指标端口: {pool.metrics_port}-{pool.metrics_port + pool.workers - 1}")
+
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    for pool in pools:
+        for _ in range(pool.workers):
+            pool.spawn()
+
+    # 监督工作进程：意外退出的进程重新拉起；收到停止信号后通知全部工作进程退出
+    while not stopping:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.5)
+            continue
+        if pid == relay_pid:
+            # 中继退出：重新拉起，工作进程会自动重连
+            logger.warning(f"进度事件中继 {pid} 退出（状态 {status}），重新启动")
+            relay_pid = relay.start()
+            continue
+        for pool in pools:
+            if pid in pool.pids:
+                logger.warning(f"{pool.role} 工作进程 {pid} 退出（状态 {status}），重新启动")
+                pool.respawn(pid)
+
+    for pool in pools:
+        for pid in pool.pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    for pool in pools:
+        for pid in list(pool.pids):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        pool.sock.close()
+
+
+# 不支持 fork 时由 uvicorn 启动多进程，每个工作进程通过工厂函数各自创建应用
+def serve_spawn(role, host, port, workers):
+    os.environ["SERVE_ROLE"] = role
+    uvicorn.run("serve:create_app", factory=True, host=host, port=port, workers=workers)
+
+
+def create_app():
+    from router import enter
+    return enter.router(os.getenv("SERVE_ROLE", "all"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多进程生产服务启动器")
+    parser.add_argument("--role", choices=("split", "all", "api", "ocr"), default="split",
+                        help="split: api 与 ocr 两个进程池分别监听两个端口；其余为单个进程池")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="api（或 all）进程池端口")
+    parser.add_argument("--ocr-port", type=int, default=OCR_PORT, help="ocr 进程池端口")
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS, help="api / all 进程池的工作进程数，0 为自动")
+    parser.add_argument("--ocr-workers", type=int, default=OCR_WORKERS, help="ocr 进程池的工作进程数，0 为自动")
+    parser.add_argument("--preload", default=",".join(PRELOAD_ENGINES),
+                        help="fork 前加载的识别引擎（easyocr）；paddle 请改用 OCR_WARMUP_ENGINES")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="第一个工作进程的指标端口，其余依次加一；0 表示不单独暴露")
+    parser.add_argument("--init-db", action="store_true", help="启动前初始化数据库")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    if args.init_db:
+        from core.core_db import init_db
+        init_db.main()
+
+    preload = [e.strip() for e in args.preload.split(",") if e.strip()]
+    if args.role == "split":
+        pools = [Pool("api", args.host, args.port, args.workers or default_workers("api")),
+                 Pool("ocr", args.host, args.ocr_port, args.ocr_workers or default_workers("ocr"))]
+    elif args.role == "ocr":
+        pools = [Pool("ocr", args.host, args.ocr_port, args.ocr_workers or default_workers("ocr"))]
+    else:
+        pools = [Pool(args.role, args.host, args.port, args.workers or default_workers(args.role))]
+
+    if hasattr(os, "fork"):
+        serve_prefork(pools, preload, args.metrics_port)
+    else:
+        if len(pools) > 1:
+            sys.exit("当前平台不支持 fork，请分别以 --role api 与 --role ocr 启动两个进程池")
+        pool = pools[0]
+        serve_spawn(pool.role, pool.host, pool.port, pool.workers)
+
+
+if __name__ == "__main__":
+    main()
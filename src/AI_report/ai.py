@@ -4,6 +4,8 @@ import logging
 from typing import Dict, Any, Optional
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from common.monitor.stage_timer import timed_stage
+
 # 设置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -66,6 +68,9 @@ class KimiCppScorer:
         """
         return prompt
 
+    # 计时包含重试等待的总耗时
+    @timed_stage("llm_scoring", describe=lambda args, kwargs, result, record: record.sizes.update(
+        in_chars=len(args[1])))
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     def score_cpp_code(self, code: str, requirements: str) -> Dict[str, Any]:
         """
@@ -2,6 +2,8 @@ import re
 from datetime import datetime
 import json
 
+from common.monitor.stage_timer import timed_stage
+
 
 
 class MockCppCompiler:
@@ -16,6 +18,8 @@ class MockCppCompiler:
             "iostream: No such file or directory"
         ]
 
+    @timed_stage("compile", describe=lambda args, kwargs, result, record: record.sizes.update(
+        in_chars=len(args[1])))
     def compile_and_run(self, source_code):
         """
         模拟编译并运行C++源代码
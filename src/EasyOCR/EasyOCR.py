@@ -1,20 +1,26 @@
+import contextlib
 import os
+import threading
 
-import cv2
 import numpy as np
-import matplotlib
 
-# 使用 PyQt5 后端来支持交互式绘图
-matplotlib.use('Qt5Agg')
-import matplotlib.pyplot as plt
-import easyocr
+from common.monitor.metrics import ocr_engine_loads_total, ocr_engine_cache_hits_total
+from common.monitor.stage_timer import timed_stage, describe_image
 
-plt.rcParams['font.sans-serif'] = ['SimHei']  # 设置 Matplotlib 字体为黑体，支持中文显示
-plt.rcParams['axes.unicode_minus'] = False  # 解决坐标轴负号显示为方块的问题
+# easyocr（及其依赖的 torch）、cv2 与 matplotlib 导入开销大，且 matplotlib 的交互式后端在无显示环境下不可用：
+# easyocr 在首次创建 Reader 时才导入，cv2 在首次加载/预处理图片时导入，matplotlib 只在显式调用 show_images 时导入。
+
+# 按 (语言集合, 是否使用 GPU) 缓存的 Reader，进程内复用，避免每次识别重新加载模型
+_readers = {}
+# Reader 的创建与推理都加锁（同一个模型实例不保证线程安全）
+_readers_lock = threading.Lock()
+_reader_locks = {}
 
 
 # 加载图片
+@timed_stage("load", describe=describe_image)
 def load_img(img_path):
+    import cv2
     img = cv2.imread(img_path)
     if img is None:
         raise ValueError("Image not loaded correctly")
@@ -22,7 +28,9 @@ def load_img(img_path):
 
 
 # 图片预处理
+@timed_stage("preprocess", describe=describe_image)
 def preprocess_img_pro(image):
+    import cv2
     gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)  # 转化为灰度图
     blurred = cv2.GaussianBlur(gray_image, (7, 7), 0)  # 对灰度图进行高斯模糊，去除图片中的噪声
 
@@ -43,25 +51,93 @@ def preprocess_img_pro(image):
     return opening
 
 
+# 判断是否使用 GPU：环境变量 EASYOCR_GPU=1/0 可强制指定，否则在检测到 CUDA 时才使用
+def _use_gpu():
+    flag = os.getenv('EASYOCR_GPU')
+    if flag is not None:
+        return flag.strip().lower() in ('1', 'true', 'yes')
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+# 获取（必要时创建）指定语言集合的 Reader
+def get_reader(langs=('en',), gpu=None):
+    if gpu is None:
+        gpu = _use_gpu()
+    key = (tuple(langs), bool(gpu))
+    reader = _readers.get(key)
+    if reader is None:
+        with _readers_lock:
+            reader = _readers.get(key)
+            if reader is None:
+                import easyocr
+                reader = easyocr.Reader(list(langs), gpu=bool(gpu),
+                                        # model_storage_directory='../../easyocr/model',
+                                        )  # 初始化 ocr 引擎, model_storage_directory：自定义模型存储路径
+                _reader_locks[id(reader)] = threading.Lock()
+                _readers[key] = reader
+                ocr_engine_loads_total.inc(engine="easyocr", model="+".join(key[0]))
+                return reader
+    ocr_engine_cache_hits_total.inc(engine="easyocr", model="+".join(key[0]))
+    return reader
+
+
+# 预热：导入 cv2 / easyocr 并创建 Reader（服务启动阶段调用）
+def warm_up(langs=('en',)):
+    import cv2  # noqa: F401
+    get_reader(langs)
+
+
 # 使用EasyOCR识别
-def ocr_recognition(image):
-    reader = easyocr.Reader(['en'], gpu=True,
-                            # model_storage_directory='../../easyocr/model',
-                            )  # 初始化 ocr 引擎， 设置语言为英文和中文, model_storage_directory：自定义模型存储路径
-    result = reader.readtext(image,  # image：支持文件路径、URL、字节数据或Opencv格式图像
-                             detail=1,  # detail: 是否返回位置信息（默认1返回全部信息）
-                             paragraph=False,  # paragraph:是否合并为段落(默认False）
-                             contrast_ths=0.5,  # contrast_ths：对比度阈值(调整识别灵敏度）
-                             adjust_contrast=1.2,  # adjust_contrast：自动调整输入图像的对比度，增强文字与背景的区分度
-                             )
+@timed_stage("predict", describe=lambda args, kwargs, result, record: record.sizes.update(
+    boxes=len(result)))
+def ocr_recognition(image, reader=None, langs=('en',)):
+    if reader is None:
+        reader = get_reader(langs)
+    # 调用方自带的 Reader 不在缓存中，由调用方负责并发控制
+    with _reader_locks.get(id(reader)) or contextlib.nullcontext():
+        result = reader.readtext(image,  # image：支持文件路径、URL、字节数据或Opencv格式图像
+                                 detail=1,  # detail: 是否返回位置信息（默认1返回全部信息）
+                                 paragraph=False,  # paragraph:是否合并为段落(默认False）
+                                 contrast_ths=0.5,  # contrast_ths：对比度阈值(调整识别灵敏度）
+                                 adjust_contrast=1.2,  # adjust_contrast：自动调整输入图像的对比度，增强文字与背景的区分度
+                                 )
     return result
 
 
+# ocr调用函数：加载、预处理并识别，返回与 PaddleOCR 相同结构的页结果列表
+def easy_ocr(image, langs=('en',)):
+    # 加载图片
+    original_image = load_img(image)
+    # 图片预处理
+    preprocessed_image = preprocess_img_pro(original_image)
+    # 使用EasyOCR识别
+    return [results_to_page(ocr_recognition(preprocessed_image, langs=langs))]
+
+
+# 把 readtext 结果 [(bbox, text, prob), ...] 转换为与 PaddleOCR 相同的 rec_texts / rec_scores / rec_polys 结构
+def results_to_page(result):
+    return {
+        "rec_texts": [text for _, text, _ in result],
+        "rec_scores": [float(prob) for _, _, prob in result],
+        "rec_polys": [[[float(x), float(y)] for x, y in bbox] for bbox, _, _ in result],
+    }
+
+
 # 显示和保存每个阶段的图像
 def show_images(original, opening):
     import cv2
+    import matplotlib
+    # 使用 PyQt5 后端来支持交互式绘图
+    matplotlib.use('Qt5Agg')
     import matplotlib.pyplot as plt
 
+    plt.rcParams['font.sans-serif'] = ['SimHei']  # 设置 Matplotlib 字体为黑体，支持中文显示
+    plt.rcParams['axes.unicode_minus'] = False  # 解决坐标轴负号显示为方块的问题
+
     fig, axes = plt.subplots(1, 2, figsize=(12, 6))
     axes[0].imshow(cv2.cvtColor(original, cv2.COLOR_BGR2RGB))
     axes[0].set_title('Original Image')
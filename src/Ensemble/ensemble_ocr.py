@@ -0,0 +1,160 @@
+import logging
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.PaddleOCR import line_layout
+
+logger = logging.getLogger(__name__)
+
+# 集成识别：PaddleOCR 与 EasyOCR 各自运行在独立的常驻工作进程中（进程内引擎只初始化一次），
+# 对同一张预处理后的图片并发识别，按行对齐后逐行择优。总耗时接近两者中较慢的一个，而不是两者之和。
+
+# 每个引擎一个单进程执行器
+_executors = {}
+_executors_lock = threading.Lock()
+
+# PaddleOCR 工作进程初始化：预热引擎
+def _paddle_worker_init():
+    from src.PaddleOCR import PaddleOCR
+    PaddleOCR.get_ocr_engine()
+
+
+# PaddleOCR 工作进程内识别，返回可跨进程传递的 rec_texts / rec_scores / rec_polys
+def _paddle_worker_run(image):
+    from src.PaddleOCR import PaddleOCR
+    return PaddleOCR.results_to_pages(PaddleOCR.ocr_recognition(image))
+
+
+# EasyOCR 工作进程初始化：预热 Reader
+def _easyocr_worker_init():
+    from src.EasyOCR import EasyOCR
+    EasyOCR.get_reader(('en',))
+
+
+# EasyOCR 工作进程内识别，返回与 PaddleOCR 相同结构的页结果
+def _easyocr_worker_run(image):
+    from src.EasyOCR import EasyOCR
+    return [EasyOCR.results_to_page(EasyOCR.ocr_recognition(image))]
+
+
+_WORKERS = {
+    "paddle": (_paddle_worker_init, _paddle_worker_run),
+    "easyocr": (_easyocr_worker_init, _easyocr_worker_run),
+}
+
+
+# 获取（必要时启动）某个引擎的工作进程
+def _get_executor(name):
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            # 使用 spawn 启动，避免 fork 继承推理库的线程状态
+            executor = ProcessPoolExecutor(max_workers=1,
+                                           mp_context=multiprocessing.get_context("spawn"),
+                                           initializer=_WORKERS[name][0])
+            _executors[name] = executor
+        return executor
+
+
+# 预先启动全部工作进程并加载模型
+def warm_up():
+    futures = [_get_executor(name).submit(int) for name in _WORKERS]
+    for f in futures:
+        f.result()
+
+
+# 关闭全部工作进程
+def shutdown():
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
+
+
+# 行内是否含有 C++ 关键字（用于判断该行更像代码）
+def _is_keyword_valid(text, keywords):
+    return any(tok in keywords for tok in re.findall(r'[A-Za-z_][A-Za-z0-9_]*', text))
+
+
+# 计算两组行之间的 y 方向重叠度矩阵（交集高度 / 较矮行的高度）
+def _y_overlap(a_lines, b_lines):
+    a = np.asarray([ln["box"] for ln in a_lines], dtype=np.float64)
+    b = np.asarray([ln["box"] for ln in b_lines], dtype=np.float64)
+    inter = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    h = np.minimum((a[:, 3] - a[:, 1])[:, None], (b[:, 3] - b[:, 1])[None, :])
+    return np.clip(inter, 0, None) / np.maximum(h, 1.0)
+
+
+# 对齐两个引擎的行输出，逐行选取置信度更高或符合关键字的结果
+def merge_lines(primary, secondary, keywords, min_overlap=0.5):
+    """
+    按 y 方向重叠把两个引擎的行一一对齐（互为最佳匹配），逐行择优:
+        - 只有一方含 C++ 关键字时取该方
+        - 否则取置信度更高的一方
+    primary 中未匹配的行全部保留；secondary 中未匹配的行只在含关键字时补入。
+    选中 secondary 的文本时沿用 primary 的缩进，保证整段缩进一致。
+    输入/返回: list[dict]，字段同 line_layout.group_lines
+    """
+    keywords = set(keywords)
+    if not primary or not secondary or any(ln["box"] is None for ln in primary + secondary):
+        return list(primary or secondary)
+
+    overlap = _y_overlap(primary, secondary)
+    best_b = overlap.argmax(axis=1)
+    best_a = overlap.argmax(axis=0)
+
+    merged = []
+    matched_b = set()
+    for i, a in enumerate(primary):
+        j = int(best_b[i])
+        if overlap[i, j] < min_overlap or best_a[j] != i:
+            merged.append(a)
+            continue
+        matched_b.add(j)
+        b = secondary[j]
+        a_valid = _is_keyword_valid(a["text"], keywords)
+        b_valid = _is_keyword_valid(b["text"], keywords)
+        if a_valid != b_valid:
+            take_b = b_valid
+        else:
+            take_b = b["score"] > a["score"]
+        if take_b:
+            indent = a["text"][:len(a["text"]) - len(a["text"].lstrip())]
+            merged.append({**a, "text": indent + b["text"].strip(), "score": b["score"]})
+        else:
+            merged.append(a)
+
+    for j, b in enumerate(secondary):
+        if j not in matched_b and _is_keyword_valid(b["text"], keywords):
+            merged.append(b)
+
+    # 按行中心 y 重新排序（sorted 稳定，primary 原有顺序在同高时保持不变）
+    return sorted(merged, key=lambda ln: (ln["box"][1] + ln["box"][3]) / 2.0)
+
+
+# 集成识别：预处理一次，两个引擎并发识别，再逐行择优
+def ensemble_recognition(image_path):
+    """
+    输入: 图片路径
+    返回: list[dict] 代码行（字段同 line_layout.group_lines）
+    任一引擎失败时退化为另一引擎的结果；两者都失败时抛出异常。
+    """
+    from src.PaddleOCR import PaddleOCR, ocr_v2
+
+    preprocessed = PaddleOCR.preprocess_img_pro(PaddleOCR.load_img(image_path))
+
+    futures = {name: _get_executor(name).submit(_WORKERS[name][1], preprocessed) for name in _WORKERS}
+    lines = {}
+    for name, future in futures.items():
+        try:
+            lines[name] = line_layout.extract_code_lines(future.result())
+        except Exception as e:
+            logger.error(f"{name} 识别失败: {e}")
+
+    if not lines:
+        raise RuntimeError("所有 OCR 引擎均识别失败")
+    return merge_lines(lines.get("paddle", []), lines.get("easyocr", []), ocr_v2.CPP_KEYWORDS)
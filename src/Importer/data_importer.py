@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core.core_db.crud import user_crud, assignment_crud
+from core.core_db.models import User, Assignment
+from core.core_db.schemas import UserBase, AssignmentCreate
+
+logger = logging.getLogger(__name__)
+
+# 批量导入 Data/<学号>/<testN>/*.jpg 目录结构的作业：
+#   1. 扫描目录，按学号批量创建缺失的学生账号（不设可用密码，需由管理员通过 set_password 设置后才能登录）
+#   2. 多线程流式复制图片到存储目录，边复制边计算 sha256，按内容寻址存储（相同图片只存一份）
+#   3. 每批作业及其全部阶段任务在一个事务中创建，作业带有幂等键 sha256(导入根目录 + 学号/testN/文件名)
+#   4. 重新执行时先按幂等键查询已导入的文件并跳过；幂等键与作业在同一事务中写入，并有唯一索引兜底，
+#      任何时刻中断都不会重复导入
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.bmp'}
+IMPORT_IO_WORKERS = int(os.getenv('IMPORT_IO_WORKERS', '8'))  # 并发复制文件的线程数
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '200'))  # 每个事务创建的作业数
+IMPORT_EMAIL_DOMAIN = os.getenv('IMPORT_EMAIL_DOMAIN', 'university.edu')  # 自动创建账号的邮箱域名
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+# 扫描导入目录，返回按学号、测试名、文件名排序的待导入文件
+def scan_data_tree(root):
+    """
+    输入: 导入根目录（其下为 <学号>/<testN>/<图片>）
+    返回: list[dict]，每项包含 key（<学号>/<testN>/<文件名>，与导入根目录一起生成幂等键）、
+          student_id、test_name 与 path
+    """
+    root = Path(root)
+    files = []
+    for student_dir in sorted(p for p in root.iterdir() if p.is_dir()):
+        for test_dir in sorted(p for p in student_dir.iterdir() if p.is_dir()):
+            for image in sorted(test_dir.iterdir()):
+                if image.is_file() and image.suffix.lower() in IMAGE_SUFFIXES:
+                    files.append({
+                        "key": f"{student_dir.name}/{test_dir.name}/{image.name}",
+                        "student_id": student_dir.name,
+                        "test_name": test_dir.name,
+                        "path": image,
+                    })
+    return files
+
+
+# 流式复制文件并计算 sha256，按内容寻址存储到 <storage>/<sha 前两位>/<sha><扩展名>
+def store_file(src, storage_dir):
+    """
+    返回: (sha256, 存储路径, 是否新写入)
+    先写入同目录下的临时文件再原子重命名，中断不会留下不完整的目标文件；目标已存在（内容相同）时不重复写入。
+    """
+    src = Path(src)
+    storage_dir = Path(storage_dir)
+    digest = hashlib.sha256()
+    fd, tmp_name = tempfile.mkstemp(dir=storage_dir, suffix='.part')
+    try:
+        with open(src, 'rb') as fin, os.fdopen(fd, 'wb') as fout:
+            while chunk := fin.read(_CHUNK_SIZE):
+                digest.update(chunk)
+                fout.write(chunk)
+        sha = digest.hexdigest()
+        target_dir = storage_dir / sha[:2]
+        target_dir.mkdir(exist_ok=True)
+        target = target_dir / f"{sha}{src.suffix.lower()}"
+        if target.exists():
+            os.remove(tmp_name)
+            return sha, target, False
+        os.replace(tmp_name, target)
+        return sha, target, True
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+# 文件的导入幂等键：同一导入根目录下的同一相对路径只导入一次
+def _import_key(root, key):
+    return hashlib.sha256(f"{Path(root).resolve()}\n{key}".encode("utf-8")).hexdigest()
+
+
+# 查询已导入的幂等键（分批 IN 查询）
+def _imported_keys(db: Session, keys, chunk_size=1000):
+    imported = set()
+    for i in range(0, len(keys), chunk_size):
+        imported.update(db.scalars(select(Assignment.import_key)
+                                   .where(Assignment.import_key.in_(keys[i:i + chunk_size]))).all())
+    return imported
+
+
+# 查询已有学生账号，缺失的批量创建，返回 学号 -> user_id
+def _ensure_students(db: Session, student_ids):
+    existing = dict(db.execute(select(User.username, User.id).where(User.username.in_(student_ids))).all())
+    missing = [sid for sid in student_ids if sid not in existing]
+    # 学号可被猜到，不能作为初始密码：账号写入不可用的密码哈希，设置密码前无法登录
+    created = user_crud.create_users_without_password_bulk(db, [
+        UserBase(username=sid, email=f"{sid}@{IMPORT_EMAIL_DOMAIN}".lower(), role="student")
+        for sid in missing
+    ])
+    existing.update({u.username: u.id for u in created})
+    return existing, len(created)
+
+
+def import_data_tree(db: Session, root, storage_dir, io_workers=None, batch_size=None):
+    """
+    导入整个 Data 目录，可重复执行（已导入的文件会被跳过）。
+    输入:
+        db: 数据库会话
+        root: 导入根目录
+        storage_dir: 图片存储目录（与上传接口相同）
+        io_workers: 并发复制文件的线程数
+        batch_size: 每个事务创建的作业数
+    返回: 导入统计 dict
+    """
+    start = time.perf_counter()
+    storage_dir = Path(storage_dir)
+    storage_dir.mkdir(parents=True, exist_ok=True)
+    io_workers = io_workers or IMPORT_IO_WORKERS
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+
+    files = scan_data_tree(root)
+    for f in files:
+        f["import_key"] = _import_key(root, f["key"])
+    done = _imported_keys(db, [f["import_key"] for f in files])
+    pending = [f for f in files if f["import_key"] not in done]
+
+    student_ids = sorted({f["student_id"] for f in pending})
+    user_ids, created_users = _ensure_students(db, student_ids) if student_ids else ({}, 0)
+
+    stats = {
+        "students": len({f["student_id"] for f in files}),
+        "created_users": created_users,
+        "files": len(files),
+        "skipped": len(files) - len(pending),
+        "imported": 0,
+        "stored_bytes": 0,
+        "deduplicated": 0,
+    }
+
+    with ThreadPoolExecutor(max_workers=io_workers) as pool:
+        for i in range(0, len(pending), batch_size):
+            batch = pending[i:i + batch_size]
+            stored = list(pool.map(lambda f: store_file(f["path"], storage_dir), batch))
+
+            # 作业（含幂等键）与阶段任务在一个事务中创建
+            assignment_crud.create_assignments_bulk(db, [
+                AssignmentCreate(original_image_path=str(path), user_id=user_ids[f["student_id"]],
+                                 import_key=f["import_key"])
+                for f, (_, path, _) in zip(batch, stored)
+            ], priority="bulk")
+
+            stats["imported"] += len(batch)
+            for f, (_, path, written) in zip(batch, stored):
+                if written:
+                    stats["stored_bytes"] += path.stat().st_size
+                else:
+                    stats["deduplicated"] += 1
+            logger.info(f"已导入 {stats['imported']}/{len(pending)}")
+
+    stats["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+if __name__ == '__main__':
+    # 用法（在项目根目录执行）: python -m src.Importer.data_importer Data --storage <存储目录>
+    import argparse
+
+    from core.core_db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="批量导入 Data/<学号>/<testN>/*.jpg 目录中的作业")
+    parser.add_argument("root", help="导入根目录，如 Data")
+    parser.add_argument("--storage", default=os.getenv("UPLOAD_DIR"), help="图片存储目录（默认读取 UPLOAD_DIR）")
+    parser.add_argument("--workers", type=int, default=IMPORT_IO_WORKERS, help="并发复制文件的线程数")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="每个事务创建的作业数")
+    args = parser.parse_args()
+    if not args.storage:
+        parser.error("请通过 --storage 或环境变量 UPLOAD_DIR 指定存储目录")
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal(expire_on_commit=False)  # 批量 INSERT ... RETURNING 返回的对象提交后仍直接使用，无需逐个 SELECT 刷新
+    try:
+        print(json.dumps(import_data_tree(session, args.root, args.storage, args.workers, args.batch_size),
+                         ensure_ascii=False, indent=2))
+    finally:
+        session.close()
@@ -0,0 +1,345 @@
+import itertools
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+
+logger = logging.getLogger(__name__)
+
+# 独立的 OCR 工作进程：
+#   - 常驻一份识别引擎（模型只占一份内存），API 工作进程通过本地套接字（multiprocessing.connection）提交识别任务
+#   - 批处理线程取到第一个任务后，在 OCR_BATCH_WINDOW_MS 时间窗内继续收集（最多 OCR_MAX_BATCH 个），
+#     把来自不同用户/不同 API 进程的图片合并为一次批量推理，负载越高批越大、吞吐越高
+#   - 每个任务带请求 ID，结果按 ID 回传，同一连接上可并发提交多个任务
+#
+# 启动（在项目根目录执行）:
+#   python -m src.OCRWorker.ocr_worker --engine paddle
+# API 进程设置相同的 OCR_WORKER_ADDRESS 后，OCR 接口的 paddle 引擎会改为调用该工作进程。
+# 连接上传输的是 pickle 消息，能连上即可在工作进程中执行任意代码：双方必须配置相同的随机 OCR_WORKER_AUTHKEY
+# （未配置时拒绝启动），Unix 套接字只能建在仅当前用户可访问的目录中，套接字文件权限为 0600。
+
+OCR_WORKER_ADDRESS = os.getenv('OCR_WORKER_ADDRESS', '')  # Unix 套接字路径或 host:port，留空表示不使用
+OCR_WORKER_AUTHKEY = os.getenv('OCR_WORKER_AUTHKEY', '').encode('utf-8')  # 必填，如 secrets.token_hex(32)
+OCR_WORKER_TIMEOUT = float(os.getenv('OCR_WORKER_TIMEOUT', '120'))  # 客户端等待单个结果的超时（秒）
+OCR_BATCH_WINDOW_MS = float(os.getenv('OCR_BATCH_WINDOW_MS', '20'))
+OCR_MAX_BATCH = int(os.getenv('OCR_MAX_BATCH', '8'))
+
+DEFAULT_ADDRESS = (os.path.join(tempfile.gettempdir(), f"ocr_worker-{os.getuid()}", "ocr.sock")
+                   if hasattr(os, 'fork') else '127.0.0.1:8765')
+
+
+# 解析地址：含 ':' 且不是路径时视为 TCP（Windows 没有 Unix 套接字）
+def parse_address(address):
+    address = address or DEFAULT_ADDRESS
+    if ':' in address and not address.startswith(('/', '.')):
+        host, port = address.rsplit(':', 1)
+        return host, int(port)
+    return address
+
+
+# 未配置认证密钥时拒绝启动（连接上传输的是 pickle 消息）
+def require_authkey(authkey):
+    if not authkey:
+        raise RuntimeError("未设置 OCR_WORKER_AUTHKEY：OCR 工作进程的连接必须使用随机密钥认证")
+    return authkey
+
+
+# 创建 Unix 套接字所在的私有目录（0700）；目录已存在时必须属于当前用户且其他用户不可访问
+def _private_socket_dir(path):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.stat(directory)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise RuntimeError(f"OCR 工作进程的套接字目录 {directory} 必须属于当前用户且权限为 0700")
+    return directory
+
+
+# 各引擎的批量识别：输入图片路径或图片数组（BGR，如局部重新识别的裁剪图）列表，
+# 返回与之一一对应的页结果（PaddleOCR 结构的 dict 列表）
+def paddle_batch(images, model="server"):
+    from src.PaddleOCR import PaddleOCR
+    images = [PaddleOCR.preprocess_img_pro(PaddleOCR.load_img(p) if isinstance(p, str) else p) for p in images]
+    return [PaddleOCR.results_to_pages([res]) for res in PaddleOCR.ocr_recognition_batch(images, model)]
+
+
+def easyocr_batch(images):
+    from src.EasyOCR import EasyOCR
+    # EasyOCR 的批量接口要求图片尺寸一致，这里逐张识别，但同样省去了每个 API 进程各自加载模型
+    return [EasyOCR.easy_ocr(p) if isinstance(p, str)
+            else [EasyOCR.results_to_page(EasyOCR.ocr_recognition(EasyOCR.preprocess_img_pro(p)))]
+            for p in images]
+
+
+ENGINES = {"paddle": paddle_batch, "easyocr": easyocr_batch}
+
+
+# 启动前加载模型，首个任务不必等待
+def warm_up(engine):
+    if engine == "paddle":
+        from src.PaddleOCR import PaddleOCR
+        PaddleOCR.warm_up()
+    else:
+        from src.EasyOCR import EasyOCR
+        EasyOCR.warm_up()
+
+
+class OCRWorkerServer:
+    """
+    recognize_batch(list[图片路径或图片数组]) -> list[页结果列表]，与输入一一对应。
+    单张图片出错时（如文件不存在）整批失败，服务会把该批拆成单张重试，只让出错的任务返回错误。
+    """
+
+    def __init__(self, recognize_batch, address=None, authkey=OCR_WORKER_AUTHKEY,
+                 batch_window_ms=OCR_BATCH_WINDOW_MS, max_batch=OCR_MAX_BATCH):
+        self.recognize_batch = recognize_batch
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch = max_batch
+        self.listener = None
+        self._jobs = queue.Queue()
+        self._stopped = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.stats = {"jobs": 0, "batches": 0, "errors": 0, "batch_sizes": {}}
+
+    def start(self):
+        if isinstance(self.address, str):
+            _private_socket_dir(self.address)
+            if os.path.exists(self.address):
+                os.remove(self.address)  # 上次异常退出留下的套接字文件
+            old_umask = os.umask(0o177)  # 套接字文件创建时即为 0600
+            try:
+                self.listener = Listener(self.address, authkey=self.authkey)
+            finally:
+                os.umask(old_umask)
+        else:
+            self.listener = Listener(self.address, authkey=self.authkey)
+        self.address = self.listener.address
+        threading.Thread(target=self._accept_loop, name="ocr-worker-accept", daemon=True).start()
+        threading.Thread(target=self._batch_loop, name="ocr-worker-batch", daemon=True).start()
+        logger.info(f"OCR 工作进程监听 {self.address}，批处理窗口 {self.batch_window * 1000:.0f}ms，"
+                    f"最大批 {self.max_batch}")
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._jobs.put(None)
+        if self.listener is not None:
+            self.listener.close()
+
+    def serve_forever(self):
+        self.start()
+        try:
+            self._stopped.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                conn = self.listener.accept()
+            except (OSError, EOFError):
+                if self._stopped.is_set():
+                    return
+                continue
+            threading.Thread(target=self._read_loop, args=(conn, threading.Lock()), daemon=True).start()
+
+    # 读取一个连接上的请求：识别任务进入批处理队列，stats 请求直接回复
+    def _read_loop(self, conn, send_lock):
+        try:
+            while True:
+                msg = conn.recv()
+                if msg.get("type") == "stats":
+                    self._reply(conn, send_lock, {"id": msg["id"], "result": self.snapshot()})
+                else:
+                    self._jobs.put((conn, send_lock, msg))
+        except (EOFError, OSError):
+            conn.close()
+
+    def _reply(self, conn, send_lock, message):
+        try:
+            with send_lock:
+                conn.send(message)
+        except (OSError, EOFError):
+            pass  # 客户端已断开
+
+    # 取到第一个任务后在时间窗内继续收集，凑成一批
+    def _next_batch(self):
+        first = self._jobs.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                job = self._jobs.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is None:
+                self._jobs.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _batch_loop(self):
+        while not self._stopped.is_set():
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        paths = [msg["image"] for _, _, msg in batch]
+        try:
+            results = self.recognize_batch(paths)
+            outcomes = [{"result": r} for r in results]
+        except Exception as e:
+            if len(batch) == 1:
+                outcomes = [{"error": f"{type(e).__name__}: {e}"}]
+            else:
+                # 拆成单张重试，定位出错的任务
+                for job in batch:
+                    self._run_batch([job])
+                return
+        with self._stats_lock:
+            self.stats["jobs"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["errors"] += sum(1 for o in outcomes if "error" in o)
+            sizes = self.stats["batch_sizes"]
+            sizes[len(batch)] = sizes.get(len(batch), 0) + 1
+        for (conn, send_lock, msg), outcome in zip(batch, outcomes):
+            self._reply(conn, send_lock, {"id": msg["id"], **outcome})
+
+    def snapshot(self):
+        with self._stats_lock:
+            return {**self.stats, "batch_sizes": dict(self.stats["batch_sizes"]), "queued": self._jobs.qsize()}
+
+
+# 把 Future 标记为执行中以便设置结果；已被取消或已完成时返回 False
+def _claim(future: Future) -> bool:
+    try:
+        return future.set_running_or_notify_cancel()
+    except RuntimeError:
+        return False
+
+
+class OCRWorkerClient:
+    """线程安全的客户端：一个连接上并发提交任务，由接收线程按请求 ID 分发结果"""
+
+    def __init__(self, address=None, authkey=OCR_WORKER_AUTHKEY, timeout=OCR_WORKER_TIMEOUT):
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pending = {}
+        self._ids = itertools.count(1)
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = Client(self.address, authkey=self.authkey)
+            threading.Thread(target=self._receive_loop, args=(self._conn,), name="ocr-worker-client",
+                             daemon=True).start()
+        return self._conn
+
+    def _receive_loop(self, conn):
+        try:
+            while True:
+                msg = conn.recv()
+                with self._lock:
+                    future = self._pending.pop(msg["id"], None)
+                # 调用方已超时或被取消（asyncio.wrap_future 会取消对应的 Future）时丢弃迟到的结果
+                if future is None or not _claim(future):
+                    continue
+                if "error" in msg:
+                    future.set_exception(RuntimeError(f"OCR 工作进程识别失败: {msg['error']}"))
+                else:
+                    future.set_result(msg["result"])
+        except (EOFError, OSError):
+            pass
+        except Exception:
+            logger.exception("处理 OCR 工作进程的回复失败，重置连接")
+        # 连接断开或接收出错：让等待中的任务失败，下次提交时重新连接
+        with self._lock:
+            pending = {}
+            if self._conn is conn or self._conn is None:
+                self._conn = None
+                pending, self._pending = self._pending, {}
+        try:
+            conn.close()
+        except OSError:
+            pass
+        for future in pending.values():
+            if _claim(future):
+                future.set_exception(ConnectionError("与 OCR 工作进程的连接已断开"))
+
+    def submit(self, image, msg_type="ocr") -> Future:
+        """提交一张图片：路径或图片数组（数组随消息一起发送，工作进程无需访问本机文件）"""
+        future = Future()
+        with self._lock:
+            conn = self._connection()
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+            try:
+                conn.send({"id": request_id, "type": msg_type,
+                           "image": image if hasattr(image, "shape") else str(image)})
+            except (OSError, EOFError):
+                self._pending.pop(request_id, None)
+                self._conn = None
+                raise
+        return future
+
+    def recognize(self, image):
+        """识别一张图片（路径或图片数组），返回 PaddleOCR 结构的页结果列表（可直接交给 line_layout.extract_code_lines）"""
+        return self.submit(image).result(timeout=self.timeout)
+
+    def stats(self):
+        return self.submit("", msg_type="stats").result(timeout=self.timeout)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+# 进程内共享的客户端；未配置 OCR_WORKER_ADDRESS 时返回 None（在 API 进程内直接识别）
+def get_client():
+    global _client
+    if not OCR_WORKER_ADDRESS:
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OCRWorkerClient(OCR_WORKER_ADDRESS)
+    return _client
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="独立 OCR 工作进程（跨请求微批处理）")
+    parser.add_argument("--engine", default="paddle", choices=sorted(ENGINES))
+    parser.add_argument("--address", default=OCR_WORKER_ADDRESS or DEFAULT_ADDRESS,
+                        help="Unix 套接字路径或 host:port")
+    parser.add_argument("--window-ms", type=float, default=OCR_BATCH_WINDOW_MS, help="批处理收集时间窗")
+    parser.add_argument("--max-batch", type=int, default=OCR_MAX_BATCH, help="单批最多图片数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    warm_up(args.engine)
+    OCRWorkerServer(ENGINES[args.engine], args.address, batch_window_ms=args.window_ms,
+                    max_batch=args.max_batch).serve_forever()
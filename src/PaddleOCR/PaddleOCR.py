@@ -1,10 +1,12 @@
 import logging
 
-import cv2
 import numpy as np
-from paddleocr import PaddleOCR
 import sys
 import os
+import threading
+
+from common.monitor.metrics import ocr_engine_loads_total, ocr_engine_cache_hits_total
+from common.monitor.stage_timer import timed_stage, describe_image
 
 # 设置控制台编码为 UTF-8
 if os.name == 'nt':
@@ -13,13 +15,18 @@ if os.name == 'nt':
     msvcrt.setmode(sys.stdout.fileno(), os.O_BINARY)
     sys.stdout.reconfigure(encoding='utf-8')
 
+# paddleocr（及 paddle）与 cv2 导入开销大：只在首次加载图片/创建引擎（或显式 warm_up）时导入，
+# 只使用上传、报告等接口的进程不需要为此付出启动时间。
+
 # 关闭PaddleOCR的DEBUG日志
 logger = logging.getLogger('ppocr')
 logger.setLevel(logging.INFO)  # 设置INFO级别（可选：WARNING/ERROR）
 
 
 # 加载图片
+@timed_stage("load", describe=describe_image)
 def load_img(img_path):
+    import cv2
     img = cv2.imread(img_path)
     if img is None:
         raise ValueError("Image not loaded correctly")
@@ -27,7 +34,9 @@ def load_img(img_path):
 
 
 # 图片预处理
+@timed_stage("preprocess", describe=describe_image)
 def preprocess_img_pro(image):
+    import cv2
     # 转化为灰度图
     gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     # 对灰度图进行高斯模糊，去除图片中的噪声
@@ -52,22 +61,67 @@ def preprocess_img_pro(image):
     return preprocessed
 
 
+# 可选的检测/识别模型组合：server 精度高，mobile 速度快
+OCR_MODELS = {
+    "server": ("PP-OCRv5_server_det", "PP-OCRv5_server_rec"),
+    "mobile": ("PP-OCRv5_mobile_det", "PP-OCRv5_mobile_rec"),
+}
+
+# 不启用文档方向分类与文档矫正：两者都会在检测前旋转/扭正整张图，rec_polys 随之落在变换后的图上，
+# 与原图像素坐标不一致。版面中保存的行框、局部重新识别的区域（整图像素坐标）、EasyOCR 与集成识别的行框
+# 都必须在同一个坐标系（原图）中，否则局部识别裁到的是别处。文本行方向分类只作用于每行的裁剪图，不影响坐标。
+# 常驻的 ocr 引擎（每个进程每种模型只初始化一次，避免每次请求重新加载模型）
+_ocr_engines = {}
+# 同一个引擎实例不保证可被多线程并发 predict，推理时加锁
+_ocr_engine_lock = threading.Lock()
+
+
+# 获取（必要时初始化）ocr 引擎
+def get_ocr_engine(model="server"):
+    engine = _ocr_engines.get(model)
+    if engine is None:
+        with _ocr_engine_lock:
+            engine = _ocr_engines.get(model)
+            if engine is None:
+                from paddleocr import PaddleOCR
+                det_model, rec_model = OCR_MODELS[model]
+                # 初始化 ocr 引擎
+                engine = PaddleOCR(
+                    text_detection_model_name=det_model,
+                    text_recognition_model_name=rec_model,
+                    use_doc_orientation_classify=False,  # 通过 use_doc_orientation_classify 参数指定不使用文档方向分类模型
+                    use_doc_unwarping=False,  # 通过 use_doc_unwarping 参数指定不使用文本图像矫正模型
+                    use_textline_orientation=True,  # 文本行方向分类（只旋转每行的裁剪图，检测框坐标不变）
+                    lang="en",  # 通过 lang 参数来使用英文模型
+                    # device="gpu",  # 通过 device 参数使得在模型推理时使用 GPU
+                    # text_detection_model_dir="../../paddleocr/_pipelines"# 通过 text_detection_model_dir 指定本地模型路径
+                    # ocr_version="PP-OCRv4" # 通过 ocr_version 参数来使用 PP-OCR 其他版本
+                )
+                _ocr_engines[model] = engine
+                ocr_engine_loads_total.inc(engine="paddle", model=model)
+                return engine
+    ocr_engine_cache_hits_total.inc(engine="paddle", model=model)
+    return engine
+
+
+# 预热：导入 cv2 / paddleocr 并加载指定模型（服务启动阶段调用，避免首个请求承担加载耗时）
+def warm_up(model="server"):
+    import cv2  # noqa: F401
+    get_ocr_engine(model)
+
+
+# 计时记录中补充识别出的文本框数量
+def _describe_predict(args, kwargs, result, record):
+    record.sizes["boxes"] = sum(len(res["rec_texts"]) for res in result)
+
+
 # 使用PaddleOCR识别
-def ocr_recognition(image):
-    # 初始化 ocr 引擎
-    ocr = PaddleOCR(
-        text_detection_model_name="PP-OCRv5_server_det",
-        text_recognition_model_name="PP-OCRv5_server_rec",
-        use_doc_orientation_classify=True,  # 通过 use_doc_orientation_classify 参数指定不使用文档方向分类模型
-        use_doc_unwarping=True,  # 通过 use_doc_unwarping 参数指定不使用文本图像矫正模型
-        use_textline_orientation=True,  # 通过 use_textline_orientation 参数指定不使用文本行方向分类模型
-        lang="en",  # 通过 lang 参数来使用英文模型
-        # device="gpu",  # 通过 device 参数使得在模型推理时使用 GPU
-        # text_detection_model_dir="../../paddleocr/_pipelines"# 通过 text_detection_model_dir 指定本地模型路径
-        # ocr_version="PP-OCRv4" # 通过 ocr_version 参数来使用 PP-OCR 其他版本
-    )
-
-    result = ocr.predict(image)
+@timed_stage("predict", describe=_describe_predict)
+def ocr_recognition(image, model="server"):
+    ocr = get_ocr_engine(model)
+
+    with _ocr_engine_lock:
+        result = ocr.predict(image)
 
     """
        保存识别结果的图片和json数据
@@ -81,6 +135,34 @@ def ocr_recognition(image):
     return result
 
 
+# 计时记录中补充批大小与文本框总数
+def _describe_predict_batch(args, kwargs, result, record):
+    record.sizes["batch"] = len(result)
+    record.sizes["boxes"] = sum(len(res["rec_texts"]) for res in result)
+
+
+# 一次 predict 识别多张图片（检测/识别模型按批推理），返回与输入一一对应的结果
+@timed_stage("predict", describe=_describe_predict_batch)
+def ocr_recognition_batch(images, model="server"):
+    if not images:
+        return []
+    ocr = get_ocr_engine(model)
+    with _ocr_engine_lock:
+        return list(ocr.predict(list(images)))
+
+
+# 把 predict 结果转换为只含 rec_texts / rec_scores / rec_polys 的普通 dict 列表（可跨进程传递）
+def results_to_pages(results):
+    pages = []
+    for res in results:
+        pages.append({
+            "rec_texts": list(res["rec_texts"]),
+            "rec_scores": [float(s) for s in res["rec_scores"]],
+            "rec_polys": [np.asarray(p).tolist() for p in res["rec_polys"]],
+        })
+    return pages
+
+
 # ocr调用函数
 def paddle_ocr(image):
     # 加载图片
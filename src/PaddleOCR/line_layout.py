@@ -0,0 +1,197 @@
+import numpy as np
+
+from common.monitor.stage_timer import timed_stage
+
+
+# 基于检测框几何信息重建代码行：
+#   1. 直接读取 rec_texts / rec_scores / rec_polys 三个数组（不再递归遍历结果结构）
+#   2. 按 x 方向的空白间隔（栏间距）划分栏
+#   3. 按 y 方向的重叠聚类成行，行内按 x 排序
+#   4. 由行首 x 偏移恢复缩进，一次遍历输出代码字符串
+
+
+# 取单页结果中的某个字段（兼容 dict / OCRResult / 带属性的对象）
+def _get_field(page, key):
+    if isinstance(page, dict):
+        return page.get(key)
+    try:
+        return page[key]
+    except (KeyError, TypeError, IndexError):
+        return getattr(page, key, None)
+
+
+# 把单页结果转换为 (texts, scores, polys) 三个数组
+def _page_arrays(page):
+    """
+    把单页 OCR 结果转换为 (texts, scores, polys)。
+    支持:
+        - PaddleOCR 3.x 的 OCRResult / dict（含 rec_texts、rec_scores、rec_polys 或 rec_boxes）
+        - 旧版 [[poly, (text, score)], ...] 列表格式
+    polys 无法获得时返回 None，由调用方退化为按输出顺序拼接。
+    """
+    texts = _get_field(page, "rec_texts")
+    if texts is not None:
+        texts = [t if isinstance(t, str) else "" for t in texts]
+        scores = _get_field(page, "rec_scores")
+        polys = _get_field(page, "rec_polys")
+        if polys is None or len(polys) != len(texts):
+            boxes = _get_field(page, "rec_boxes")
+            if boxes is not None and len(boxes) == len(texts):
+                b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+                # [x0, y0, x1, y1] -> 四点多边形
+                polys = np.stack([b[:, [0, 1]], b[:, [2, 1]], b[:, [2, 3]], b[:, [0, 3]]], axis=1)
+            else:
+                polys = None
+        if scores is None or len(scores) != len(texts):
+            scores = np.ones(len(texts))
+        return texts, np.asarray(scores, dtype=np.float64), polys
+
+    # 旧版格式：每一项为 [poly, (text, score)]
+    if isinstance(page, (list, tuple)):
+        texts, scores, polys = [], [], []
+        for item in page:
+            if (isinstance(item, (list, tuple)) and len(item) >= 2
+                    and isinstance(item[1], (list, tuple)) and item[1] and isinstance(item[1][0], str)):
+                texts.append(item[1][0])
+                scores.append(float(item[1][1]) if len(item[1]) > 1 else 1.0)
+                polys.append(item[0])
+        if texts:
+            return texts, np.asarray(scores, dtype=np.float64), polys
+    return [], np.zeros(0), None
+
+
+# 按 x 方向的空白间隔划分栏，返回每个框所属的栏号
+def _assign_columns(x0, x1, min_gutter):
+    """
+    把所有框在 x 轴上的投影区间合并，覆盖区间之间宽度超过 min_gutter 的空白视为栏间距。
+    返回与输入等长的栏号数组（从 0 开始，从左到右）。
+    """
+    order = np.argsort(x0, kind="stable")
+    xs0 = x0[order]
+    reach = np.maximum.accumulate(x1[order])
+    # 某个框的左边界比它之前所有框的最右边界还远 min_gutter 以上，即为新栏的开始
+    starts = np.flatnonzero(xs0[1:] - reach[:-1] > min_gutter) + 1
+    gutters = xs0[starts]
+    return np.searchsorted(gutters, x0, side="right")
+
+
+# 将检测框分组为代码行，并恢复缩进
+def group_lines(texts, scores, polys, line_overlap=0.5, column_gap=4.0, indent_chars=2.0, indent_width=4):
+    """
+    根据检测框几何信息把识别出的文本片段重组为代码行。
+    输入:
+        texts: list[str]，每个检测框的识别文本
+        scores: 与 texts 等长的置信度数组
+        polys: 与 texts 等长的多边形（每个为若干 [x, y] 点）
+        line_overlap: 相邻框中心 y 差小于 line_overlap * 较小框高 时视为同一行
+        column_gap: 栏间空白至少为 column_gap * 中位框高 才划分为新栏
+        indent_chars: 一级缩进对应的手写字符宽度数
+        indent_width: 输出时每级缩进的空格数
+    返回:
+        list[dict]，每行包含 text（含缩进）、score（按字符数加权的平均置信度）、
+        box（[x0, y0, x1, y1]）与 indent（缩进级数）
+    """
+    keep = np.array([isinstance(t, str) and t.strip() != "" for t in texts], dtype=bool)
+    if not keep.any():
+        return []
+    idx = np.flatnonzero(keep)
+    texts = [texts[i].strip() for i in idx]
+    scores = np.asarray(scores, dtype=np.float64)[idx]
+    try:
+        pts = np.asarray([polys[i] for i in idx], dtype=np.float64).reshape(len(idx), -1, 2)
+        x0, y0 = pts[:, :, 0].min(axis=1), pts[:, :, 1].min(axis=1)
+        x1, y1 = pts[:, :, 0].max(axis=1), pts[:, :, 1].max(axis=1)
+    except ValueError:
+        # 多边形点数不一致时逐个求外接框
+        bounds = np.array([[*np.asarray(polys[i], dtype=np.float64).reshape(-1, 2).min(axis=0),
+                            *np.asarray(polys[i], dtype=np.float64).reshape(-1, 2).max(axis=0)] for i in idx])
+        x0, y0, x1, y1 = bounds[:, 0], bounds[:, 1], bounds[:, 2], bounds[:, 3]
+    heights = np.maximum(y1 - y0, 1.0)
+    lengths = np.array([len(t) for t in texts], dtype=np.float64)
+    median_h = float(np.median(heights))
+
+    # 1) 分栏
+    column = _assign_columns(x0, x1, column_gap * median_h)
+
+    # 2) 栏内按中心 y 排序，相邻中心差超过阈值即断行（向量化聚类）
+    cy = (y0 + y1) / 2.0
+    order = np.lexsort((cy, column))
+    col_s, cy_s, h_s = column[order], cy[order], heights[order]
+    breaks = (np.diff(cy_s) > line_overlap * np.minimum(h_s[1:], h_s[:-1])) | (np.diff(col_s) != 0)
+    line_of = np.empty(len(order), dtype=np.int64)
+    line_of[order] = np.concatenate(([0], np.cumsum(breaks)))
+
+    # 3) 行内按 x 排序
+    order = np.lexsort((x0, line_of))
+    n_lines = int(line_of.max()) + 1
+    starts = np.flatnonzero(np.concatenate(([True], np.diff(line_of[order]) != 0)))
+
+    # 每行的外接框、首框 x 与加权置信度
+    line_x0 = np.minimum.reduceat(x0[order], starts)
+    line_y0 = np.minimum.reduceat(y0[order], starts)
+    line_x1 = np.maximum.reduceat(x1[order], starts)
+    line_y1 = np.maximum.reduceat(y1[order], starts)
+    weight = np.add.reduceat(lengths[order], starts)
+    line_score = np.add.reduceat((scores * lengths)[order], starts) / np.maximum(weight, 1.0)
+    line_col = column[order][starts]
+
+    # 4) 由行首相对本栏最左侧的偏移恢复缩进
+    char_w = float(np.median((x1 - x0) / np.maximum(lengths, 1.0)))
+    col_base = np.full(int(line_col.max()) + 1, np.inf)
+    np.minimum.at(col_base, line_col, line_x0)
+    offset = line_x0 - col_base[line_col]
+    indent = np.maximum(np.rint(offset / max(char_w * indent_chars, 1.0)), 0).astype(np.int64)
+
+    # 5) 一次遍历拼接各行文本
+    bounds = np.append(starts, len(order))
+    lines = []
+    for k in range(n_lines):
+        segment = " ".join(texts[i] for i in order[bounds[k]:bounds[k + 1]])
+        lines.append({
+            "text": " " * (indent_width * int(indent[k])) + segment,
+            "score": float(line_score[k]),
+            "box": [float(line_x0[k]), float(line_y0[k]), float(line_x1[k]), float(line_y1[k])],
+            "indent": int(indent[k]),
+        })
+    return lines
+
+
+# 计时记录中补充代码行数与平均行置信度
+def _describe_extract(args, kwargs, result, record):
+    record.sizes["lines"] = len(result)
+    if result:
+        record.confidence = float(np.mean([ln["score"] for ln in result]))
+
+
+# 从 OCR 结果（可含多页）中提取按版面排列的代码行
+@timed_stage("extract", describe=_describe_extract)
+def extract_code_lines(results, **kwargs):
+    """
+    从 PaddleOCR 的 predict 结果（list[OCRResult]、单个 dict 或旧版列表格式）中提取代码行。
+    缺少坐标信息的页退化为按识别输出顺序逐条成行（缩进为 0）。
+    kwargs 透传给 group_lines。
+    返回: list[dict]，字段同 group_lines
+    """
+    if results is None:
+        return []
+    pages = [results] if isinstance(results, dict) else results
+
+    lines = []
+    for page in pages:
+        texts, scores, polys = _page_arrays(page)
+        if not texts:
+            continue
+        if polys is None:
+            for t, s in zip(texts, scores):
+                if t.strip():
+                    lines.append({"text": t.strip(), "score": float(s), "box": None, "indent": 0})
+            continue
+        lines.extend(group_lines(texts, scores, polys, **kwargs))
+    return lines
+
+
+# 把代码行拼成以换行符结尾的源代码字符串
+def lines_to_code_string(lines):
+    if not lines:
+        return ""
+    return "\n".join(ln["text"] for ln in lines) + "\n"
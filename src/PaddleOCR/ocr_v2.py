@@ -1,7 +1,13 @@
 from  src.PaddleOCR.PaddleOCR import paddle_ocr
+from src.PaddleOCR import line_layout
 
+import os
 import re
 import difflib
+import threading
+from collections import OrderedDict
+
+from common.monitor.stage_timer import timed_stage
 
 
 # 把 OCR 的 rec_texts（字符串列表）拼成一个包含换行符的源代码字符串。
@@ -27,83 +33,22 @@ def rec_texts_list_to_code_string(rec_texts):
     return code_str
 
 
-# 在内存中执行 OCR 并直接返回拼接好的源代码字符串（不写文件）。
-def ocr_recognition_return_string(results):
-    collected = []
+# 在内存中执行 OCR 并返回按版面重建的代码行（含每行置信度与外接框）。
+def ocr_recognition_return_lines(results):
+    """
+    直接读取结果中的 rec_texts / rec_scores / rec_polys，按检测框几何信息重建代码行。
+    返回: list[dict]，每行包含 text（含缩进）、score、box、indent
+    """
+    return line_layout.extract_code_lines(results)
 
-    for res in results:
-        # res.print()
-        # print(res["rec_texts"])
-        res.save_to_img("output")
-        res.save_to_json("output")
 
-    # 递归查找并提取所有可能的文本行（兼容 dict/list/object 等结构）
-    def find_and_collect(obj):
-        if obj is None:
-            return
-        # 普通 dict，寻找键 'rec_texts' 或 'text' 等
-        if isinstance(obj, dict):
-            # 直接有 rec_texts 字段（你的场景）
-            if "rec_texts" in obj and isinstance(obj["rec_texts"], list):
-                for s in obj["rec_texts"]:
-                    if isinstance(s, str):
-                        collected.append(s)
-                return
-            # 有可能是每个条目是 {'text': '...', ...}
-            if "text" in obj and isinstance(obj["text"], str):
-                collected.append(obj["text"])
-                return
-            # 否则遍历所有 value
-            for v in obj.values():
-                find_and_collect(v)
-            return
-
-        # 列表或元组：常见 paddle 返回格式
-        if isinstance(obj, (list, tuple)):
-            # 常见单条结构： [bbox, (text, score)] 或 [bbox, text] 或 [ [x1,y1], ... , ['text', conf] ]
-            # 遍历元素并尝试解析
-            # 尝试常见 pattern：第二项为 (text, score) 或 [text, score]
-            if len(obj) >= 2:
-                second = obj[1]
-                # case: (text, score)
-                if isinstance(second, (list, tuple)) and len(second) >= 1 and isinstance(second[0], str):
-                    collected.append(second[0])
-                    # 继续遍历以防 nested
-                    for it in obj:
-                        find_and_collect(it)
-                    return
-                # case: second directly is a str
-                if isinstance(second, str):
-                    collected.append(second)
-                    for it in obj:
-                        find_and_collect(it)
-                    return
-            # 如果不是上述简单结构，就逐项递归查找
-            for it in obj:
-                find_and_collect(it)
-            return
-
-        # 对象（可能有属性 rec_texts）
-        # 例如某些版本返回的对象有 .rec_texts 属性
-        try:
-            rec_attr = getattr(obj, "rec_texts", None)
-            if isinstance(rec_attr, list):
-                for s in rec_attr:
-                    if isinstance(s, str):
-                        collected.append(s)
-                return
-        except Exception:
-            pass
-
-        # 不能解析的类型，忽略
-        return
-
-    # 提取文本
-    find_and_collect(results)
-
-    # 拼成最终代码字符串
-    code_str = rec_texts_list_to_code_string(collected)
-    return code_str
+# 在内存中执行 OCR 并直接返回拼接好的源代码字符串（不写文件）。
+def ocr_recognition_return_string(results):
+    """
+    按检测框的行/栏聚类与缩进恢复拼接源代码字符串（不写文件）。
+    如需保存可视化结果，请在调用方对每个 res 调用 save_to_img / save_to_json。
+    """
+    return line_layout.lines_to_code_string(ocr_recognition_return_lines(results))
 
 
 # 关键字列表（用于模糊匹配）
@@ -137,8 +82,8 @@ def _normalize_fullwidth_and_punct(s: str) -> str:
     }
     for k, v in replacements.items():
         s = s.replace(k, v)
-    # 压缩非法空白（保留 \n）
-    s = re.sub(r'[ \t\f\v]+', ' ', s)
+    # 压缩非法空白（保留 \n 与行首缩进）
+    s = re.sub(r'(?<=\S)[ \t\f\v]+', ' ', s)
     # 去掉行尾多余空格，但保留缩进
     s = "\n".join(line.rstrip() for line in s.splitlines())
     return s
@@ -164,51 +109,24 @@ def _keyword_fuzzy_fix(code: str, cutoff: float = 0.85, verbose=False):
     return re.sub(r'\b[A-Za-z_][A-Za-z0-9_]{0,11}\b', replace_token, code)
 
 
-# 后处理 OCR 识别出来的代码字符串，返回修正后的代码字符串。（启发式规则）
-def postprocess_code(code_str: str, verbose: bool = False) -> str:
-    """
-    进阶后处理 OCR 识别出的代码文本（启发式规则）。
-    - 输入: code_str（原始或第一次后处理后的字符串）
-    - 返回: 修正后的代码字符串
-    说明: 规则尽量保守，同时包含一些针对 Stack push/pop 的启发式修复。
-    """
-    if not code_str:
-        return ""
-
-    code = _normalize_fullwidth_and_punct(code_str)
+# 识别置信度不低于该阈值的行视为可信行：只做安全的规范化修正，跳过模糊关键字匹配与激进改写
+HIGH_CONFIDENCE_THRESHOLD = 0.95
 
-    # 1) 删除显然不是代码的行（仅含单个非 ASCII 字符、孤立标点或中文）
-    cleaned_lines = []
-    for ln in code.splitlines():
-        s = ln.strip()
-        if s.lower() == "date":
-            if verbose: print("[drop] 'Date'")
-            continue
-        # 如果行包含 CJK（中文/日文/韩文）字符并且没有英文字母或数字，很可能是噪声，丢弃
-        if re.search(r'[\u4e00-\u9fff]', s) and not re.search(r'[A-Za-z0-9_]', s):
-            if verbose:
-                print(f"[drop noisy line] {s!r}")
-            continue
-        # 丢弃非常短、且仅由单字符或孤立符号构成的行
-        if len(s) <= 1 and not re.search(r'[A-Za-z0-9]', s):
-            if verbose:
-                print(f"[drop short non-code] {s!r}")
-            continue
-        cleaned_lines.append(ln)
-    code = "\n".join(cleaned_lines)
 
+# 安全规则：只修正几乎不可能是正确代码的片段，对所有行都执行（原 2~5 步）
+def _fix_line_safe(ln: str, verbose: bool = False) -> str:
     # 2) 修正双重 <<（例如: '<< <<' 或 '<< << "...'）
-    code, n = re.subn(r'<<\s*<<', '<<', code)
+    ln, n = re.subn(r'<<\s*<<', '<<', ln)
     if verbose and n:
         print(f"[fix <<<<] replaced {n} occurrences of '<< <<'")
 
     # 3) 修正 cout 的典型误识别：coutc" -> cout << "
-    code = re.sub(r'\bcout\s*[cC]\s*["\']', 'cout << "', code)
-    code = re.sub(r'\bcoutic\b', 'cout <<', code)
-    code = re.sub(r'\bcoutc\b', 'cout <<', code)
+    ln = re.sub(r'\bcout\s*[cC]\s*["\']', 'cout << "', ln)
+    ln = re.sub(r'\bcoutic\b', 'cout <<', ln)
+    ln = re.sub(r'\bcoutc\b', 'cout <<', ln)
     # 修正一些 'cout << <<"...' 导致的重复 << 后边紧跟引号的情况
-    code = re.sub(r'<<\s*<<\s*"', '<< "', code)
-    code = re.sub(r'<<\s*<<\s*\'', '<< \'', code)
+    ln = re.sub(r'<<\s*<<\s*"', '<< "', ln)
+    ln = re.sub(r'<<\s*<<\s*\'', '<< \'', ln)
 
     # 4) 在字符串内把常见的 `.n`、`/n`、` \ n` 等修为真正的转义 \\n （在源代码文件中希望看到的是 \\n）
     def _fix_newline_in_strings(s):
@@ -219,48 +137,85 @@ def postprocess_code(code_str: str, verbose: bool = False) -> str:
         s = re.sub(r'(?<=["\'])\s*,\s*n(?=["\'])', r'\\n', s)
         return s
 
-    # 对整段文本中的引号内内容进行替换（更稳妥）
+    # 对引号内内容进行替换（更稳妥）
     def replace_in_quotes(match):
         inner = match.group(1)
         inner_fixed = _fix_newline_in_strings('"' + inner + '"')[1:-1]
         return '"' + inner_fixed + '"'
 
-    code = re.sub(r'"([^"]*)"', replace_in_quotes, code)
+    ln = re.sub(r'"([^"]*)"', replace_in_quotes, ln)
 
     # 5) 修正 STACK_SZZE -> STACK_SIZE（以及类似明显字母错位）
-    code = re.sub(r'STACK[_\s]*S?Z+E', 'STACK_SIZE', code, flags=re.IGNORECASE)
+    ln = re.sub(r'STACK[_\s]*S?Z+E', 'STACK_SIZE', ln, flags=re.IGNORECASE)
+    return ln
 
+
+# 激进规则：针对 Stack push/pop 的启发式改写与关键字模糊匹配，只对低置信行执行（原 6~9 步）
+def _fix_line_aggressive(ln: str, verbose: bool = False) -> str:
     # 6) 修正 push / pop 函数名常见 OCR 错误（保守做法）
     # pushcinti -> push(int i)
-    code = re.sub(r'\bpush\w*int\w*\b', 'push(int i)', code, flags=re.IGNORECASE)
+    ln = re.sub(r'\bpush\w*int\w*\b', 'push(int i)', ln, flags=re.IGNORECASE)
     # 修正类似 "void Stack :poPCint &i)" -> "void Stack::pop(int &i)"
-    code = re.sub(r'void\s+Stack\s*[:]\s*poP?C?int\s*&\s*i\)', 'void Stack::pop(int &i)', code, flags=re.IGNORECASE)
+    ln = re.sub(r'void\s+Stack\s*[:]\s*poP?C?int\s*&\s*i\)', 'void Stack::pop(int &i)', ln, flags=re.IGNORECASE)
     # 如果出现 "Stack :poPCint" 也修
-    code = re.sub(r'Stack\s*[:]\s*poP?C?int', 'Stack::pop', code, flags=re.IGNORECASE)
+    ln = re.sub(r'Stack\s*[:]\s*poP?C?int', 'Stack::pop', ln, flags=re.IGNORECASE)
 
     # 更通用：把 ":\s*poP.*int" -> "::pop(int"
-    code = re.sub(r':\s*poP\w*\s*int', '::pop(int', code, flags=re.IGNORECASE)
+    ln = re.sub(r':\s*poP\w*\s*int', '::pop(int', ln, flags=re.IGNORECASE)
 
     # 7) 针对 push 的内部语句修复 buffer[++top] 模式
     # 如果行像 '_{toptt;buffer[top]}=i;' 或包含 'buff...top' 且在 push 函数上下文，则修为 'buffer[++top] = i;'
-    code = re.sub(r'_\{top\w*;buffer\[top\]\}\s*=\s*i\s*;', 'buffer[++top] = i;', code)
-    code = re.sub(r'buffer\[top\]', 'buffer[++top]', code)  # 先保守替换（后面若出现 pop 再调整）
+    ln = re.sub(r'_\{top\w*;buffer\[top\]\}\s*=\s*i\s*;', 'buffer[++top] = i;', ln)
+    ln = re.sub(r'buffer\[top\]', 'buffer[++top]', ln)  # 先保守替换（后面若出现 pop 再调整）
     # 但如果紧接着是 pop 块（i = buffer[...]），下面会被覆盖
 
     # 8) 针对 pop 的内部语句修复 'i=buffer[top]]; top-' -> 'i = buffer[top--];'
-    code = re.sub(r'i\s*=\s*buffer\[top\]\]\s*;\s*top-', 'i = buffer[top--];', code)
+    ln = re.sub(r'i\s*=\s*buffer\[top\]\]\s*;\s*top-', 'i = buffer[top--];', ln)
     # 若出现 'top-' 单独一行或尾部，尽可能修为 'top--;' 或合并到上行变为 'buffer[top--]'
-    code = re.sub(r'\btop-\b', 'top--', code)
+    ln = re.sub(r'\btop-\b', 'top--', ln)
     # 把 'buffer[top]]' -> 'buffer[top]'（多余括号）
-    code = re.sub(r'buffer\[top\]\]', 'buffer[top]', code)
-
-    # 如果看到 'i = buffer[top]; top--' 两行，将合并为 'i = buffer[top--];'
-    code = re.sub(r'i\s*=\s*buffer\[top\]\s*;\s*\n\s*top--\s*;', 'i = buffer[top--];', code,
-                  flags=re.IGNORECASE | re.MULTILINE)
+    ln = re.sub(r'buffer\[top\]\]', 'buffer[top]', ln)
 
     # 9) 修正 return 拼写（保守）
-    code = _keyword_fuzzy_fix(code, cutoff=0.80, verbose=verbose)
-
+    ln = _keyword_fuzzy_fix(ln, cutoff=0.80, verbose=verbose)
+    return ln
+
+
+# 1) 显然不是代码的行（仅含单个非 ASCII 字符、孤立标点或中文）
+def _is_noise_line(s: str, verbose: bool = False) -> bool:
+    # 作业纸页眉（如 'Date' 或按版面合并后的 'Date 9/16'）
+    if re.fullmatch(r'date[\s\d/.\-:]*', s.lower()):
+        if verbose: print(f"[drop] {s!r}")
+        return True
+    # 如果行包含 CJK（中文/日文/韩文）字符并且没有英文字母或数字，很可能是噪声，丢弃
+    if re.search(r'[\u4e00-\u9fff]', s) and not re.search(r'[A-Za-z0-9_]', s):
+        if verbose:
+            print(f"[drop noisy line] {s!r}")
+        return True
+    # 丢弃非常短、且仅由单字符或孤立符号构成的行
+    if len(s) <= 1 and not re.search(r'[A-Za-z0-9]', s):
+        if verbose:
+            print(f"[drop short non-code] {s!r}")
+        return True
+    return False
+
+
+# 1) ~ 9) 单行的全部逐行规则：噪声行返回 None；可信行只走安全规则，低置信行再走激进规则
+def _fix_line(ln: str, aggressive: bool, verbose: bool = False):
+    if _is_noise_line(ln.strip(), verbose=verbose):
+        return None
+    ln = _fix_line_safe(ln, verbose=verbose)
+    if aggressive:
+        ln = _fix_line_aggressive(ln, verbose=verbose)
+    return ln
+
+
+# 跨行规则：如果看到 'i = buffer[top]; top--' 两行，将合并为 'i = buffer[top--];'
+POP_MERGE_PATTERN = re.compile(r'i\s*=\s*buffer\[top\]\s*;\s*\n\s*top--\s*;', re.IGNORECASE | re.MULTILINE)
+
+
+# 10) ~ 12) 跨行合并之后的收尾规则（逐行判断，开销很小）
+def _finish_code(code: str, verbose: bool = False) -> str:
     # 10) 删除或修正显然的孤立垃圾行（like single '[' or stray 'a'）
     lines = []
     for ln in code.splitlines():
@@ -299,30 +254,198 @@ def postprocess_code(code_str: str, verbose: bool = False) -> str:
     code = "\n".join(new_lines)
 
     # 12) 最后做一点清理：去掉多余空行（最多保留两个连续空行）
-    code = re.sub(r'\n{3,}', '\n\n', code)
+    return re.sub(r'\n{3,}', '\n\n', code)
+
+
+# 规范化后按行切分，并把行置信度与行对齐（对不上时全部按低置信处理）
+def _split_lines(code_str: str, line_scores):
+    raw_lines = _normalize_fullwidth_and_punct(code_str).splitlines()
+    if line_scores is None or len(line_scores) != len(raw_lines):
+        line_scores = [None] * len(raw_lines)
+    return raw_lines, line_scores
+
+
+# 计时记录中补充输入/输出字符数
+def _describe_postprocess(args, kwargs, result, record):
+    code_str = args[0] if args else kwargs.get("code_str", "")
+    record.sizes["in_chars"], record.sizes["out_chars"] = len(code_str or ""), len(result)
+
+
+# 后处理 OCR 识别出来的代码字符串，返回修正后的代码字符串。（启发式规则）
+@timed_stage("postprocess", describe=_describe_postprocess)
+def postprocess_code(code_str: str, verbose: bool = False, line_scores=None,
+                     confidence_threshold: float = HIGH_CONFIDENCE_THRESHOLD) -> str:
+    """
+    进阶后处理 OCR 识别出的代码文本（启发式规则）。
+    - 输入: code_str（原始或第一次后处理后的字符串）
+            line_scores（可选，与 code_str 各行一一对应的 rec_scores 行置信度）
+            confidence_threshold（置信度不低于该值的行跳过模糊匹配与激进改写）
+    - 返回: 修正后的代码字符串
+    说明: 规则尽量保守，同时包含一些针对 Stack push/pop 的启发式修复。
+          未提供 line_scores（或行数对不上）时所有行都按低置信处理，与旧行为一致。
+    """
+    if not code_str:
+        return ""
+
+    raw_lines, line_scores = _split_lines(code_str, line_scores)
+
+    # 1) ~ 9) 逐行修正
+    fixed_lines = []
+    for ln, score in zip(raw_lines, line_scores):
+        aggressive = score is None or score < confidence_threshold
+        ln = _fix_line(ln, aggressive, verbose=verbose)
+        if ln is None:
+            continue
+        if not aggressive and verbose:
+            print(f"[skip confident line {score:.3f}] {ln.strip()!r}")
+        fixed_lines.append(ln)
+    code = POP_MERGE_PATTERN.sub('i = buffer[top--];', "\n".join(fixed_lines))
+
+    return _finish_code(code, verbose=verbose)
+
+
+# 增量后处理：
+#   - 逐行规则（1~9 步，含关键字模糊匹配，占后处理的绝大部分耗时）的结果按
+#     (规范化后的行内容, 上下文, 规则版本) 缓存在进程内 LRU 中；上下文只有该行走安全规则还是激进规则，
+#     逐行规则不看其它行。老师改了几行后重新提交，只有改动的行需要重新计算
+#   - 跨行合并只在含 'buffer[top]' 的行及其前后相邻的非空行组成的窗口上执行
+#   - 10~12 步逐行判断、开销很小，整段重新执行
+# 结果与 postprocess_code 一致。修改 1~9 步的规则后需要递增 RULE_VERSION，使旧的缓存结果失效。
+RULE_VERSION = 1
+POSTPROCESS_CACHE_SIZE = int(os.getenv('POSTPROCESS_CACHE_SIZE', '20000'))  # 缓存的行数上限
+
+_MISSING = object()
+
+
+class LineCache:
+    """线程安全的 LRU 缓存：(行内容, 上下文, 规则版本) -> 修正后的行（None 表示该行被丢弃）"""
+
+    def __init__(self, maxsize=POSTPROCESS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            value = self._items.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {"size": len(self._items), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+line_cache = LineCache()
+
+
+# 在可能命中跨行规则的窗口上执行合并：以含 'buffer[top]' 的行为中心，向前、向后各扩展到相邻的非空行，
+# 相互重叠的窗口合并后整体替换
+def _merge_pop_windows(lines):
+    windows = []
+    for i, ln in enumerate(lines):
+        if 'buffer[top]' not in ln.lower():
+            continue
+        start, end = i - 1, i + 1
+        while start > 0 and not lines[start].strip():
+            start -= 1
+        while end < len(lines) - 1 and not lines[end].strip():
+            end += 1
+        start, end = max(start, 0), min(end, len(lines) - 1)
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+
+    result, position = [], 0
+    for start, end in windows:
+        result.extend(lines[position:start])
+        merged = POP_MERGE_PATTERN.sub('i = buffer[top--];', "\n".join(lines[start:end + 1]))
+        result.extend(merged.split("\n"))
+        position = end + 1
+    result.extend(lines[position:])
+    return result
+
+
+# 计时记录中补充输入/输出字符数与缓存命中情况
+def _describe_incremental(args, kwargs, result, record):
+    code_str = args[0] if args else kwargs.get("code_str", "")
+    code, stats = result
+    record.sizes["in_chars"], record.sizes["out_chars"] = len(code_str or ""), len(code)
+    record.sizes["lines"], record.sizes["recomputed"] = stats["lines"], stats["recomputed"]
+
+
+@timed_stage("postprocess", describe=_describe_incremental)
+def postprocess_code_incremental(code_str: str, line_scores=None,
+                                 confidence_threshold: float = HIGH_CONFIDENCE_THRESHOLD, cache=None):
+    """
+    增量版的 postprocess_code：逐行规则的结果走 LRU 缓存，跨行规则只在受影响的窗口上执行。
+    - 输入: 同 postprocess_code；cache 默认为进程内共享的 line_cache
+    - 返回: (修正后的代码字符串, {"lines": 行数, "cacheHits": 命中缓存的行数, "recomputed": 重新计算的行数})
+    """
+    cache = line_cache if cache is None else cache
+    stats = {"lines": 0, "cacheHits": 0, "recomputed": 0}
+    if not code_str:
+        return "", stats
+
+    raw_lines, line_scores = _split_lines(code_str, line_scores)
+    stats["lines"] = len(raw_lines)
 
-    return code
+    fixed_lines = []
+    for ln, score in zip(raw_lines, line_scores):
+        aggressive = score is None or score < confidence_threshold
+        key = (ln, "aggressive" if aggressive else "safe", RULE_VERSION)
+        fixed = cache.get(key)
+        if fixed is _MISSING:
+            fixed = _fix_line(ln, aggressive)
+            cache.put(key, fixed)
+            stats["recomputed"] += 1
+        else:
+            stats["cacheHits"] += 1
+        if fixed is not None:
+            fixed_lines.append(fixed)
+
+    lines = _merge_pop_windows("\n".join(fixed_lines).split("\n")) if fixed_lines else []
+    return _finish_code("\n".join(lines)), stats
 
 
 if __name__ == '__main__':
     image = '../../Data/zhangqikui/test1/IMG_20250928_222538.jpg'
     # 使用PaddleOCR识别 的结果，
     results = paddle_ocr(image)
-    # #  保存识别结果的图片和json数据
-    # for res in results:
-    #     # res.print()
-    #     # print(res["rec_texts"])
-    #     res.save_to_img("output")
-    #     res.save_to_json("output")
+    #  保存识别结果的图片和json数据
+    for res in results:
+        # res.print()
+        # print(res["rec_texts"])
+        res.save_to_img("output")
+        res.save_to_json("output")
 
     # 把 OCR 的 rec_texts（字符串列表）拼成一个包含换行符的源代码字符串。在内存中执行 OCR 并直接返回拼接好的源代码字符串（不写文件）。
-    code_str = ocr_recognition_return_string(results)
+    lines = ocr_recognition_return_lines(results)
+    code_str = line_layout.lines_to_code_string(lines)
 
     # 合并为 string（和之前给的合并函数等价）
     print("=== 原始 OCR 字符串 ===")
     print(code_str)
 
-    # 后处理 OCR 识别出来的代码字符串，返回修正后的代码字符串。
-    corrected = postprocess_code(code_str, verbose=True)
+    # 后处理 OCR 识别出来的代码字符串（携带每行置信度），返回修正后的代码字符串。
+    corrected = postprocess_code(code_str, verbose=True, line_scores=[ln["score"] for ln in lines])
     print("\n=== 后处理后 ===")
     print(corrected)
@@ -0,0 +1,248 @@
+import os
+from pathlib import Path
+
+import numpy as np
+
+from src.PaddleOCR import line_layout
+
+# 局部重新识别：
+#   - 完整识别后，每行分配一个稳定的行ID（L1、L2 ...），连同外接框保存为作业的版面（ImageProcess.process_step = "layout"）
+#   - 学生补拍某一页、老师框选一块区域修正时，只对该区域（扩展到完整覆盖与之相交的行）裁剪、预处理并识别，
+#     再把新识别出的行替换掉区域内的旧行；与旧行位置重合的新行沿用旧行的ID，其余行原样保留
+#   - 整页重拍（与原图对齐、尺寸一致）时，先比较两张图找出有变化的区域，只识别这些区域
+# 重新识别的像素面积只占整页的一小部分，检测与识别的耗时随之下降。
+
+LAYOUT_STEP = "layout"
+
+REGION_MARGIN_PX = int(os.getenv('REGION_MARGIN_PX', '8'))  # 裁剪区域四周额外保留的像素
+REGION_DIFF_THRESHOLD = int(os.getenv('REGION_DIFF_THRESHOLD', '40'))  # 灰度差超过该值的像素视为有变化
+REGION_MIN_AREA = int(os.getenv('REGION_MIN_AREA', '200'))  # 面积小于该值的变化区域视为噪声
+
+
+def _center_y(box):
+    return (box[1] + box[3]) / 2.0
+
+
+def _y_iou(a, b):
+    inter = min(a[3], b[3]) - max(a[1], b[1])
+    union = max(a[3], b[3]) - min(a[1], b[1])
+    return inter / union if inter > 0 and union > 0 else 0.0
+
+
+def _intersects(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _inside(box, region):
+    return box[0] >= region[0] and box[1] >= region[1] and box[2] <= region[2] and box[3] <= region[3]
+
+
+# 为完整识别得到的代码行分配行ID，生成可保存的版面
+def new_layout(lines, image_path=None):
+    layout = {"image_path": image_path, "next_id": 1, "lines": []}
+    for ln in lines:
+        layout["lines"].append({"id": _next_id(layout), **ln})
+    return layout
+
+
+def _next_id(layout):
+    line_id = f"L{layout['next_id']}"
+    layout["next_id"] += 1
+    return line_id
+
+
+# 把用户给出的区域裁剪到图片范围内，并扩展到完整覆盖与之相交的已有行，四周留出边距
+def expand_region(region, lines, image_size, margin=REGION_MARGIN_PX):
+    height, width = image_size
+    x0, y0, x1, y1 = (float(v) for v in region)
+    x0, x1 = max(0.0, min(x0, x1)), min(float(width), max(x0, x1))
+    y0, y1 = max(0.0, min(y0, y1)), min(float(height), max(y0, y1))
+    if x1 - x0 < 1 or y1 - y0 < 1:
+        raise ValueError("识别区域无效或不在图片范围内")
+    region = [x0, y0, x1, y1]
+    changed = True
+    while changed:
+        changed = False
+        for ln in lines:
+            box = ln.get("box")
+            if box is not None and _intersects(box, region) and not _inside(box, region):
+                region = [min(region[0], box[0]), min(region[1], box[1]),
+                          max(region[2], box[2]), max(region[3], box[3])]
+                changed = True
+    return [int(max(0, region[0] - margin)), int(max(0, region[1] - margin)),
+            int(min(width, np.ceil(region[2]) + margin)), int(min(height, np.ceil(region[3]) + margin))]
+
+
+# 比较对齐后的新旧两张图，返回有变化的区域列表（[x0, y0, x1, y1]，相互重叠的区域已合并）
+def changed_regions(old_image, new_image, threshold=REGION_DIFF_THRESHOLD, min_area=REGION_MIN_AREA):
+    import cv2
+    old_gray = cv2.cvtColor(old_image, cv2.COLOR_BGR2GRAY)
+    new_gray = cv2.cvtColor(new_image, cv2.COLOR_BGR2GRAY)
+    diff = cv2.absdiff(cv2.GaussianBlur(old_gray, (5, 5), 0), cv2.GaussianBlur(new_gray, (5, 5), 0))
+    _, mask = cv2.threshold(diff, threshold, 255, cv2.THRESH_BINARY)
+    # 横向膨胀得多一些，把同一行里相邻字符的变化连成一块
+    mask = cv2.dilate(mask, np.ones((5, 25), np.uint8))
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+    boxes = [[int(x), int(y), int(x + w), int(y + h)]
+             for x, y, w, h, area in stats[1:count] if area >= min_area]
+
+    merged = []
+    for box in sorted(boxes):
+        for other in merged:
+            if _intersects(box, other):
+                other[:] = [min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3])]
+                break
+        else:
+            merged.append(box)
+    return merged
+
+
+# 用区域外未改动的行估计缩进基准（0 级缩进的行首 x）与每级缩进的像素宽度，重新计算新行的缩进
+def reindent(new_lines, reference_lines, indent_width=4):
+    refs = [ln for ln in reference_lines if ln.get("box") is not None]
+    if not refs:
+        return new_lines
+    x0 = np.array([ln["box"][0] for ln in refs])
+    levels = np.array([ln.get("indent", 0) for ln in refs])
+    base = float(np.median(x0[levels == 0])) if (levels == 0).any() else float(x0.min())
+    if (levels > 0).any():
+        unit = float(np.median((x0[levels > 0] - base) / levels[levels > 0]))
+    else:
+        widths = [(ln["box"][2] - ln["box"][0]) / max(len(ln["text"].strip()), 1) for ln in refs]
+        unit = float(np.median(widths)) * 2.0
+    unit = max(unit, 1.0)
+
+    result = []
+    for ln in new_lines:
+        if ln.get("box") is None:
+            result.append(ln)
+            continue
+        level = max(int(round((ln["box"][0] - base) / unit)), 0)
+        result.append({**ln, "text": " " * (indent_width * level) + ln["text"].strip(), "indent": level})
+    return result
+
+
+# 把区域内新识别的行替换进版面：位置与旧行重合的新行沿用旧行ID。返回 (新版面, 变化的行ID)
+def splice_lines(layout, region, new_lines):
+    lines = layout["lines"]
+    removed = [i for i, ln in enumerate(lines) if ln.get("box") is not None and _inside(ln["box"], region)]
+    old = [lines[i] for i in removed]
+    removed_set = set(removed)
+    kept = [ln for i, ln in enumerate(lines) if i not in removed_set]
+    layout = {**layout, "lines": kept}
+
+    new_lines = sorted(new_lines, key=lambda ln: _center_y(ln["box"]) if ln.get("box") else 0.0)
+    placed, reused = [], set()
+    for ln in new_lines:
+        best, best_iou = None, 0.5
+        for candidate in old:
+            if candidate["id"] not in reused:
+                iou = _y_iou(ln["box"], candidate["box"]) if ln.get("box") else 0.0
+                if iou > best_iou:
+                    best, best_iou = candidate, iou
+        if best is not None:
+            reused.add(best["id"])
+            placed.append({"id": best["id"], **ln})
+        else:
+            placed.append({"id": _next_id(layout), **ln})
+
+    # 放回原来的位置；区域内原本没有行时按纵坐标插入
+    if removed:
+        position = removed[0]
+    else:
+        top = _center_y(placed[0]["box"]) if placed and placed[0].get("box") else 0.0
+        position = next((i for i, ln in enumerate(kept) if ln.get("box") is not None and _center_y(ln["box"]) > top),
+                        len(kept))
+    layout["lines"] = kept[:position] + placed + kept[position:]
+
+    changes = {
+        "updated": [ln["id"] for ln in placed if ln["id"] in reused],
+        "added": [ln["id"] for ln in placed if ln["id"] not in reused],
+        "removed": [ln["id"] for ln in old if ln["id"] not in reused],
+    }
+    return layout, changes
+
+
+# 默认的区域识别：预处理 + 识别裁剪图，返回页结果（坐标相对裁剪图）。
+# 配置了独立 OCR 工作进程（OCR_WORKER_ADDRESS）时把裁剪图交给它识别，API 进程不加载模型
+def paddle_pages(crop):
+    from src.OCRWorker import ocr_worker
+    client = ocr_worker.get_client()
+    if client is not None:
+        return client.recognize(crop)
+    from src.PaddleOCR import PaddleOCR
+    return PaddleOCR.results_to_pages(PaddleOCR.ocr_recognition(PaddleOCR.preprocess_img_pro(crop)))
+
+
+# 只识别图片中的一个区域，返回坐标已换算回整图的代码行
+def recognize_region(image, region, recognize_pages=paddle_pages):
+    x0, y0, x1, y1 = region
+    pages = recognize_pages(image[y0:y1, x0:x1])
+    for page in pages:
+        page["rec_polys"] = [[[px + x0, py + y0] for px, py in poly] for poly in page["rec_polys"]]
+    return line_layout.extract_code_lines(pages)
+
+
+def _merge_changes(total, changes):
+    for key, ids in changes.items():
+        total[key].extend(ids)
+    # 先被删除、又在后续区域中被沿用的ID不算删除
+    total["removed"] = [i for i in total["removed"] if i not in total["updated"]]
+    return total
+
+
+# 在版面上重新识别若干区域，返回 (新版面, 变化的行ID, 实际识别的区域)
+def reocr_regions(layout, image, regions, recognize_pages=paddle_pages):
+    changes = {"updated": [], "added": [], "removed": []}
+    expanded = []
+    for region in regions:
+        region = expand_region(region, layout["lines"], image.shape[:2])
+        untouched = [ln for ln in layout["lines"] if ln.get("box") is None or not _inside(ln["box"], region)]
+        new_lines = reindent(recognize_region(image, region, recognize_pages), untouched)
+        layout, region_changes = splice_lines(layout, region, new_lines)
+        changes = _merge_changes(changes, region_changes)
+        expanded.append(region)
+    return layout, changes, expanded
+
+
+# 局部补拍合成后的整页图片路径（保存在补拍图片旁边，PNG 无损）
+def composite_path(new_image_path):
+    new_image_path = Path(new_image_path)
+    return new_image_path.with_name(f"{new_image_path.stem}-composite.png")
+
+
+def reocr(layout, image_path, region=None, new_image_path=None, recognize_pages=paddle_pages):
+    """
+    局部重新识别入口（同步，在线程池中调用）。
+        region: 指定区域 [x0, y0, x1, y1]（整图像素坐标）
+        new_image_path: 补拍的图片。与 region 同时给出时视为该区域的局部补拍（缩放后替换该区域，
+                        合成后的整页图片另存一份，之后的识别以它为准）；
+                        只给出图片时视为与原图对齐的整页重拍，只识别有变化的区域
+    返回: (新版面, 变化的行ID, 实际识别的区域)；新版面的 image_path 为之后识别应使用的整页图片
+    """
+    from src.PaddleOCR import PaddleOCR
+    import cv2
+    image = PaddleOCR.load_img(image_path)
+    if new_image_path is None:
+        if region is None:
+            raise ValueError("请指定识别区域或上传补拍图片")
+        regions = [region]
+    else:
+        new_image = PaddleOCR.load_img(new_image_path)
+        if region is not None:
+            x0, y0, x1, y1 = expand_region(region, [], image.shape[:2], margin=0)
+            image = image.copy()
+            image[y0:y1, x0:x1] = cv2.resize(new_image, (x1 - x0, y1 - y0))
+            regions = [[x0, y0, x1, y1]]
+            # 合成图落盘，否则下次局部识别或整页重拍读到的仍是旧像素，修正会被悄悄撤销
+            image_path = composite_path(new_image_path)
+            if not cv2.imwrite(str(image_path), image):
+                raise ValueError("保存合成图片失败")
+        else:
+            if new_image.shape[:2] != image.shape[:2]:
+                raise ValueError("补拍图片与原图尺寸不一致，请先对齐或指定区域")
+            regions = changed_regions(image, new_image)
+            image = new_image
+            image_path = new_image_path
+    layout = {**layout, "image_path": str(image_path)}
+    return reocr_regions(layout, image, regions, recognize_pages)